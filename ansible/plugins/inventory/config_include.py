@@ -0,0 +1,193 @@
+"""
+Included config files for splunk_config.yml.
+
+A config can list other files in include, as paths or glob patterns relative to
+the config file, to split a large estate by environment, cluster or forwarder
+fleet. The list sections of the included files are appended to the ones of the
+config file, the dictionary sections are merged, with the included files
+overriding the values in the include order.
+
+The parsed content of each file is stored by its sha256 hash in the inventory
+dir, so only changed files are parsed with YAML again.
+
+Vagrant and provision_terraform_aws.yml read the merged config as json from
+this script, so the files are merged the same way everywhere:
+
+    python3 config_include.py ../../../config/splunk_config.yml
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+
+import yaml
+
+# Use the libyaml based loader, if available
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+PARSE_CACHE_VERSION = 1
+
+# Sections allowed in included files, the plugin options and the provider
+# sections read by Vagrant and the Terraform playbooks stay in the config file
+LIST_SECTIONS = ['splunk_hosts', 'splunk_environments', 'splunk_idxclusters', 'splunk_shclusters']
+DICT_SECTIONS = ['general', 'custom', 'os', 'splunk_defaults', 'splunk_dirs', 'splunk_apps', 'splunk_systemd']
+
+
+class ConfigIncludeError(ValueError):
+    """Raised for invalid includes and included files."""
+
+
+def include_paths(config_path, include):
+    """
+    Return the absolute paths of the included files, in the include order.
+
+    Glob patterns are expanded sorted, a file matched by several entries is only
+    included once. A path without glob characters has to exist.
+    """
+    if include is None:
+        return []
+    if isinstance(include, str):
+        include = [include]
+    if not isinstance(include, list):
+        raise ConfigIncludeError("include must be a list of file names or patterns, got: %s" % type(include).__name__)
+
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+    paths = []
+    for entry in include:
+        pattern = os.path.join(config_dir, os.path.expanduser(str(entry)))
+        if glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            raise ConfigIncludeError("Included file %s not found" % entry)
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in paths and path != os.path.abspath(config_path):
+                paths.append(path)
+    return paths
+
+
+def check_fragment(path, fragment):
+    """Raise ConfigIncludeError, if the included file has sections not allowed there."""
+    if fragment is None:
+        return
+    if not isinstance(fragment, dict):
+        raise ConfigIncludeError("Included file %s should be a dictionary, got: %s" % (path, type(fragment).__name__))
+    invalid = [key for key in fragment if key not in LIST_SECTIONS and key not in DICT_SECTIONS]
+    if invalid:
+        raise ConfigIncludeError("Included file %s has sections only allowed in the config file: %s" % (path, ', '.join(invalid)))
+
+
+def _merge_dict(dict1, dict2):
+    merged = dict(dict1)
+    for key, value in dict2.items():
+        if isinstance(merged.get(key), dict) and isinstance(value, dict):
+            merged[key] = _merge_dict(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def merge_fragments(config, fragments):
+    """Return the config with the sections of the included files (a list of dicts) added."""
+    merged = dict(config)
+    for fragment in fragments:
+        for key, value in (fragment or {}).items():
+            if value is None:
+                continue
+            if key in LIST_SECTIONS:
+                merged[key] = list(merged.get(key) or []) + list(value)
+            elif isinstance(merged.get(key), dict) and isinstance(value, dict):
+                merged[key] = _merge_dict(merged[key], value)
+            else:
+                merged[key] = value
+    return merged
+
+
+def load_config(config_path):
+    """Return the parsed config file with the sections of the included files added."""
+    with open(config_path, 'r') as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    if not isinstance(config, dict) or not config.get('include'):
+        return config
+    fragments = []
+    for path in include_paths(config_path, config['include']):
+        with open(path, 'r') as f:
+            fragment = yaml.load(f, Loader=SafeLoader)
+        check_fragment(path, fragment)
+        fragments.append(fragment)
+    return merge_fragments(config, fragments)
+
+
+class ParseCache:
+    """
+    Parsed config files by content hash.
+
+    The cache is a json file, loading it is much faster than parsing large YAML
+    files. Files with content json can't represent, like dates or non string
+    keys, are parsed each time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.used = set()
+        self.changed = False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == PARSE_CACHE_VERSION:
+                self.files = data['files']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def load(self, path):
+        """Return the parsed content of the file and the sha256 hash of its content."""
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        self.used.add(path)
+        cached = self.files.get(path)
+        if cached and cached.get('hash') == digest and 'config' in cached:
+            return cached['config'], digest
+
+        data = yaml.load(content, Loader=SafeLoader)
+        try:
+            cacheable = json.loads(json.dumps(data)) == data
+        except (TypeError, ValueError):
+            cacheable = False
+        entry = {'hash': digest, 'config': data} if cacheable else {'hash': digest}
+        if cached != entry:
+            self.files[path] = entry
+            self.changed = True
+        return data, digest
+
+    def save(self):
+        """Write the cache, if a file was parsed or is not used anymore. Write errors are ignored."""
+        unused = [path for path in self.files if path not in self.used]
+        if not (self.changed or unused):
+            return
+        for path in unused:
+            del self.files[path]
+        temp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({'version': PARSE_CACHE_VERSION, 'files': self.files}, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('Usage: %s <config_file>' % sys.argv[0])
+    try:
+        json.dump(load_config(sys.argv[1]), sys.stdout, default=str)
+    except (OSError, yaml.YAMLError, ConfigIncludeError) as e:
+        sys.exit('ERROR: %s' % e)
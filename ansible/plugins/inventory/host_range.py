@@ -0,0 +1,124 @@
+"""
+Host name ranges for the iter setting of splunk_hosts.
+
+Host names are generated lazily from one or more dimensions. A dimension is either
+a number range like '1..100' or '001..100/2' (with step) or a list of strings.
+The number of hosts and the membership of a name are calculated without
+generating the host names. This module has no dependencies, it is used by the
+inventory plugin and by schema.py.
+"""
+
+import itertools
+import re
+
+RANGE_PATTERN = re.compile(r'^(\d+)\.\.(\d+)(?:/(\d+))?$')
+
+
+class HostRangeError(ValueError):
+    """Raised for invalid range definitions."""
+
+
+class NumberRange:
+    """Number dimension, zero padded to the width of the end number."""
+
+    def __init__(self, spec):
+        match = RANGE_PATTERN.match(str(spec))
+        if not match:
+            raise HostRangeError("Invalid range '%s', expected 'start..end' or 'start..end/step'" % spec)
+        start, end, step = match.groups()
+        if step is not None and int(step) == 0:
+            raise HostRangeError("Invalid range '%s', the step must be greater than 0" % spec)
+        self.width = len(end)
+        self.numbers = range(int(start), int(end) + 1, int(step or 1))
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __iter__(self):
+        return (str(number).zfill(self.width) for number in self.numbers)
+
+    def __contains__(self, value):
+        return value.isdigit() and str(int(value)).zfill(self.width) == value and int(value) in self.numbers
+
+    def pattern(self):
+        # All numbers of the range have the width of the end number
+        return r'\d{%d}' % self.width
+
+
+class ListRange:
+    """Dimension with a list of strings."""
+
+    def __init__(self, values):
+        self.values = [str(value) for value in values]
+        self.lookup = set(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __contains__(self, value):
+        return value in self.lookup
+
+    def pattern(self):
+        return '|'.join(re.escape(value) for value in sorted(self.values, key=len, reverse=True))
+
+
+class HostRange:
+    """
+    Lazy sequence of host names.
+
+    A name is built from the prefix, the dimension values joined by the separator
+    and the postfix. Names listed in exclude are skipped.
+    """
+
+    def __init__(self, dimensions, prefix=None, postfix=None, separator=None, exclude=None):
+        if not dimensions:
+            raise HostRangeError("At least one range is needed")
+        self.dimensions = [ListRange(dim) if isinstance(dim, (list, tuple)) else NumberRange(dim) for dim in dimensions]
+        self.prefix = prefix or ''
+        self.postfix = postfix or ''
+        self.separator = separator or ''
+        self.exclude = set(exclude or [])
+        self._matcher = None
+        self._size = None
+
+    @classmethod
+    def from_config(cls, iteration):
+        """Create the range from the iter section of a splunk_hosts entry."""
+        if 'ranges' in iteration:
+            dimensions = iteration['ranges']
+        else:
+            dimensions = [iteration['numbers']]
+        return cls(dimensions, prefix=iteration.get('prefix'), postfix=iteration.get('postfix'),
+                   separator=iteration.get('separator'), exclude=iteration.get('exclude'))
+
+    def _name(self, values):
+        return self.prefix + self.separator.join(values) + self.postfix
+
+    def __iter__(self):
+        for values in itertools.product(*self.dimensions):
+            name = self._name(values)
+            if name not in self.exclude:
+                yield name
+
+    def __len__(self):
+        if self._size is None:
+            total = 1
+            for dim in self.dimensions:
+                total *= len(dim)
+            self._size = total - sum(1 for name in self.exclude if self._in_dimensions(name))
+        return self._size
+
+    def __contains__(self, name):
+        return name not in self.exclude and self._in_dimensions(name)
+
+    def _in_dimensions(self, name):
+        if self._matcher is None:
+            parts = ['(%s)' % dim.pattern() for dim in self.dimensions]
+            self._matcher = re.compile(re.escape(self.prefix) + re.escape(self.separator).join(parts) + re.escape(self.postfix))
+        match = self._matcher.fullmatch(name)
+        if not match:
+            return False
+        return all(value in dim for value, dim in zip(match.groups(), self.dimensions))
@@ -0,0 +1,231 @@
+"""
+Static export of the inventory for tools not using Ansible, like bin/spash.
+
+The inventory plugin writes the hosts with their roles, environment, clusters,
+site and connection variables to inventory/splunk_inventory.json (or .msgpack)
+on each build. load_export reads it back and adds the connection variables
+from inventory/hosts and inventory/host_vars, written by the Terraform
+provisioning and Vagrant, so a host lookup is a single file read instead of
+running ansible-inventory.
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import time
+
+EXPORT_VERSION = 1
+EXPORT_FILES = {'json': 'splunk_inventory.json', 'msgpack': 'splunk_inventory.msgpack'}
+
+# Host variables needed to connect to a host
+CONNECTION_VARS = ['ip_addr', 'private_ip', 'public_dns_name', 'private_dns_name']
+
+# Inventory variables and groups of the exported fields
+ANSIBLE_VAR_NAMES = {'site': 'site', 'splunk_env': 'splunk_env_name', 'idxcluster': 'idxc_name', 'shcluster': 'shc_name'}
+ANSIBLE_GROUP_PREFIXES = {'splunk_env': 'splunk_env_', 'idxcluster': 'idxcluster_', 'shcluster': 'shcluster_'}
+
+
+def is_connection_var(key):
+    """Return True for variables needed to connect to a host."""
+    return key.startswith('ansible_') or key in CONNECTION_VARS
+
+
+def write_export(inventory_dir, hosts, config_hash=None, export_format='json', config_files=None):
+    """
+    Write the export file atomically and return its path.
+
+    hosts maps the host names to dicts with roles, splunk_env, site,
+    idxcluster, shcluster and vars (connection variables). config_files are
+    the files included by the config file.
+    """
+    data = {
+        'version': EXPORT_VERSION,
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config_hash': config_hash,
+        'config_files': config_files or [],
+        'hosts': hosts,
+    }
+    if export_format == 'msgpack':
+        import msgpack
+        content = msgpack.packb(data, use_bin_type=True)
+    else:
+        content = json.dumps(data, separators=(',', ':'), default=str).encode()
+
+    path = os.path.join(inventory_dir, EXPORT_FILES[export_format])
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    # Only one export format is current
+    for other_format, name in EXPORT_FILES.items():
+        if other_format != export_format and os.path.exists(os.path.join(inventory_dir, name)):
+            os.remove(os.path.join(inventory_dir, name))
+    return path
+
+
+def combine_config_hash(config_hash, fragment_hashes):
+    """Return the hash of a config with included files, from the content hashes of the config and the included files."""
+    combined_hash = hashlib.sha256(config_hash.encode())
+    for path, fragment_hash in fragment_hashes.items():
+        combined_hash.update(('%s:%s' % (path, fragment_hash)).encode())
+    return combined_hash.hexdigest()
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _config_changed(data, config_file, mtime):
+    """Return True, if the config file or one of its included files differs from the exported config."""
+    config_files = data.get('config_files') or []
+    try:
+        # The content is only compared for files changed after the export, like by an editor save or git checkout
+        if all(os.path.getmtime(path) <= mtime for path in [config_file] + config_files):
+            return False
+        config_hash = _file_hash(config_file)
+        if config_files:
+            config_hash = combine_config_hash(config_hash, {path: _file_hash(path) for path in config_files})
+    except OSError:
+        return True
+    return config_hash != data.get('config_hash')
+
+
+def _read_export(inventory_dir):
+    """Return the newest export data and its modification time, or (None, None)."""
+    for export_format, name in EXPORT_FILES.items():
+        path = os.path.join(inventory_dir, name)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        try:
+            if export_format == 'msgpack':
+                import msgpack
+                return msgpack.unpackb(content, raw=False), mtime
+            return json.loads(content), mtime
+        except (ImportError, ValueError):
+            continue
+    return None, None
+
+
+def _read_static_hosts(path):
+    """Return the host variables of the host lines in an INI inventory file, like inventory/hosts."""
+    hostvars = {}
+    try:
+        with open(path, 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return hostvars
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(('#', ';', '[')):
+            continue
+        try:
+            fields = shlex.split(line, comments=True)
+        except ValueError:
+            continue
+        if not fields:
+            continue
+        hostvars.setdefault(fields[0], {}).update(
+            field.split('=', 1) for field in fields[1:] if '=' in field)
+    return hostvars
+
+
+def _read_host_vars_dir(host_vars_dir, hostname):
+    """Return the variables of the host_vars files of a host, like the ones written by Vagrant."""
+    hostvars = {}
+    host_dir = os.path.join(host_vars_dir, hostname)
+    if not os.path.isdir(host_dir):
+        return hostvars
+    import yaml
+    for name in sorted(os.listdir(host_dir)):
+        if name.endswith(('.yml', '.yaml')):
+            with open(os.path.join(host_dir, name), 'r') as f:
+                data = yaml.safe_load(f)
+            if isinstance(data, dict):
+                hostvars.update(data)
+    return hostvars
+
+
+class InventoryExport:
+    """Read access to an exported inventory."""
+
+    def __init__(self, data):
+        self.data = data
+        self.hosts = data['hosts']
+
+    def host_names(self):
+        """Return the sorted host names."""
+        return sorted(self.hosts)
+
+    def host_vars(self, hostname):
+        """Return the connection variables of a host, or an empty dict for unknown hosts."""
+        host = self.hosts.get(hostname)
+        return dict(host.get('vars', {})) if host else {}
+
+    def roles(self, hostname):
+        """Return the roles of a host."""
+        return list(self.hosts.get(hostname, {}).get('roles', []))
+
+    def hosts_with(self, key, value):
+        """Return the hosts with the value for roles, splunk_env, site, idxcluster or shcluster."""
+        if key == 'roles':
+            return [name for name, host in self.hosts.items() if value in host.get('roles', [])]
+        return [name for name, host in self.hosts.items() if host.get(key) == value]
+
+    def to_ansible_list(self):
+        """
+        Return the hosts in the format of ansible-inventory --list.
+
+        Only the role, splunk_env and cluster groups are added. The site, environment and
+        cluster names are added to the host variables with the names used in the inventory.
+        """
+        inventory = {'_meta': {'hostvars': {}}}
+        for name, host in self.hosts.items():
+            hostvars = self.host_vars(name)
+            for key, var in ANSIBLE_VAR_NAMES.items():
+                if host.get(key) is not None:
+                    hostvars[var] = host[key]
+            inventory['_meta']['hostvars'][name] = hostvars
+            groups = ['role_' + role for role in host.get('roles', [])]
+            groups.extend(prefix + host[key] for key, prefix in ANSIBLE_GROUP_PREFIXES.items() if host.get(key) is not None)
+            for group in groups:
+                inventory.setdefault(group, {'hosts': []})['hosts'].append(name)
+        return inventory
+
+
+def load_export(inventory_dir, config_file=None):
+    """
+    Return the exported inventory as InventoryExport.
+
+    Returns None, if there is no export with a supported version, or if the
+    content of the config_file or one of its included files differs from the
+    exported config. Without config_file, the included files must not be
+    changed after the export was written. The variables from
+    inventory/hosts and inventory/host_vars are added to the exported ones.
+    """
+    data, mtime = _read_export(inventory_dir)
+    if not isinstance(data, dict) or data.get('version') != EXPORT_VERSION:
+        return None
+    if config_file and os.path.exists(config_file):
+        if _config_changed(data, config_file, mtime):
+            return None
+    else:
+        for path in data.get('config_files') or []:
+            try:
+                if os.path.getmtime(path) > mtime:
+                    return None
+            except OSError:
+                return None
+
+    static_hosts = _read_static_hosts(os.path.join(inventory_dir, 'hosts'))
+    host_vars_dir = os.path.join(inventory_dir, 'host_vars')
+    for name, host in data['hosts'].items():
+        hostvars = host.setdefault('vars', {})
+        hostvars.update(static_hosts.get(name, {}))
+        hostvars.update(_read_host_vars_dir(host_vars_dir, name))
+    return InventoryExport(data)
@@ -9,7 +9,11 @@ from __future__ import annotations
 
 from enum import Enum
 from typing import Any, Dict, List, Optional, Union
-from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator, ConfigDict
+
+from host_range import HostRange
+import schema_rules
+from schema_rules import TopologySummary
 
 
 # =============================================================================
@@ -31,7 +35,7 @@ class AllowedRole(str, Enum):
 
 
 # Roles that are allowed to have a 'site' variable
-ROLES_WITH_SITE = {AllowedRole.indexer, AllowedRole.search_head, AllowedRole.cluster_manager}
+ROLES_WITH_SITE = {AllowedRole(role) for role in schema_rules.ROLES_WITH_SITE}
 
 
 # =============================================================================
@@ -47,6 +51,14 @@ class GeneralConfig(BaseModel):
         pattern=r'^[a-z]{2}[_-][A-Z]{2}$',
         description="Language locale for links (e.g., 'en-GB')"
     )
+    precompute_topology: Optional[bool] = Field(
+        None,
+        description="Calculate the topology lists in the inventory plugin instead of dynamic.yml"
+    )
+    hoist_host_vars: Optional[bool] = Field(
+        None,
+        description="Set the shared host variables of a splunk_hosts entry on one group"
+    )
 
 
 class VirtualBoxSyncedFolder(BaseModel):
@@ -110,6 +122,15 @@ class SplunkDownloadConfig(BaseModel):
     splunkforwarder: Optional[bool] = None
 
 
+class SplunkSoftwareDistributionConfig(BaseModel):
+    """Distribution of the Splunk archives to the hosts."""
+    mode: Optional[str] = Field(None, pattern=r'^(upload|seeder|http)$')
+    seed_group: Optional[str] = None
+    port: Optional[int] = Field(None, ge=1, le=65535)
+    http_host: Optional[str] = None
+    timeout: Optional[int] = Field(None, ge=1)
+
+
 class SplunkSslEndpointConfig(BaseModel):
     """SSL endpoint configuration."""
     model_config = ConfigDict(extra='allow')
@@ -159,6 +180,7 @@ class SplunkDefaultsConfig(BaseModel):
     splunk_architecture: Optional[str] = Field(None, pattern=r'^(amd64|x86_64|arm64)$')
     splunk_fips: Optional[bool] = None
     splunk_download: Optional[SplunkDownloadConfig] = None
+    splunk_software_distribution: Optional[SplunkSoftwareDistributionConfig] = None
     splunk_admin_password: Optional[str] = None
     splunk_license_file: Optional[Union[str, List[str]]] = None
     splunk_license_server: Optional[str] = None
@@ -238,9 +260,32 @@ class ShClusterConfig(BaseModel):
 class HostIteration(BaseModel):
     """Host iteration for generating multiple hosts."""
     prefix: Optional[str] = None
-    numbers: str = Field(..., pattern=r'^\d+\.\.\d+$', description="Range like '1..3'")
+    numbers: Optional[str] = Field(None, pattern=r'^\d+\.\.\d+(/\d+)?$', description="Range like '1..3' or '1..9/2'")
+    ranges: Optional[List[Union[str, List[str]]]] = Field(
+        None, min_length=1, description="Ranges or lists of strings, combined to host names"
+    )
+    separator: Optional[str] = None
+    exclude: Optional[List[str]] = Field(None, description="Host names to skip")
     postfix: Optional[str] = None
 
+    _hosts: Any = PrivateAttr(default=None)
+
+    @model_validator(mode='after')
+    def validate_ranges(self) -> 'HostIteration':
+        """Ensure exactly one of numbers or ranges is given and hosts are generated."""
+        self._hosts = schema_rules.iteration_hosts(self.model_dump(exclude_none=True))
+        return self
+
+    @property
+    def hosts(self) -> HostRange:
+        """Lazily generated host names of this iteration."""
+        return self._hosts
+
+    @property
+    def count(self) -> int:
+        """Number of hosts generated by this iteration, without generating the names."""
+        return len(self._hosts)
+
 
 class CustomConfig(BaseModel):
     """Custom/arbitrary settings (for ansible connection vars, etc.)."""
@@ -276,6 +321,7 @@ class SplunkHost(BaseModel):
     splunk_search_peers: Optional[str] = None
     splunk_conf: Optional[Dict[str, Dict[str, Any]]] = None
     splunk_fips: Optional[bool] = None
+    splunk_software_distribution: Optional[SplunkSoftwareDistributionConfig] = None
     
     # Nested configs
     os: Optional[OsConfig] = None
@@ -284,34 +330,36 @@ class SplunkHost(BaseModel):
     custom: Optional[CustomConfig] = None
     terraform: Optional[TerraformConfig] = None
 
+    @property
+    def host_count(self) -> int:
+        """Number of hosts defined by this entry."""
+        if self.list is not None:
+            return len(self.list)
+        if self.iter is not None:
+            return self.iter.count
+        return 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Host count, role names and cluster references of this entry, for TopologySummary."""
+        return {'count': self.host_count, 'roles': [role.value for role in self.roles], 'site': self.site,
+                'idxcluster': self.idxcluster, 'shcluster': self.shcluster, 'splunk_env': self.splunk_env}
+
     @model_validator(mode='after')
     def validate_host_identifier(self) -> 'SplunkHost':
         """Ensure exactly one of name, list, or iter is specified."""
-        identifiers = [self.name, self.list, self.iter]
-        count = sum(1 for i in identifiers if i is not None)
-        
-        if count == 0:
-            raise ValueError("Host must have exactly one of: 'name', 'list', or 'iter'")
-        if count > 1:
-            raise ValueError("Host cannot have multiple identifiers. Use only one of: 'name', 'list', or 'iter'")
-        
+        schema_rules.check_host_identifier(self.name, self.list, self.iter)
         return self
 
     @model_validator(mode='after')
     def validate_site_with_roles(self) -> 'SplunkHost':
         """Ensure 'site' is only used with allowed roles."""
-        if self.site is not None:
-            allowed_site_roles = {AllowedRole.indexer, AllowedRole.search_head, AllowedRole.cluster_manager}
-            if not any(role in allowed_site_roles for role in self.roles):
-                allowed_names = ', '.join(r.value for r in allowed_site_roles)
-                raise ValueError(f"'site' is only allowed for roles: {allowed_names}")
+        schema_rules.check_site_roles(self.site, [role.value for role in self.roles])
         return self
 
     @model_validator(mode='after')
     def validate_cluster_manager_has_idxcluster(self) -> 'SplunkHost':
         """Ensure cluster_manager role has idxcluster specified."""
-        if AllowedRole.cluster_manager in self.roles and not self.idxcluster:
-            raise ValueError("'idxcluster' must be specified for hosts with role 'cluster_manager'")
+        schema_rules.check_cluster_manager_idxcluster([role.value for role in self.roles], self.idxcluster)
         return self
 
 
@@ -350,6 +398,16 @@ class SplunkConfig(BaseModel):
     splunk_idxclusters: Optional[List[IdxClusterConfig]] = None
     splunk_shclusters: Optional[List[ShClusterConfig]] = None
 
+    _topology: Optional[TopologySummary] = PrivateAttr(default=None)
+
+    @property
+    def topology(self) -> TopologySummary:
+        """Host counts of splunk_hosts, computed once and shared by the validators."""
+        if self._topology is None:
+            self._topology = TopologySummary([host.summary() for host in self.splunk_hosts],
+                                             [role.value for role in AllowedRole])
+        return self._topology
+
     @field_validator('plugin')
     @classmethod
     def validate_plugin_name(cls, v: str) -> str:
@@ -364,31 +422,7 @@ class SplunkConfig(BaseModel):
         Only validates when search heads are explicitly defined in the config.
         A deployer with 0 search heads is allowed (external SHC scenario).
         """
-        has_deployer = False
-        search_head_count = 0
-        
-        for host in self.splunk_hosts:
-            if AllowedRole.deployer in host.roles:
-                has_deployer = True
-            if AllowedRole.search_head in host.roles:
-                # Count hosts based on identifier type
-                if host.name:
-                    search_head_count += 1
-                elif host.list:
-                    search_head_count += len(host.list)
-                elif host.iter:
-                    # Parse range like '1..3' to count hosts
-                    parts = host.iter.numbers.split('..')
-                    start, end = int(parts[0]), int(parts[1])
-                    search_head_count += (end - start + 1)
-        
-        # Only validate if search heads are defined (1 or 2 is invalid with deployer)
-        if has_deployer and search_head_count > 0 and search_head_count < 3:
-            raise ValueError(
-                f"A deployer requires a Search Head Cluster with at least 3 search heads. "
-                f"Found {search_head_count} search head(s)."
-            )
-        
+        schema_rules.check_deployer_requires_shc(self.topology)
         return self
 
     @model_validator(mode='after')
@@ -399,30 +433,7 @@ class SplunkConfig(BaseModel):
         an shcluster specified to form a valid Search Head Cluster.
         Standalone search heads without shcluster are allowed alongside SHC members.
         """
-        has_deployer = False
-        shc_member_count = 0
-        
-        for host in self.splunk_hosts:
-            if AllowedRole.deployer in host.roles:
-                has_deployer = True
-            
-            if AllowedRole.search_head in host.roles and host.shcluster:
-                # Count SHC members based on identifier type
-                if host.name:
-                    shc_member_count += 1
-                elif host.list:
-                    shc_member_count += len(host.list)
-                elif host.iter:
-                    parts = host.iter.numbers.split('..')
-                    start, end = int(parts[0]), int(parts[1])
-                    shc_member_count += (end - start + 1)
-        
-        if has_deployer and shc_member_count < 3:
-            raise ValueError(
-                f"When a deployer is defined, at least 3 search heads must have 'shcluster' specified. "
-                f"Found {shc_member_count} search head(s) with shcluster."
-            )
-        
+        schema_rules.check_shc_members(self.topology)
         return self
 
     @model_validator(mode='after')
@@ -433,30 +444,7 @@ class SplunkConfig(BaseModel):
         an idxcluster specified to form a valid Indexer Cluster.
         Standalone indexers without idxcluster are allowed alongside IDXC members.
         """
-        has_cluster_manager = False
-        idxc_member_count = 0
-        
-        for host in self.splunk_hosts:
-            if AllowedRole.cluster_manager in host.roles:
-                has_cluster_manager = True
-            
-            if AllowedRole.indexer in host.roles and host.idxcluster:
-                # Count IDXC members based on identifier type
-                if host.name:
-                    idxc_member_count += 1
-                elif host.list:
-                    idxc_member_count += len(host.list)
-                elif host.iter:
-                    parts = host.iter.numbers.split('..')
-                    start, end = int(parts[0]), int(parts[1])
-                    idxc_member_count += (end - start + 1)
-        
-        if has_cluster_manager and idxc_member_count < 2:
-            raise ValueError(
-                f"When a cluster_manager is defined, at least 2 indexers must have 'idxcluster' specified. "
-                f"Found {idxc_member_count} indexer(s) with idxcluster."
-            )
-        
+        schema_rules.check_idxc_members(self.topology)
         return self
 
     @model_validator(mode='after')
@@ -466,28 +454,48 @@ class SplunkConfig(BaseModel):
         If a license_manager role is defined, the splunk_defaults must include
         a splunk_license_file setting.
         """
-        has_license_manager = False
-        
-        for host in self.splunk_hosts:
-            if AllowedRole.license_manager in host.roles:
-                has_license_manager = True
-                break
-        
-        if has_license_manager:
-            # Check if splunk_license_file is defined in splunk_defaults
-            has_license_file = (
-                self.splunk_defaults is not None and 
-                self.splunk_defaults.splunk_license_file is not None
-            )
-            if not has_license_file:
-                raise ValueError(
-                    "When a license_manager role is defined, 'splunk_license_file' must be specified "
-                    "in splunk_defaults."
-                )
+        license_file = self.splunk_defaults.splunk_license_file if self.splunk_defaults is not None else None
+        schema_rules.check_license_file(self.topology, license_file)
+        return self
+
+    @model_validator(mode='after')
+    def validate_cluster_references(self) -> 'SplunkConfig':
+        """Ensure the clusters and environments used by the hosts are defined.
         
+        Every idxcluster must be defined in splunk_idxclusters. The shcluster and
+        splunk_env names are checked, if splunk_shclusters or splunk_environments are given.
+        """
+        schema_rules.check_cluster_references(
+            self.topology,
+            [idxcluster.idxc_name for idxcluster in self.splunk_idxclusters or []],
+            None if self.splunk_shclusters is None else [shcluster.shc_name for shcluster in self.splunk_shclusters],
+            None if self.splunk_environments is None else [splunk_env.splunk_env_name for splunk_env in self.splunk_environments],
+        )
         return self
 
 
+class ConfigFragment(BaseModel):
+    """
+    Configuration model for the files included by splunk_config.yml.
+
+    The sections are validated on their own, the rules between the sections
+    are checked by SplunkConfig on the merged configuration.
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    general: Optional[GeneralConfig] = None
+    custom: Optional[CustomConfig] = None
+    os: Optional[OsConfig] = None
+    splunk_defaults: Optional[SplunkDefaultsConfig] = None
+    splunk_dirs: Optional[SplunkDirsConfig] = None
+    splunk_apps: Optional[SplunkAppsConfig] = None
+    splunk_systemd: Optional[SplunkSystemdConfig] = None
+    splunk_hosts: Optional[List[SplunkHost]] = None
+    splunk_environments: Optional[List[SplunkEnvironment]] = None
+    splunk_idxclusters: Optional[List[IdxClusterConfig]] = None
+    splunk_shclusters: Optional[List[ShClusterConfig]] = None
+
+
 # =============================================================================
 # Validation helper function
 # =============================================================================
@@ -530,6 +538,27 @@ def validate_config(config_data: Dict[str, Any]) -> SplunkConfig:
         raise ConfigValidationError(e.errors())
 
 
+def validate_fragment(fragment_data: Optional[Dict[str, Any]]) -> ConfigFragment:
+    """
+    Validate the content of an included configuration file against the schema.
+
+    Args:
+        fragment_data: Dictionary loaded from the included file
+
+    Returns:
+        Validated ConfigFragment model instance
+
+    Raises:
+        ConfigValidationError: If validation fails, with detailed error messages
+    """
+    from pydantic import ValidationError
+
+    try:
+        return ConfigFragment.model_validate(fragment_data or {})
+    except ValidationError as e:
+        raise ConfigValidationError(e.errors())
+
+
 def validate_config_file(file_path: str) -> SplunkConfig:
     """
     Validate a configuration file.
@@ -542,6 +571,7 @@ def validate_config_file(file_path: str) -> SplunkConfig:
         
     Raises:
         ConfigValidationError: If validation fails
+        ConfigIncludeError: If an included file is not found or has invalid sections
         FileNotFoundError: If file doesn't exist
         yaml.YAMLError: If YAML parsing fails
     """
@@ -549,5 +579,16 @@ def validate_config_file(file_path: str) -> SplunkConfig:
     
     with open(file_path, 'r') as f:
         config_data = yaml.safe_load(f)
+
+    if isinstance(config_data, dict) and config_data.get('include'):
+        from config_include import include_paths, check_fragment, merge_fragments
+        fragments = []
+        for path in include_paths(file_path, config_data['include']):
+            with open(path, 'r') as f:
+                fragment = yaml.safe_load(f)
+            check_fragment(path, fragment)
+            validate_fragment(fragment)
+            fragments.append(fragment)
+        config_data = merge_fragments(config_data, fragments)
     
     return validate_config(config_data)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Build step for the compiled validation of splunk_config.yml.
+
+Exports the pydantic models of schema.py to JSON Schema and generates
+schema_validator.py from it, plain Python functions for the structural checks,
+which need neither pydantic nor a JSON Schema library. The rules between the
+fields are applied from schema_rules.py. Run it after changing schema.py:
+
+    python ansible/plugins/inventory/schema_compiler.py
+
+The generated checks are stricter than pydantic, they accept only the exact
+types (no '1' for an integer or 'yes' for a boolean) and return False instead
+of errors. The plugin validates a config rejected by them with pydantic, which
+stays the source of truth and reports the errors. Field validators of the
+models are not exported, their checks need to be a Field constraint or in
+schema_rules.py.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+plugin_dir = os.path.dirname(os.path.abspath(__file__))
+if plugin_dir not in sys.path:
+    sys.path.insert(0, plugin_dir)
+
+SCHEMA_FILE = os.path.join(plugin_dir, 'schema.py')
+VALIDATOR_FILE = os.path.join(plugin_dir, 'schema_validator.py')
+JSON_SCHEMA_FILE = os.path.join(plugin_dir, 'splunk_config.schema.json')
+
+# Models with a public check function in the generated module
+ROOT_MODELS = ['SplunkConfig', 'ConfigFragment']
+
+# JSON Schema keywords without influence on the validation
+ANNOTATIONS = {'title', 'description', 'default'}
+TYPE_CHECKS = {'string': 'str', 'integer': 'int', 'boolean': 'bool', 'array': 'list', 'object': 'dict'}
+
+
+class SchemaCompileError(Exception):
+    """Raised for JSON Schema constructs the compiler does not support."""
+
+
+def schema_digest():
+    """Return the sha256 hash of schema.py."""
+    with open(SCHEMA_FILE, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def json_schemas():
+    """Return the JSON Schema of every root model."""
+    import schema
+    return {name: getattr(schema, name).model_json_schema() for name in ROOT_MODELS}
+
+
+class Compiler:
+    """Translate JSON Schema nodes to Python expressions."""
+
+    def __init__(self):
+        self.constants = []
+        self.functions = {}
+        self.definitions = {}
+
+    def constant(self, prefix, code):
+        name = '_%s_%d' % (prefix, len(self.constants))
+        self.constants.append('%s = %s' % (name, code))
+        return name
+
+    def pattern(self, pattern):
+        # pydantic matches with the rust regex crate, where $ is only the end of the string
+        if '$' in pattern.rstrip('$') or pattern.endswith('\\$'):
+            raise SchemaCompileError('Unsupported pattern: %s' % pattern)
+        if pattern.endswith('$'):
+            pattern = pattern[:-1] + r'\Z'
+        return self.constant('PATTERN', 're.compile(%r)' % pattern)
+
+    def expression(self, node, var, depth=0):
+        """Return a Python expression, which is true if var is valid for the node."""
+        unknown = set(node) - ANNOTATIONS - {'$ref', 'anyOf', 'type', 'enum', 'pattern', 'minimum', 'maximum',
+                                              'minItems', 'items', 'properties', 'required', 'additionalProperties'}
+        if unknown:
+            raise SchemaCompileError('Unsupported JSON Schema keywords: %s' % ', '.join(sorted(unknown)))
+        if '$ref' in node:
+            name = node['$ref'].split('/')[-1]
+            if 'properties' not in self.definitions[name]:
+                # Enums and other simple definitions are checked inline
+                return '(%s)' % self.expression(self.definitions[name], var, depth)
+            return '%s(%s)' % (self.model_function(name), var)
+        if 'anyOf' in node:
+            return '(%s)' % ' or '.join(self.expression(option, var, depth) for option in node['anyOf'])
+        if 'properties' in node:
+            raise SchemaCompileError('Unsupported object with properties outside of $defs')
+        if 'type' not in node:
+            if set(node) - ANNOTATIONS:
+                raise SchemaCompileError('Unsupported schema without type: %s' % node)
+            return 'True'
+
+        node_type = node['type']
+        if node_type == 'null':
+            return '%s is None' % var
+        if node_type not in TYPE_CHECKS:
+            raise SchemaCompileError('Unsupported type: %s' % node_type)
+        checks = ['type(%s) is %s' % (var, TYPE_CHECKS[node_type])]
+        if 'enum' in node:
+            checks.append('%s in %s' % (var, self.constant('ENUM', 'frozenset(%r)' % sorted(node['enum']))))
+        if 'pattern' in node:
+            checks.append('%s.search(%s) is not None' % (self.pattern(node['pattern']), var))
+        if 'minimum' in node:
+            checks.append('%s >= %r' % (var, node['minimum']))
+        if 'maximum' in node:
+            checks.append('%s <= %r' % (var, node['maximum']))
+        if 'minItems' in node:
+            checks.append('len(%s) >= %d' % (var, node['minItems']))
+        if 'items' in node:
+            item = 'v%d' % (depth + 1)
+            checks.append('all(%s for %s in %s)' % (self.expression(node['items'], item, depth + 1), item, var))
+        if node_type == 'object':
+            additional = node.get('additionalProperties', True)
+            item = 'v%d' % (depth + 1)
+            if additional is True:
+                checks.append('all(type(k) is str for k in %s)' % var)
+            elif additional is False:
+                checks.append('not %s' % var)
+            else:
+                checks.append('all(type(k) is str and %s for k, %s in %s.items())'
+                              % (self.expression(additional, item, depth + 1), item, var))
+        return ' and '.join(checks)
+
+    def model_function(self, name):
+        """Return the name of the check function of a $defs entry, generated on first use."""
+        function = '_check_%s' % name
+        if function in self.functions:
+            return function
+        self.functions[function] = None
+        self.functions[function] = self.model_code(function, self.definitions[name])
+        return function
+
+    def model_code(self, function, node):
+        entries = ['    %r: lambda v: %s,\n' % (key, self.expression(value, 'v'))
+                   for key, value in node['properties'].items()]
+        properties = '_PROPERTIES_%s' % function[len('_check_'):]
+        self.constants.append('%s = {%s}' % (properties, '\n' + ''.join(entries) if entries else ''))
+
+        additional = node.get('additionalProperties', True)
+        if additional is True:
+            unknown = 'if type(key) is not str:\n                return False'
+        elif additional is False:
+            unknown = 'return False'
+        else:
+            unknown = 'if type(key) is not str or not (%s):\n                return False' % self.expression(additional, 'item', 1)
+        required = ''.join('    if %r not in v:\n        return False\n' % key for key in node.get('required', []))
+        return (
+            'def %s(v):\n'
+            '    if type(v) is not dict:\n'
+            '        return False\n'
+            '%s'
+            '    for key, item in v.items():\n'
+            '        check = %s.get(key)\n'
+            '        if check is None:\n'
+            '            %s\n'
+            '        elif not check(item):\n'
+            '            return False\n'
+            '    return True\n'
+        ) % (function, required, properties, unknown)
+
+    def root(self, name, node):
+        """Compile a root model, its $defs are compiled on first use."""
+        self.definitions.update(node.get('$defs', {}))
+        self.definitions[name] = {key: value for key, value in node.items() if key != '$defs'}
+        return self.model_function(name)
+
+
+def generate(schemas=None, digest=None):
+    """Return the source of schema_validator.py."""
+    schemas = schemas or json_schemas()
+    compiler = Compiler()
+    roots = {name: compiler.root(name, schemas[name]) for name in ROOT_MODELS}
+    roles = schemas['SplunkConfig']['$defs']['AllowedRole']['enum']
+
+    return '\n'.join([
+        '# Generated by schema_compiler.py from schema.py, do not edit',
+        '"""',
+        'Compiled structural checks of splunk_config.yml.',
+        '',
+        'check_config and check_fragment return True, if a config passes the checks',
+        'exported from the pydantic models and the rules of schema_rules.py. A config',
+        'rejected by them is validated with pydantic, to get the errors.',
+        '"""',
+        '',
+        'import re',
+        '',
+        'import schema_rules',
+        '',
+        'SCHEMA_DIGEST = %r' % (digest or schema_digest()),
+        'ROLES = %r' % roles,
+        '',
+        '\n'.join(compiler.constants),
+        '',
+        '',
+        '\n\n'.join(code for code in compiler.functions.values()),
+        '',
+        'def check_config(config):',
+        '    """Return True, if the config passes the structural checks and the rules."""',
+        '    if not %s(config):' % roots['SplunkConfig'],
+        '        return False',
+        '    try:',
+        '        schema_rules.check_config(config, ROLES)',
+        '    except Exception:',
+        '        return False',
+        '    return True',
+        '',
+        '',
+        'def check_fragment(fragment):',
+        '    """Return True, if an included config file passes the structural checks and the host rules."""',
+        '    fragment = {} if fragment is None else fragment',
+        '    if not %s(fragment):' % roots['ConfigFragment'],
+        '        return False',
+        '    try:',
+        '        schema_rules.check_fragment(fragment)',
+        '    except Exception:',
+        '        return False',
+        '    return True',
+        '',
+    ])
+
+
+def generate_json_schema(schemas=None):
+    """Return the JSON Schema of splunk_config.yml, for editors and other tools."""
+    schemas = schemas or json_schemas()
+    return json.dumps(schemas['SplunkConfig'], indent=2, sort_keys=True) + '\n'
+
+
+def main():
+    schemas = json_schemas()
+    for path, content in [(VALIDATOR_FILE, generate(schemas)), (JSON_SCHEMA_FILE, generate_json_schema(schemas))]:
+        with open(path, 'w') as f:
+            f.write(content)
+        print('Wrote %s' % os.path.relpath(path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Validation rules for splunk_config.yml, which JSON Schema can't express.
+
+The rules work on plain values. The pydantic models in schema.py call them from
+their validators, and check_config applies them to a config that passed the
+compiled structural checks of schema_validator.py, without importing pydantic.
+This module has no dependencies besides host_range.py.
+"""
+
+from host_range import HostRange, HostRangeError
+
+# Roles that are allowed to have a 'site' variable
+ROLES_WITH_SITE = ['indexer', 'cluster_manager', 'search_head']
+
+
+def iteration_hosts(iteration):
+    """Return the HostRange of an iter section, given as dict without None values."""
+    if ('numbers' in iteration) == ('ranges' in iteration):
+        raise ValueError("Iteration must have exactly one of: 'numbers' or 'ranges'")
+    try:
+        hosts = HostRange.from_config(iteration)
+    except HostRangeError as e:
+        raise ValueError(str(e))
+    if len(hosts) == 0:
+        raise ValueError("Iteration does not generate any hosts")
+    return hosts
+
+
+def check_host_identifier(name, host_list, iteration):
+    """Ensure exactly one of name, list, or iter is specified."""
+    count = (name is not None) + (host_list is not None) + (iteration is not None)
+    if count == 0:
+        raise ValueError("Host must have exactly one of: 'name', 'list', or 'iter'")
+    if count > 1:
+        raise ValueError("Host cannot have multiple identifiers. Use only one of: 'name', 'list', or 'iter'")
+
+
+def check_site_roles(site, roles):
+    """Ensure 'site' is only used with allowed roles."""
+    if site is not None and not any(role in ROLES_WITH_SITE for role in roles):
+        raise ValueError(f"'site' is only allowed for roles: {', '.join(ROLES_WITH_SITE)}")
+
+
+def check_cluster_manager_idxcluster(roles, idxcluster):
+    """Ensure cluster_manager role has idxcluster specified."""
+    if 'cluster_manager' in roles and not idxcluster:
+        raise ValueError("'idxcluster' must be specified for hosts with role 'cluster_manager'")
+
+
+class TopologySummary:
+    """
+    Host counts of all splunk_hosts, collected in a single pass.
+
+    The hosts are dicts with count, roles (role names), site, idxcluster,
+    shcluster and splunk_env.
+
+    Attributes:
+        role_counts: Number of hosts per role
+        idxc_members: Number of indexers per idxcluster
+        shc_members: Number of search heads per shcluster
+        site_counts: Number of hosts per site
+        idxcluster_refs: Referenced idxcluster names with the index of the first host entry
+        shcluster_refs: Referenced shcluster names with the index of the first host entry
+        splunk_env_refs: Referenced splunk_env names with the index of the first host entry
+    """
+
+    def __init__(self, hosts, roles):
+        self.role_counts = dict.fromkeys(roles, 0)
+        self.idxc_members = {}
+        self.shc_members = {}
+        self.site_counts = {}
+        self.idxcluster_refs = {}
+        self.shcluster_refs = {}
+        self.splunk_env_refs = {}
+
+        for index, host in enumerate(hosts):
+            count = host['count']
+            for role in set(host['roles']):
+                self.role_counts[role] += count
+            if host['site']:
+                self.site_counts[host['site']] = self.site_counts.get(host['site'], 0) + count
+            if host['idxcluster']:
+                self.idxcluster_refs.setdefault(host['idxcluster'], index)
+                if 'indexer' in host['roles']:
+                    self.idxc_members[host['idxcluster']] = self.idxc_members.get(host['idxcluster'], 0) + count
+            if host['shcluster']:
+                self.shcluster_refs.setdefault(host['shcluster'], index)
+                if 'search_head' in host['roles']:
+                    self.shc_members[host['shcluster']] = self.shc_members.get(host['shcluster'], 0) + count
+            if host['splunk_env']:
+                self.splunk_env_refs.setdefault(host['splunk_env'], index)
+
+
+def check_deployer_requires_shc(topology):
+    """Ensure a deployer has at least 3 search heads, if search heads are defined."""
+    search_head_count = topology.role_counts['search_head']
+    if topology.role_counts['deployer'] > 0 and 0 < search_head_count < 3:
+        raise ValueError(
+            f"A deployer requires a Search Head Cluster with at least 3 search heads. "
+            f"Found {search_head_count} search head(s)."
+        )
+
+
+def check_shc_members(topology):
+    """Ensure at least 3 search heads have shcluster specified, when a deployer exists."""
+    shc_member_count = sum(topology.shc_members.values())
+    if topology.role_counts['deployer'] > 0 and shc_member_count < 3:
+        raise ValueError(
+            f"When a deployer is defined, at least 3 search heads must have 'shcluster' specified. "
+            f"Found {shc_member_count} search head(s) with shcluster."
+        )
+
+
+def check_idxc_members(topology):
+    """Ensure at least 2 indexers have idxcluster specified, when a cluster_manager exists."""
+    idxc_member_count = sum(topology.idxc_members.values())
+    if topology.role_counts['cluster_manager'] > 0 and idxc_member_count < 2:
+        raise ValueError(
+            f"When a cluster_manager is defined, at least 2 indexers must have 'idxcluster' specified. "
+            f"Found {idxc_member_count} indexer(s) with idxcluster."
+        )
+
+
+def check_license_file(topology, license_file):
+    """Ensure splunk_license_file is defined in splunk_defaults, when a license_manager exists."""
+    if topology.role_counts['license_manager'] > 0 and license_file is None:
+        raise ValueError(
+            "When a license_manager role is defined, 'splunk_license_file' must be specified "
+            "in splunk_defaults."
+        )
+
+
+def check_cluster_references(topology, idxclusters, shclusters, environments):
+    """
+    Ensure the clusters and environments used by the hosts are defined.
+
+    Every idxcluster must be in idxclusters. The shcluster and splunk_env names
+    are checked, if shclusters or environments are not None.
+    """
+    references = [('idxcluster', topology.idxcluster_refs, 'splunk_idxclusters', idxclusters or [])]
+    if shclusters is not None:
+        references.append(('shcluster', topology.shcluster_refs, 'splunk_shclusters', shclusters))
+    if environments is not None:
+        references.append(('splunk_env', topology.splunk_env_refs, 'splunk_environments', environments))
+
+    for key, used, section, defined in references:
+        defined = set(defined)
+        missing = [f"'{name}' (splunk_hosts[{index}])" for name, index in used.items() if name not in defined]
+        if missing:
+            raise ValueError(f"{key} {', '.join(missing)} not defined in {section}")
+
+
+def host_summary(host):
+    """Return the summary of a splunk_hosts entry for TopologySummary, without applying the host rules."""
+    host_list = host.get('list')
+    iteration = host.get('iter')
+    if host_list is not None:
+        count = len(host_list)
+    elif iteration is not None:
+        count = len(iteration_hosts({key: value for key, value in iteration.items() if value is not None}))
+    else:
+        count = 1
+    return {'count': count, 'roles': host['roles'], 'site': host.get('site'), 'idxcluster': host.get('idxcluster'),
+            'shcluster': host.get('shcluster'), 'splunk_env': host.get('splunk_env')}
+
+
+def check_host(host):
+    """Apply the host rules to a splunk_hosts entry and return its summary for TopologySummary."""
+    check_host_identifier(host.get('name'), host.get('list'), host.get('iter'))
+    roles = host['roles']
+    site = host.get('site')
+    if site is not None:
+        check_site_roles(site, roles)
+    check_cluster_manager_idxcluster(roles, host.get('idxcluster'))
+    return host_summary(host)
+
+
+def _names(entries, key):
+    return None if entries is None else [entry[key] for entry in entries]
+
+
+def check_config(config, roles):
+    """
+    Apply all rules to a config, which passed the structural checks.
+
+    Raises ValueError for the first broken rule.
+    """
+    _check_topology(TopologySummary([check_host(host) for host in config['splunk_hosts']], roles), config)
+
+
+def check_merged_config(config, roles):
+    """
+    Apply the rules between the files to a config merged from included files,
+    which passed the structural checks and the host rules on their own.
+
+    Raises ValueError for the first broken rule.
+    """
+    if not config.get('splunk_hosts'):
+        raise ValueError("splunk_hosts: at least one host is required")
+    _check_topology(TopologySummary([host_summary(host) for host in config['splunk_hosts']], roles), config)
+
+
+def _check_topology(topology, config):
+    """Apply the rules on the host counts and the cluster references of the whole config."""
+    check_deployer_requires_shc(topology)
+    check_shc_members(topology)
+    check_idxc_members(topology)
+    check_license_file(topology, (config.get('splunk_defaults') or {}).get('splunk_license_file'))
+    check_cluster_references(topology, _names(config.get('splunk_idxclusters'), 'idxc_name'),
+                             _names(config.get('splunk_shclusters'), 'shc_name'),
+                             _names(config.get('splunk_environments'), 'splunk_env_name'))
+
+
+def check_fragment(fragment):
+    """Apply the host rules to an included config file, which passed the structural checks."""
+    for host in (fragment or {}).get('splunk_hosts') or []:
+        check_host(host)
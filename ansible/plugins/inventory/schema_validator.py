@@ -0,0 +1,584 @@
+# Generated by schema_compiler.py from schema.py, do not edit
+"""
+Compiled structural checks of splunk_config.yml.
+
+check_config and check_fragment return True, if a config passes the checks
+exported from the pydantic models and the rules of schema_rules.py. A config
+rejected by them is validated with pydantic, to get the errors.
+"""
+
+import re
+
+import schema_rules
+
+SCHEMA_DIGEST = 'dc2d4b761bbea0ff0d5857cf79cab853a920283bc21a20bc9d6107f76aef8feb'
+ROLES = ['cluster_manager', 'deployer', 'deployment_server', 'heavy_forwarder', 'indexer', 'license_manager', 'monitoring_console', 'search_head', 'universal_forwarder', 'universal_forwarder_windows']
+
+_PATTERN_0 = re.compile('^splunk-platform-automator\\Z')
+_PATTERN_1 = re.compile('^\\d+\\.\\.\\d+(/\\d+)?\\Z')
+_PROPERTIES_HostIteration = {
+    'prefix': lambda v: (type(v) is str or v is None),
+    'numbers': lambda v: (type(v) is str and _PATTERN_1.search(v) is not None or v is None),
+    'ranges': lambda v: (type(v) is list and len(v) >= 1 and all((type(v1) is str or type(v1) is list and all(type(v2) is str for v2 in v1)) for v1 in v) or v is None),
+    'separator': lambda v: (type(v) is str or v is None),
+    'exclude': lambda v: (type(v) is list and all(type(v1) is str for v1 in v) or v is None),
+    'postfix': lambda v: (type(v) is str or v is None),
+}
+_ENUM_3 = frozenset(['cluster_manager', 'deployer', 'deployment_server', 'heavy_forwarder', 'indexer', 'license_manager', 'monitoring_console', 'search_head', 'universal_forwarder', 'universal_forwarder_windows'])
+_PATTERN_4 = re.compile('^(upload|seeder|http)\\Z')
+_PROPERTIES_SplunkSoftwareDistributionConfig = {
+    'mode': lambda v: (type(v) is str and _PATTERN_4.search(v) is not None or v is None),
+    'seed_group': lambda v: (type(v) is str or v is None),
+    'port': lambda v: (type(v) is int and v >= 1 and v <= 65535 or v is None),
+    'http_host': lambda v: (type(v) is str or v is None),
+    'timeout': lambda v: (type(v) is int and v >= 1 or v is None),
+}
+_PROPERTIES_OsConfig = {
+    'remote_command': lambda v: (type(v) is str or v is None),
+    'time_zone': lambda v: (type(v) is str or v is None),
+    'enable_time_sync_cron': lambda v: (type(v) is bool or v is None),
+    'packages': lambda v: (type(v) is list and all(type(v1) is str for v1 in v) or v is None),
+    'set_hostname': lambda v: (type(v) is bool or v is None),
+    'disable_selinux': lambda v: (type(v) is bool or v is None),
+    'disable_apparmor': lambda v: (type(v) is bool or v is None),
+    'update_hosts_file': lambda v: (type(v) is bool or v is None),
+    'splunk_group_create': lambda v: (type(v) is bool or v is None),
+    'splunk_user_create': lambda v: (type(v) is bool or v is None),
+}
+_PROPERTIES_VirtualBoxSyncedFolder = {
+    'source': lambda v: type(v) is str,
+    'target': lambda v: type(v) is str,
+}
+_PROPERTIES_VirtualBoxConfig = {
+    'start_ip': lambda v: (type(v) is str or v is None),
+    'box': lambda v: (type(v) is str or v is None),
+    'memory': lambda v: (type(v) is int and v >= 256 or v is None),
+    'cpus': lambda v: (type(v) is int and v >= 1 or v is None),
+    'install_vbox_additions': lambda v: (type(v) is bool or v is None),
+    'synced_folder': lambda v: (type(v) is list and all(_check_VirtualBoxSyncedFolder(v1) for v1 in v) or v is None),
+}
+_PROPERTIES_CustomConfig = {}
+_PROPERTIES_AwsTerraformConfig = {
+    'region': lambda v: (type(v) is str or v is None),
+    'ami_id': lambda v: (type(v) is str or v is None),
+    'key_name': lambda v: (type(v) is str or v is None),
+    'ssh_private_key_file': lambda v: (type(v) is str or v is None),
+    'security_group_names': lambda v: (type(v) is list and all(type(v1) is str for v1 in v) or v is None),
+    'instance_type': lambda v: (type(v) is str or v is None),
+    'root_volume_size': lambda v: (type(v) is int and v >= 8 or v is None),
+    'tags': lambda v: (type(v) is dict and all(type(k) is str and type(v1) is str for k, v1 in v.items()) or v is None),
+}
+_PROPERTIES_TerraformConfig = {
+    'aws': lambda v: (_check_AwsTerraformConfig(v) or v is None),
+}
+_PROPERTIES_SplunkHost = {
+    'name': lambda v: (type(v) is str or v is None),
+    'list': lambda v: (type(v) is list and all(type(v1) is str for v1 in v) or v is None),
+    'iter': lambda v: (_check_HostIteration(v) or v is None),
+    'roles': lambda v: type(v) is list and len(v) >= 1 and all((type(v1) is str and v1 in _ENUM_3) for v1 in v),
+    'splunk_env': lambda v: (type(v) is str or v is None),
+    'site': lambda v: (type(v) is str or v is None),
+    'cname': lambda v: (type(v) is str or v is None),
+    'idxcluster': lambda v: (type(v) is str or v is None),
+    'shcluster': lambda v: (type(v) is str or v is None),
+    'ip_addr': lambda v: (type(v) is str or v is None),
+    'splunk_version': lambda v: (type(v) is str or v is None),
+    'splunk_architecture': lambda v: (type(v) is str or v is None),
+    'splunk_admin_password': lambda v: (type(v) is str or v is None),
+    'splunk_license_file': lambda v: (type(v) is str or v is None),
+    'splunk_outputs': lambda v: (type(v) is str or v is None),
+    'splunk_search_peers': lambda v: (type(v) is str or v is None),
+    'splunk_conf': lambda v: (type(v) is dict and all(type(k) is str and type(v1) is dict and all(type(k) is str for k in v1) for k, v1 in v.items()) or v is None),
+    'splunk_fips': lambda v: (type(v) is bool or v is None),
+    'splunk_software_distribution': lambda v: (_check_SplunkSoftwareDistributionConfig(v) or v is None),
+    'os': lambda v: (_check_OsConfig(v) or v is None),
+    'aws': lambda v: (type(v) is dict and all(type(k) is str for k in v) or v is None),
+    'virtualbox': lambda v: (_check_VirtualBoxConfig(v) or v is None),
+    'custom': lambda v: (_check_CustomConfig(v) or v is None),
+    'terraform': lambda v: (_check_TerraformConfig(v) or v is None),
+}
+_PATTERN_13 = re.compile('^[a-z]{2}[_-][A-Z]{2}\\Z')
+_PROPERTIES_GeneralConfig = {
+    'url_locale': lambda v: (type(v) is str and _PATTERN_13.search(v) is not None or v is None),
+    'precompute_topology': lambda v: (type(v) is bool or v is None),
+    'hoist_host_vars': lambda v: (type(v) is bool or v is None),
+}
+_PATTERN_15 = re.compile('^(amd64|x86_64|arm64)\\Z')
+_PROPERTIES_SplunkDownloadConfig = {
+    'splunk': lambda v: (type(v) is bool or v is None),
+    'splunkforwarder': lambda v: (type(v) is bool or v is None),
+}
+_PROPERTIES_SplunkVolumeConfig = {
+    'path': lambda v: (type(v) is str or v is None),
+    'maxVolumeDataSizeMB': lambda v: (type(v) is int or v is None),
+}
+_PROPERTIES_SplunkVolumeDefaultsConfig = {
+    'VolumeDataSize_Free_MB': lambda v: (type(v) is int or v is None),
+    'homePath': lambda v: (type(v) is str or v is None),
+    'coldPath': lambda v: (type(v) is str or v is None),
+}
+_PROPERTIES_SplunkSslEndpointConfig = {
+    'enable': lambda v: (type(v) is bool or v is None),
+    'own_certs': lambda v: (type(v) is bool or v is None),
+    'config': lambda v: (type(v) is dict and all(type(k) is str for k in v) or v is None),
+}
+_PROPERTIES_SplunkSslConfig = {
+    'web': lambda v: (_check_SplunkSslEndpointConfig(v) or v is None),
+    'inputs': lambda v: (_check_SplunkSslEndpointConfig(v) or v is None),
+    'outputs': lambda v: (_check_SplunkSslEndpointConfig(v) or v is None),
+}
+_PROPERTIES_SplunkSecretShareConfig = {
+    'splunk': lambda v: (type(v) is bool or v is None),
+    'splunkforwarder': lambda v: (type(v) is bool or v is None),
+    'equal': lambda v: (type(v) is bool or v is None),
+}
+_PROPERTIES_SplunkDefaultsConfig = {
+    'splunk_env_name': lambda v: (type(v) is str or v is None),
+    'splunk_version': lambda v: (type(v) is str or v is None),
+    'splunk_architecture': lambda v: (type(v) is str and _PATTERN_15.search(v) is not None or v is None),
+    'splunk_fips': lambda v: (type(v) is bool or v is None),
+    'splunk_download': lambda v: (_check_SplunkDownloadConfig(v) or v is None),
+    'splunk_software_distribution': lambda v: (_check_SplunkSoftwareDistributionConfig(v) or v is None),
+    'splunk_admin_password': lambda v: (type(v) is str or v is None),
+    'splunk_license_file': lambda v: (type(v) is str or type(v) is list and all(type(v1) is str for v1 in v) or v is None),
+    'splunk_license_server': lambda v: (type(v) is str or v is None),
+    'splunk_set_servername': lambda v: (type(v) is bool or v is None),
+    'splunk_set_default_hostname': lambda v: (type(v) is bool or v is None),
+    'splunk_loginpage_print_hostname': lambda v: (type(v) is bool or v is None),
+    'splunk_loginpage_print_userpw': lambda v: (type(v) is bool or v is None),
+    'splunk_loginpage_print_roles': lambda v: (type(v) is bool or v is None),
+    'splunk_use_policykit': lambda v: (type(v) is bool or v is None),
+    'splunk_kv_store_engine_wiredtiger': lambda v: (type(v) is bool or v is None),
+    'splunk_conf': lambda v: (type(v) is dict and all(type(k) is str and type(v1) is dict and all(type(k) is str for k in v1) for k, v1 in v.items()) or v is None),
+    'splunk_indexes': lambda v: (type(v) is dict and all(type(k) is str for k in v) or v is None),
+    'splunk_indexes_default_paths': lambda v: (type(v) is bool or v is None),
+    'splunk_indexer_volumes': lambda v: (type(v) is dict and all(type(k) is str and _check_SplunkVolumeConfig(v1) for k, v1 in v.items()) or v is None),
+    'splunk_volume_defaults': lambda v: (_check_SplunkVolumeDefaultsConfig(v) or v is None),
+    'splunk_ssl': lambda v: (_check_SplunkSslConfig(v) or v is None),
+    'splunk_secret_share': lambda v: (_check_SplunkSecretShareConfig(v) or v is None),
+}
+_PROPERTIES_SplunkDirsConfig = {
+    'splunk_baseconfig_dir': lambda v: (type(v) is str or v is None),
+    'splunk_software_dir': lambda v: (type(v) is str or v is None),
+}
+_PROPERTIES_SplunkAppsConfig = {
+    'splunk_save_baseconfig_apps_dir': lambda v: (type(v) is str or v is None),
+    'splunk_save_baseconfig_apps': lambda v: (type(v) is bool or v is None),
+    'splunk_save_serverclass': lambda v: (type(v) is bool or v is None),
+}
+_PROPERTIES_SplunkSystemdConfig = {}
+_PROPERTIES_SplunkEnvironment = {
+    'splunk_env_name': lambda v: type(v) is str,
+    'splunk_version': lambda v: (type(v) is str or v is None),
+    'splunk_admin_password': lambda v: (type(v) is str or v is None),
+    'splunk_license_file': lambda v: (type(v) is str or v is None),
+    'splunk_indexes': lambda v: (type(v) is dict and all(type(k) is str for k in v) or v is None),
+}
+_PROPERTIES_IdxClusterConfig = {
+    'idxc_name': lambda v: type(v) is str,
+    'idxc_password': lambda v: (type(v) is str or v is None),
+    'idxc_replication_port': lambda v: (type(v) is int and v >= 1 and v <= 65535 or v is None),
+    'idxc_site_rf': lambda v: (type(v) is str or v is None),
+    'idxc_site_sf': lambda v: (type(v) is str or v is None),
+    'idxc_rf': lambda v: (type(v) is int and v >= 1 or v is None),
+    'idxc_sf': lambda v: (type(v) is int and v >= 1 or v is None),
+    'idxc_discovery_password': lambda v: (type(v) is str or v is None),
+}
+_PROPERTIES_ShClusterConfig = {
+    'shc_name': lambda v: type(v) is str,
+    'shc_site': lambda v: (type(v) is str or v is None),
+    'shc_password': lambda v: (type(v) is str or v is None),
+    'shc_replication_port': lambda v: (type(v) is int and v >= 1 and v <= 65535 or v is None),
+}
+_PROPERTIES_SplunkConfig = {
+    'plugin': lambda v: type(v) is str and _PATTERN_0.search(v) is not None,
+    'splunk_hosts': lambda v: type(v) is list and len(v) >= 1 and all(_check_SplunkHost(v1) for v1 in v),
+    'general': lambda v: (_check_GeneralConfig(v) or v is None),
+    'custom': lambda v: (_check_CustomConfig(v) or v is None),
+    'os': lambda v: (_check_OsConfig(v) or v is None),
+    'virtualbox': lambda v: (_check_VirtualBoxConfig(v) or v is None),
+    'aws': lambda v: (type(v) is dict and all(type(k) is str for k in v) or v is None),
+    'terraform': lambda v: (_check_TerraformConfig(v) or v is None),
+    'splunk_defaults': lambda v: (_check_SplunkDefaultsConfig(v) or v is None),
+    'splunk_dirs': lambda v: (_check_SplunkDirsConfig(v) or v is None),
+    'splunk_apps': lambda v: (_check_SplunkAppsConfig(v) or v is None),
+    'splunk_systemd': lambda v: (_check_SplunkSystemdConfig(v) or v is None),
+    'splunk_environments': lambda v: (type(v) is list and all(_check_SplunkEnvironment(v1) for v1 in v) or v is None),
+    'splunk_idxclusters': lambda v: (type(v) is list and all(_check_IdxClusterConfig(v1) for v1 in v) or v is None),
+    'splunk_shclusters': lambda v: (type(v) is list and all(_check_ShClusterConfig(v1) for v1 in v) or v is None),
+}
+_PROPERTIES_ConfigFragment = {
+    'general': lambda v: (_check_GeneralConfig(v) or v is None),
+    'custom': lambda v: (_check_CustomConfig(v) or v is None),
+    'os': lambda v: (_check_OsConfig(v) or v is None),
+    'splunk_defaults': lambda v: (_check_SplunkDefaultsConfig(v) or v is None),
+    'splunk_dirs': lambda v: (_check_SplunkDirsConfig(v) or v is None),
+    'splunk_apps': lambda v: (_check_SplunkAppsConfig(v) or v is None),
+    'splunk_systemd': lambda v: (_check_SplunkSystemdConfig(v) or v is None),
+    'splunk_hosts': lambda v: (type(v) is list and all(_check_SplunkHost(v1) for v1 in v) or v is None),
+    'splunk_environments': lambda v: (type(v) is list and all(_check_SplunkEnvironment(v1) for v1 in v) or v is None),
+    'splunk_idxclusters': lambda v: (type(v) is list and all(_check_IdxClusterConfig(v1) for v1 in v) or v is None),
+    'splunk_shclusters': lambda v: (type(v) is list and all(_check_ShClusterConfig(v1) for v1 in v) or v is None),
+}
+
+
+def _check_SplunkConfig(v):
+    if type(v) is not dict:
+        return False
+    if 'plugin' not in v:
+        return False
+    if 'splunk_hosts' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkHost(v):
+    if type(v) is not dict:
+        return False
+    if 'roles' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkHost.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_HostIteration(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_HostIteration.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkSoftwareDistributionConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkSoftwareDistributionConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_OsConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_OsConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_VirtualBoxConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_VirtualBoxConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_VirtualBoxSyncedFolder(v):
+    if type(v) is not dict:
+        return False
+    if 'source' not in v:
+        return False
+    if 'target' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_VirtualBoxSyncedFolder.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_CustomConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_CustomConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_TerraformConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_TerraformConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_AwsTerraformConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_AwsTerraformConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_GeneralConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_GeneralConfig.get(key)
+        if check is None:
+            return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkDefaultsConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkDefaultsConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkDownloadConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkDownloadConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkVolumeConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkVolumeConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkVolumeDefaultsConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkVolumeDefaultsConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkSslConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkSslConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkSslEndpointConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkSslEndpointConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkSecretShareConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkSecretShareConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkDirsConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkDirsConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkAppsConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkAppsConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkSystemdConfig(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkSystemdConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_SplunkEnvironment(v):
+    if type(v) is not dict:
+        return False
+    if 'splunk_env_name' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_SplunkEnvironment.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_IdxClusterConfig(v):
+    if type(v) is not dict:
+        return False
+    if 'idxc_name' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_IdxClusterConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_ShClusterConfig(v):
+    if type(v) is not dict:
+        return False
+    if 'shc_name' not in v:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_ShClusterConfig.get(key)
+        if check is None:
+            if type(key) is not str:
+                return False
+        elif not check(item):
+            return False
+    return True
+
+
+def _check_ConfigFragment(v):
+    if type(v) is not dict:
+        return False
+    for key, item in v.items():
+        check = _PROPERTIES_ConfigFragment.get(key)
+        if check is None:
+            return False
+        elif not check(item):
+            return False
+    return True
+
+
+def check_config(config):
+    """Return True, if the config passes the structural checks and the rules."""
+    if not _check_SplunkConfig(config):
+        return False
+    try:
+        schema_rules.check_config(config, ROLES)
+    except Exception:
+        return False
+    return True
+
+
+def check_fragment(fragment):
+    """Return True, if an included config file passes the structural checks and the host rules."""
+    fragment = {} if fragment is None else fragment
+    if not _check_ConfigFragment(fragment):
+        return False
+    try:
+        schema_rules.check_fragment(fragment)
+    except Exception:
+        return False
+    return True
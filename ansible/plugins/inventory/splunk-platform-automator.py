@@ -22,7 +22,54 @@ DOCUMENTATION = r'''
     plugin_type: inventory
     short_description: Returns Ansible inventory from Splunk Platform Automator config file
     description: Returns Ansible inventory from Splunk Platform Automator config file
+    extends_documentation_fragment:
+        - inventory_cache
     options:
+        cache:
+            description:
+                - Toggle to enable/disable the caching of the generated inventory.
+                - The cache is only used as long as the config file, the defaults and the software directories are unchanged.
+            type: bool
+            default: true
+            env:
+                - name: ANSIBLE_INVENTORY_CACHE
+            ini:
+                - section: inventory
+                  key: cache
+        force_validate:
+            description:
+                - Always validate the config file with the schema.
+                - Otherwise the validation is skipped, if the config file was validated successfully before and is unchanged.
+            type: bool
+            default: false
+            env:
+                - name: SPLUNK_FORCE_VALIDATE
+        track_changes:
+            description:
+                - Compare the generated inventory with the one of the previous change and add the added and changed hosts to the group changed_hosts.
+                - The differences are written to inventory/changed_hosts.json.
+            type: bool
+            default: true
+            env:
+                - name: SPLUNK_TRACK_CHANGES
+        export_format:
+            description:
+                - Format of the inventory export for tools not using Ansible, like spash.
+                - The hosts with their roles, clusters, site and connection variables are written to inventory/splunk_inventory.json or .msgpack on each build.
+                - msgpack needs the python library msgpack.
+            type: str
+            default: json
+            choices: ['json', 'msgpack', 'none']
+            env:
+                - name: SPLUNK_EXPORT_FORMAT
+        include:
+            description:
+                - Config files with more sections, as paths or glob patterns relative to this file.
+                - The lists of hosts, environments and clusters are appended, the other sections are merged in the include order.
+                - Each file is parsed and validated on its own, only changed files are parsed and validated again.
+            type: list
+            elements: str
+            required: false
         plugin:
             description: Name of the plugin
             required: true
@@ -85,32 +132,182 @@ DOCUMENTATION = r'''
             required: true
 '''
 
-from ansible.plugins.inventory import BaseInventoryPlugin
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, get_cache_plugin
+from ansible.inventory.data import InventoryData
+from ansible.inventory.helpers import sort_groups
 from ansible.errors import AnsibleError, AnsibleParserError
+from ansible.utils.display import Display
+from ansible import __version__ as ansible_version
 import yaml
 import re
 import glob
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
 import os
+import sys
+import time
 from pathlib import Path
 from collections import abc
 
-# Schema validation imports
-SCHEMA_VALIDATION_AVAILABLE = False
+# Use the libyaml based loader, if available
 try:
-    # Use absolute import with plugin directory in path (works with Ansible plugin loader)
-    import sys
-    import os
-    plugin_dir = os.path.dirname(os.path.abspath(__file__))
-    if plugin_dir not in sys.path:
-        sys.path.insert(0, plugin_dir)
-    from schema import validate_config, ConfigValidationError
-    SCHEMA_VALIDATION_AVAILABLE = True
+    from yaml import CSafeLoader as SafeLoader
 except ImportError:
-    # Graceful fallback if pydantic is not installed
-    pass
+    from yaml import SafeLoader
+
+display = Display()
+
+# Splunk archive names, like splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz or splunkforwarder-9.4.1-e3bdab203ac8-x64-release.msi
+SPLUNK_ARCHIVE_PATTERN = re.compile(r'^(splunk|splunkforwarder)-(.+?)-.+-(?:.inux-(.+)\.tgz|(x64-release\.msi))$')
+
+# Schema validation, schema.py and pydantic are only imported when a config needs to be validated
+# Use absolute import with plugin directory in path (works with Ansible plugin loader)
+plugin_dir = os.path.dirname(os.path.abspath(__file__))
+if plugin_dir not in sys.path:
+    sys.path.insert(0, plugin_dir)
+SCHEMA_FILES = [os.path.join(plugin_dir, name) for name in ['schema.py', 'schema_rules.py', 'schema_validator.py', 'host_range.py', 'config_include.py']]
+# Variables defined for the group all in this dir are never set on the splunk_hosts entry groups
+GROUP_VARS_DIR = os.path.join(plugin_dir, '..', '..', 'group_vars')
+# Graceful fallback if pydantic is not installed
+SCHEMA_VALIDATION_AVAILABLE = importlib.util.find_spec('pydantic') is not None
+
+import schema_rules
+from host_range import HostRange, HostRangeError
+from inventory_export import combine_config_hash, is_connection_var, write_export, EXPORT_FILES
+from config_include import include_paths, check_fragment, merge_fragments, ConfigIncludeError, ParseCache
+
+# Roles used for the role_ groups, the same as AllowedRole in schema.py
+ALLOWED_ROLES = ['cluster_manager','deployer','deployment_server','heavy_forwarder','indexer','license_manager','monitoring_console','search_head','universal_forwarder','universal_forwarder_windows']
+
+
+def compiled_validator():
+    '''Return the module schema_validator.py, generated by schema_compiler.py, or None if it is not generated from the current schema.py'''
+    try:
+        import schema_validator
+        with open(os.path.join(plugin_dir, 'schema.py'), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except (ImportError, OSError):
+        return None
+    if schema_validator.SCHEMA_DIGEST != digest:
+        display.vvv('schema_validator.py is outdated, run schema_compiler.py to use the compiled validation')
+        return None
+    return schema_validator
+
+
+def validate_config(config):
+    '''Validate the config with the compiled checks, or the schema from schema.py
+    pydantic is only imported for configs not accepted by the compiled checks, it decides and reports the errors'''
+    validator = compiled_validator()
+    if validator and validator.check_config(config):
+        return None
+    from schema import validate_config as schema_validate_config, ConfigValidationError
+    try:
+        return schema_validate_config(config)
+    except ConfigValidationError as e:
+        raise AnsibleParserError(str(e))
+
+
+def validate_fragment(path, fragment):
+    '''Validate an included config file with the compiled checks, or the schema from schema.py'''
+    validator = compiled_validator()
+    if validator and validator.check_fragment(fragment):
+        return None
+    from schema import validate_fragment as schema_validate_fragment, ConfigValidationError
+    try:
+        return schema_validate_fragment(fragment)
+    except ConfigValidationError as e:
+        raise AnsibleParserError('Included file %s: %s' % (path, e))
+
+
+def check_merged_config(config):
+    '''Check the rules between the files of a config, whose files were validated on their own
+    The merged config is only validated with the schema, if a rule is broken, to report the errors'''
+    try:
+        schema_rules.check_merged_config(config, ALLOWED_ROLES)
+    except (ValueError, KeyError, TypeError):
+        validate_config(config)
+
+
+def diff_inventory(old, new):
+    '''Return the added, removed and changed hosts and groups between two inventory snapshots'''
+    report = {
+        'hosts': {'added': [], 'removed': [], 'changed': {}},
+        'groups': {'added': [], 'removed': [], 'changed': {}},
+    }
+
+    def changed_keys(old_vars, new_vars):
+        keys = []
+        for key in set(old_vars) | set(new_vars):
+            if key not in old_vars or key not in new_vars:
+                keys.append(key)
+            elif old_vars[key] == new_vars[key]:
+                continue
+            elif isinstance(old_vars[key], dict) and isinstance(new_vars[key], dict):
+                # Name the changed keys of dictionaries like splunk_topology
+                keys.extend(key + '.' + subkey for subkey in changed_keys(old_vars[key], new_vars[key]))
+            else:
+                keys.append(key)
+        return sorted(keys)
 
-class InventoryModule(BaseInventoryPlugin):
+    def memberships(snapshot):
+        groups = {}
+        for groupname, group in snapshot['groups'].items():
+            for hostname in group['hosts']:
+                groups.setdefault(hostname, set()).add(groupname)
+        return groups
+
+    changed_group_vars = {}
+    for groupname, group in new['groups'].items():
+        if groupname not in old['groups']:
+            report['groups']['added'].append(groupname)
+            continue
+        keys = changed_keys(old['groups'][groupname]['vars'], group['vars'])
+        if old['groups'][groupname]['priority'] != group['priority']:
+            keys.append('ansible_group_priority')
+        if keys:
+            changed_group_vars[groupname] = keys
+        if keys or old['groups'][groupname]['hosts'] != group['hosts']:
+            report['groups']['changed'][groupname] = keys
+    report['groups']['removed'] = [groupname for groupname in old['groups'] if groupname not in new['groups']]
+
+    old_memberships = memberships(old)
+    new_memberships = memberships(new)
+    for hostname, hostvars in new['hosts'].items():
+        if hostname not in old['hosts']:
+            report['hosts']['added'].append(hostname)
+            continue
+        changes = {}
+        keys = set(changed_keys(old['hosts'][hostname], hostvars))
+        # Changed vars of groups the host is a member of (or was, if the membership changed)
+        groups = new_memberships.get(hostname, set())
+        for groupname in groups | {'all'}:
+            keys.update(changed_group_vars.get(groupname, []))
+        if keys:
+            changes['vars'] = sorted(keys)
+        old_groups = old_memberships.get(hostname, set())
+        if groups != old_groups:
+            changes['groups'] = sorted(['+' + groupname for groupname in groups - old_groups] + ['-' + groupname for groupname in old_groups - groups])
+        if changes:
+            report['hosts']['changed'][hostname] = changes
+    report['hosts']['removed'] = [hostname for hostname in old['hosts'] if hostname not in new['hosts']]
+    return report
+
+
+def schema_version():
+    '''Return the version of the validation rules, without importing pydantic'''
+    digest = hashlib.sha256()
+    for schema_file in SCHEMA_FILES:
+        with open(schema_file, 'rb') as f:
+            digest.update(f.read())
+    return '%s-%s' % (importlib.metadata.version('pydantic'), digest.hexdigest()[:16])
+
+
+class InventoryModule(BaseInventoryPlugin, Cacheable):
     NAME = 'splunk-platform-automator'
+    # The config file is parsed by this plugin, Ansible needs to mark the templates in it as trusted
+    trusted_by_default = True
 
     def verify_file(self, path):
         '''Return true/false if this is possibly a valid file for this plugin to consume'''
@@ -141,41 +338,273 @@ class InventoryModule(BaseInventoryPlugin):
 
         return merged_dict
 
+    def _scan_dir(self, directory):
+        '''Return the entries of a directory as dict name: type, the directory is only scanned once per inventory load'''
+        directory = os.path.normpath(directory)
+        if directory not in self.dir_entries:
+            entries = {}
+            try:
+                with os.scandir(directory) as dir_entries:
+                    for entry in dir_entries:
+                        if entry.is_dir():
+                            entries[entry.name] = 'dir'
+                        elif entry.is_file():
+                            entries[entry.name] = 'file'
+                        else:
+                            entries[entry.name] = 'other'
+            except OSError:
+                pass
+            self.dir_entries[directory] = entries
+        return self.dir_entries[directory]
+
+    def _is_file(self, path):
+        '''Check if a file exists, using the scanned directory entries'''
+        return self._scan_dir(os.path.dirname(path)).get(os.path.basename(path)) == 'file'
+
+    def _splunk_archives(self, directory):
+        '''Return the Splunk archives in a directory as set of (arch_type, splunk_version, splunk_architecture)'''
+        if directory not in self.archives:
+            archives = set()
+            for name, entry_type in self._scan_dir(directory).items():
+                match = SPLUNK_ARCHIVE_PATTERN.match(name)
+                if entry_type != 'file' or not match:
+                    continue
+                arch_type, splunk_version, splunk_architecture, windows = match.groups()
+                if windows:
+                    if arch_type == 'splunkforwarder':
+                        archives.add(('windowsforwarder', splunk_version, None))
+                else:
+                    archives.add((arch_type, splunk_version, splunk_architecture))
+            self.archives[directory] = archives
+        return self.archives[directory]
+
     def _check_splunk_archive(self,arch_type,splunk_architecture,splunk_version,directory):
         '''Check if splunk version archive is available'''
+        if arch_type == 'windowsforwarder':
+            splunk_architecture = None
+        for archive in self._splunk_archives(directory):
+            if archive[0] == arch_type and archive[2] == splunk_architecture and splunk_version in ['latest', archive[1]]:
+                return
         if splunk_version == 'latest':
             search_version = "*"
         else:
             search_version = splunk_version
-        platform = '?inux'
-        suffix = platform+'-'+splunk_architecture+'.tgz'
+        suffix = '?inux-'+str(splunk_architecture)+'.tgz'
         if arch_type == 'windowsforwarder':
             arch_type = 'splunkforwarder'
             suffix = 'x64-release.msi'
-            platform = 'Windows'
         archive_pattern = arch_type+"-"+search_version+"-*-"+suffix
-        check_arch = glob.glob(directory+"/"+archive_pattern)
-        if len(check_arch) < 1:
-            raise AnsibleParserError("Error: No archive found matching pattern '%s' in directory %s" % (archive_pattern,directory))
+        raise AnsibleParserError("Error: No archive found matching pattern '%s' in directory %s" % (archive_pattern,directory))
 
     def _check_requirements(self):
-        '''Check if required python libraries are installed'''
+        '''Check if required python libraries are installed, without importing them'''
         requirements = ['jmespath', 'lxml']
-        missing = []
-        for req in requirements:
-            try:
-                __import__(req)
-            except ImportError:
-                missing.append(req)
+        missing = [req for req in requirements if importlib.util.find_spec(req) is None]
         
         if missing:
             raise AnsibleParserError("Missing required python libraries: {}. Please run 'pip install -r requirements.txt' to install them.".format(", ".join(missing)))
 
-    def _init_inventory(self):
+    def _load_config(self, path):
+        '''Parse the config file and the included files, the result is shared by all the following steps
+        Unchanged files are taken from the parse cache'''
+        parse_cache = ParseCache(os.path.join(self._inventory_dir(), '.splunk_config_parsed.json'))
+        try:
+            config, config_hash = parse_cache.load(path)
+        except Exception as e:
+            raise AnsibleParserError('Cannot read config file {}. Error: {}'.format(path, e))
+        setattr(self, 'config_file_hash', config_hash)
+
+        self.config_fragments = {}
+        if isinstance(config, abc.Mapping) and config.get('include'):
+            try:
+                fragment_paths = include_paths(path, config['include'])
+            except ConfigIncludeError as e:
+                raise AnsibleParserError(str(e))
+            for fragment_path in fragment_paths:
+                try:
+                    fragment, fragment_hash = parse_cache.load(fragment_path)
+                    check_fragment(fragment_path, fragment)
+                except ConfigIncludeError as e:
+                    raise AnsibleParserError(str(e))
+                except Exception as e:
+                    raise AnsibleParserError('Cannot read included config file {}. Error: {}'.format(fragment_path, e))
+                self.config_fragments[fragment_path] = {'hash': fragment_hash, 'config': fragment}
+            config = merge_fragments(config, [fragment['config'] for fragment in self.config_fragments.values()])
+            config_hash = combine_config_hash(config_hash, {fragment_path: fragment['hash'] for fragment_path, fragment in self.config_fragments.items()})
+        parse_cache.save()
+        setattr(self, 'config_hash', config_hash)
+        return config
+
+    def _set_config_options(self, config):
+        '''Set the plugin options from the parsed config file'''
+        valid_names = getattr(self, '_redirected_names', None) or [self.NAME]
+        if not isinstance(config, abc.Mapping):
+            raise AnsibleParserError('Config file has invalid structure, it should be a dictionary, got: %s' % type(config))
+        if config.get('plugin') not in valid_names:
+            raise AnsibleParserError('Incorrect plugin name in file: %s' % config.get('plugin', 'none found'))
+        self.set_options(direct=config, var_options=self._vars)
+        if self.get_option('cache'):
+            cache_option_keys = [('_uri', 'cache_connection'), ('_timeout', 'cache_timeout'), ('_prefix', 'cache_prefix')]
+            cache_options = dict((opt[0], self.get_option(opt[1])) for opt in cache_option_keys if self.get_option(opt[1]) is not None)
+            self._cache = get_cache_plugin(self.get_option('cache_plugin'), **cache_options)
+
+    def _get_inventory_hash(self, splunk_config):
+        '''Return a hash over everything the generated inventory depends on'''
+        inventory_hash = hashlib.sha256()
+        inventory_hash.update(self.config_hash.encode())
+        inventory_hash.update(json.dumps(self.defaults, sort_keys=True, default=str).encode())
+        inventory_hash.update((os.getcwd() + ansible_version).encode())
+        for plugin_file in [os.path.abspath(__file__)] + SCHEMA_FILES:
+            if os.path.isfile(plugin_file):
+                with open(plugin_file, 'rb') as file:
+                    inventory_hash.update(file.read())
+        # Decides which host variables are set on the splunk_hosts entry groups
+        for groupvars_file in self._groupvars_files():
+            with open(groupvars_file, 'rb') as file:
+                inventory_hash.update(groupvars_file.encode() + file.read())
+
+        # The archives, license files and baseconfig apps are checked in those directories
+        splunk_dirs = self._merge_dict(self.defaults.get('splunk_dirs', {}), splunk_config.get('splunk_dirs') or {})
+        directories = [splunk_dirs.get('splunk_software_dir'), splunk_dirs.get('splunk_baseconfig_dir')]
+        for splunk_env in splunk_config.get('splunk_environments') or []:
+            directories.append(splunk_env.get('splunk_software_dir'))
+        baseconfig_dir = splunk_dirs.get('splunk_baseconfig_dir')
+        if baseconfig_dir and os.path.isdir(baseconfig_dir):
+            directories.extend(entry.path for entry in os.scandir(baseconfig_dir) if entry.is_dir())
+        for directory in directories:
+            if directory and os.path.isdir(directory):
+                inventory_hash.update(('%s:%s' % (directory, os.stat(directory).st_mtime_ns)).encode())
+        return inventory_hash.hexdigest()
+
+    def _dump_inventory(self, inventory):
+        '''Return the groups and hosts of the inventory in a serializable form'''
+        groups = {}
+        for name, group in inventory.groups.items():
+            groups[name] = {'vars': group.vars, 'hosts': [host.name for host in group.hosts], 'priority': group.priority}
+        hosts = {}
+        for name, host in inventory.hosts.items():
+            hosts[name] = {key: val for key, val in host.vars.items() if key not in ['inventory_file', 'inventory_dir']}
+        return {'groups': groups, 'hosts': hosts}
+
+    def _load_inventory(self, data):
+        '''Add the groups and hosts from a dumped inventory'''
+        for groupname in data['groups']:
+            if groupname not in ['all', 'ungrouped']:
+                self.inventory.add_group(groupname)
+        for hostname in data['hosts']:
+            self.inventory.add_host(host=hostname)
+        for groupname, group in data['groups'].items():
+            if groupname not in ['all', 'ungrouped']:
+                for hostname in group['hosts']:
+                    self.inventory.add_host(host=hostname, group=groupname)
+            self._populate_groupvars(group['vars'], groupname)
+            if group.get('priority', 1) != 1:
+                self.inventory.set_variable(groupname, 'ansible_group_priority', group['priority'])
+        for hostname, hostvars in data['hosts'].items():
+            for var, val in hostvars.items():
+                self.inventory.set_variable(hostname, var, val)
+
+    def _track_changes(self, inventory_data):
+        '''Compare the inventory with the snapshot of the previous change and add the group changed_hosts'''
+        inventory_dir = self._inventory_dir()
+        snapshot_file = os.path.join(inventory_dir, '.splunk_inventory_snapshot.json')
+        report_file = os.path.join(inventory_dir, 'changed_hosts.json')
+
+        # Normalized snapshot, compared as JSON string with the one of the previous change
+        snapshot = {'groups': {}, 'hosts': inventory_data['hosts']}
+        for groupname, group in inventory_data['groups'].items():
+            hosts = [] if groupname in ['all', 'ungrouped'] else sorted(group['hosts'])
+            snapshot['groups'][groupname] = {'vars': group['vars'], 'hosts': hosts, 'priority': group['priority']}
+        snapshot_json = json.dumps(snapshot, sort_keys=True, default=str)
+
+        try:
+            with open(snapshot_file, 'r') as f:
+                previous_json = f.read()
+        except OSError:
+            previous_json = None
+
+        report = None
+        if previous_json == snapshot_json:
+            # Nothing changed since the last change, keep its report
+            try:
+                with open(report_file, 'r') as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                pass
+        if report is None:
+            try:
+                previous = json.loads(previous_json)
+            except (TypeError, ValueError):
+                previous = {'groups': {}, 'hosts': {}}
+            report = diff_inventory(previous, json.loads(snapshot_json))
+            report['time'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+            # Not being able to write the files is not an error, the group is still added
+            try:
+                with open(snapshot_file, 'w') as f:
+                    f.write(snapshot_json)
+                with open(report_file, 'w') as f:
+                    json.dump(report, f, indent=2, sort_keys=True)
+            except OSError as e:
+                display.warning('%s: cannot write the inventory changes. Error: %s' % (self.NAME, e))
+            display.v('%s: %d hosts added, %d removed and %d changed, run with --limit changed_hosts to deploy only those' % (
+                self.NAME, len(report['hosts']['added']), len(report['hosts']['removed']), len(report['hosts']['changed'])))
+
+        changed_hosts = [hostname for hostname in report['hosts']['added'] + sorted(report['hosts']['changed']) if hostname in inventory_data['hosts']]
+        inventory_data['groups']['changed_hosts'] = {'vars': {}, 'hosts': changed_hosts, 'priority': 1}
+
+    def _export_inventory(self, export_hosts, only_missing=False):
+        '''Write the inventory export for tools not using Ansible'''
+        export_format = self.get_option('export_format')
+        if export_format == 'none':
+            return
+        if export_format == 'msgpack' and importlib.util.find_spec('msgpack') is None:
+            display.warning('%s: python library msgpack is missing, exporting the inventory as json' % self.NAME)
+            export_format = 'json'
+        inventory_dir = self._inventory_dir()
+        if only_missing and os.path.exists(os.path.join(inventory_dir, EXPORT_FILES[export_format])):
+            return
+        try:
+            write_export(inventory_dir, export_hosts, config_hash=self.config_hash, export_format=export_format,
+                         config_files=list(self.config_fragments))
+        except OSError as e:
+            display.warning('%s: cannot write the inventory export. Error: %s' % (self.NAME, e))
+
+    def _groupvars_files(self):
+        '''Return the group_vars files of the group all, found the same way as by Ansible's host_group_vars plugin'''
+        return self.loader.find_vars_files(GROUP_VARS_DIR, 'all')
+
+    def _groupvars_file_keys(self):
+        '''Return the variable names defined in the group_vars files of the group all, they have precedence over inventory group vars
+        Returns None, if a file cannot be read'''
+        keys = set()
+        for groupvars_file in self._groupvars_files():
+            try:
+                data = self.loader.load_from_file(groupvars_file, cache='none', unsafe=True)
+            except AnsibleError as e:
+                display.vvv('%s: cannot read %s. Error: %s' % (self.NAME, groupvars_file, e))
+                return None
+            if isinstance(data, abc.Mapping):
+                keys.update(data)
+            elif data:
+                return None
+        return keys
+
+    def _log_timing(self, phase, start):
+        '''Show the duration of an inventory phase with -vvv and return the new start time'''
+        end = time.perf_counter()
+        display.vvv('%s: %s took %.3fs' % (self.NAME, phase, end - start))
+        return end
+
+    def _inventory_dir(self):
+        '''Return the path to the inventory dir'''
         # Calculate correct path to inventory dir relative to this script
         # Script location: ansible/plugins/inventory/splunk-platform-automator.py
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        inventory_dir = os.path.join(base_dir, "inventory")
+        return os.path.join(base_dir, "inventory")
+
+    def _init_inventory(self):
+        inventory_dir = self._inventory_dir()
+        base_dir = os.path.dirname(inventory_dir)
 
         if not os.path.isdir(inventory_dir):
             try:
@@ -205,11 +634,70 @@ class InventoryModule(BaseInventoryPlugin):
                 # If symlink fails (e.g. Windows), we might warn but usually ignored
                 pass            
 
+    def _validate_config(self, raw_config):
+        '''Validate the config with the schema, unless it was validated successfully before and is unchanged
+        If only included files changed, they are validated on their own and only the rules between the files
+        are checked on the merged config. Otherwise the merged config is validated with the schema.
+        Returns True, if the validation was done'''
+        stamp = {'config_hash': self.config_hash, 'schema_version': schema_version(), 'config_file': self.config_file_hash,
+                 'fragments': {path: fragment['hash'] for path, fragment in self.config_fragments.items()}}
+        stamp_file = os.path.join(self._inventory_dir(), '.splunk_config_validated.json')
+        previous = {}
+        if not self.get_option('force_validate'):
+            try:
+                with open(stamp_file, 'r') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if previous == stamp:
+                display.vvv('%s: config is unchanged since the last validation, skipping schema validation' % self.NAME)
+                return False
+        validated = {}
+        config_file_validated = False
+        if isinstance(previous, abc.Mapping) and previous.get('schema_version') == stamp['schema_version']:
+            validated = previous.get('fragments') or {}
+            config_file_validated = previous.get('config_file') == stamp['config_file']
+        changed = [path for path, fragment in self.config_fragments.items() if validated.get(path) != fragment['hash']]
+
+        try:
+            if self.config_fragments and config_file_validated:
+                for path in changed:
+                    validate_fragment(path, self.config_fragments[path]['config'])
+                check_merged_config(raw_config)
+            else:
+                try:
+                    validate_config(raw_config)
+                except AnsibleParserError:
+                    # Report the errors of an included file with its name
+                    for path in changed:
+                        validate_fragment(path, self.config_fragments[path]['config'])
+                    raise
+        except AnsibleParserError:
+            raise
+        except Exception as e:
+            raise AnsibleParserError(f"Failed to validate configuration: {e}")
+
+        # Remember the successful validation, not being able to write the stamp is not an error
+        try:
+            with open(stamp_file, 'w') as f:
+                json.dump(stamp, f)
+        except OSError:
+            pass
+        return True
+
+    def _init_auth_dir(self, settings):
+        '''Create the auth dir, if not existing and needed for the splunk.secret files'''
+        splunk_auth_dir = os.path.join(os.getcwd(),"ansible",settings['splunk_auth_dir'])
+        if settings['splunk_secret_share']['splunk'] == True or settings['splunk_secret_share']['splunkforwarder'] == True:
+            if not os.path.isdir(splunk_auth_dir):
+                try:
+                    os.mkdir(splunk_auth_dir)
+                except Exception as e:
+                    raise AnsibleParserError('Cannot create auth directory. Error: {}'.format(e))
+
     def _set_virtualization(self, splunk_config):
         '''Set virtualization type based on the definition in the config file'''
         setattr(self, 'virtualization', None)
-        with open(splunk_config,"r") as file:
-            splunk_config = yaml.load(file, Loader=yaml.FullLoader)
         supported_virtualizations = ['virtualbox','aws']
         for virtualization in supported_virtualizations:
             if virtualization in splunk_config:
@@ -220,7 +708,7 @@ class InventoryModule(BaseInventoryPlugin):
         defaults = {}
         for file in glob.glob("defaults/*.yml"):
             with open(file,"r") as configfile:
-              file_content = yaml.load(configfile, Loader=yaml.FullLoader)
+              file_content = yaml.load(configfile, Loader=SafeLoader)
             stanza=Path(file).resolve().stem
             defaults[stanza] = file_content[stanza]
         setattr(self, 'defaults', defaults)
@@ -234,6 +722,89 @@ class InventoryModule(BaseInventoryPlugin):
             #print("Adding var: ", var)
             self.inventory.set_variable(groupname, var, vardict[var])
 
+    def _populate_topology(self, roles):
+        '''Precompute the topology lists from group_vars/all/dynamic.yml once per splunk_env
+        and add them as splunk_topology variable to the splunk_env groups'''
+        role_hosts = {role: set(hosts) for role, hosts in roles.items()}
+        cluster_managers = role_hosts['cluster_manager']
+        # Same as splunk_idxc_all_host_list, which is not limited to one environment
+        idxc_all_hosts = set(host for host in self.idxc_members if host in role_hosts['indexer'])
+
+        def select(hosts, allowed, exclude=()):
+            '''Return the unique allowed hosts in the given order, without the excluded ones'''
+            return [host for host in dict.fromkeys(hosts) if host in allowed and host not in exclude]
+
+        def dsclients(hosts):
+            '''Return the hosts as list of deployment clients'''
+            return [{'server': host, 'num': num} for num, host in enumerate(dict.fromkeys(hosts))]
+
+        for splunk_env, env_hosts in self.env_hosts.items():
+            env_defaults = self.environments[splunk_env]['splunk_defaults']
+            idxc_env_hosts = set(host for host in env_hosts if host in self.idxc_members)
+            shc_env_hosts = set(host for host in env_hosts if host in self.shc_members)
+            topology = {}
+
+            # Indexer Cluster
+            topology['splunk_idxc_cm_list'] = select(roles['cluster_manager'], idxc_env_hosts)
+            cm_idxclusters = set()
+            for cluster_manager in topology['splunk_idxc_cm_list']:
+                cm_idxclusters.update(self.idxc_members[cluster_manager])
+            topology['splunk_idxc_name_list'] = [idxcluster for idxcluster in self.indexer_clusters if idxcluster in cm_idxclusters]
+            topology['splunk_idxc_all_host_list'] = select(roles['indexer'], idxc_all_hosts)
+            topology['splunk_idxc_indexer_list'] = select(roles['indexer'], idxc_env_hosts & idxc_all_hosts)
+
+            # Single Indexer and Heavy Forwarder
+            topology['splunk_indexer_list'] = select(roles['indexer'], env_hosts, exclude=idxc_all_hosts)
+            topology['splunk_heavy_forwarder_list'] = select(roles['heavy_forwarder'], env_hosts)
+
+            # Search Heads
+            topology['splunk_shc_all_host_list'] = select(roles['search_head'], shc_env_hosts)
+            topology['splunk_search_head_list'] = select(roles['search_head'] + roles['monitoring_console'], env_hosts,
+                                                         exclude=set(topology['splunk_shc_all_host_list']) | cluster_managers)
+            topology['splunk_shc_dp_list'] = select(roles['deployer'], shc_env_hosts)
+
+            # Management hosts
+            topology['splunk_deployment_server'] = select(roles['deployment_server'], env_hosts)
+            topology['splunk_monitoring_console'] = select(roles['monitoring_console'], env_hosts)
+            if env_defaults.get('splunk_license_server'):
+                topology['splunk_license_manager'] = [env_defaults['splunk_license_server']]
+            else:
+                topology['splunk_license_manager'] = select(roles['license_manager'], env_hosts)
+            topology['splunk_dservers'] = select(env_hosts, env_hosts,
+                                                 exclude=idxc_all_hosts | role_hosts['monitoring_console'] | role_hosts['universal_forwarder'])
+
+            # Deployment clients, the first deployment server is never a client of itself
+            ds_exclude = set(topology['splunk_deployment_server'][:1])
+            indexers = topology['splunk_indexer_list']
+            heavy_forwarders = topology['splunk_heavy_forwarder_list']
+            search_heads = topology['splunk_search_head_list']
+            topology['splunk_idx_dsclients'] = dsclients(
+                select(indexers, env_hosts, exclude=ds_exclude))
+            topology['splunk_idx_hf_dsclients'] = dsclients(
+                select(indexers + heavy_forwarders, env_hosts, exclude=ds_exclude))
+            topology['splunk_sh_dsclients'] = dsclients(
+                select(search_heads + topology['splunk_monitoring_console'], env_hosts, exclude=ds_exclude | cluster_managers))
+            topology['splunk_sh_hf_dsclients'] = dsclients(
+                select(search_heads + heavy_forwarders, env_hosts, exclude=ds_exclude))
+            topology['splunk_idx_hf_sh_dsclients'] = dsclients(
+                select(indexers + heavy_forwarders + search_heads, env_hosts, exclude=ds_exclude))
+            # The license manager may be an external server, so do not limit this one to the environment
+            topology['splunk_hf_sh_lm_cm_ds_dp_mc_dsclients'] = dsclients(
+                host for host in heavy_forwarders + search_heads + topology['splunk_license_manager'] + topology['splunk_idxc_cm_list']
+                + topology['splunk_deployment_server'] + topology['splunk_shc_dp_list'] + topology['splunk_monitoring_console']
+                if host not in ds_exclude)
+            topology['splunk_license_dsclients'] = dsclients(
+                select(env_hosts, env_hosts, exclude=idxc_all_hosts | set(topology['splunk_shc_all_host_list'])
+                       | role_hosts['license_manager'] | role_hosts['universal_forwarder'] | ds_exclude))
+
+            # Output and search peer names used in this environment
+            topology['splunk_outputs_name_list'] = list(dict.fromkeys(
+                host_values['splunk_outputs'] for host_values in env_hosts.values()))
+            topology['splunk_search_peer_name_list'] = list(dict.fromkeys(
+                host_values['splunk_search_peers'] for host_values in env_hosts.values()))
+
+            self.inventory.set_variable("splunk_env_" + splunk_env, 'splunk_topology', topology)
+
     def _populate(self):
         '''Populates the inventory with the hosts and groups and all the settings'''
         # Deal with the settings for the all group
@@ -258,22 +829,26 @@ class InventoryModule(BaseInventoryPlugin):
             #TODO: maybe self.groups is not needed, can do populate directly
             self.groups['all'].update(merged_section)
 
-        # Check Base Config App availability
+        # Directory entries and archives found, every directory is only scanned once
+        setattr(self, 'dir_entries', {})
+        setattr(self, 'archives', {})
+
+        # Check Base Config App availability and add the app paths relative to the baseconfig directory
+        # as splunk_baseconfig_apps, so the baseconfig_app role does not need to search for them
         cwd = os.getcwd()
         splunk_baseconfig_dir = os.path.join(cwd,self.groups['all']['splunk_baseconfig_dir'])
-        check_base = glob.glob(os.path.join(cwd,self.groups['all']['splunk_baseconfig_dir']+"/*/org_ds_secure_server"))
-        check_cluster = glob.glob(os.path.join(cwd,self.groups['all']['splunk_baseconfig_dir']+"/*/org_cluster_manager_base"))
-        if len(check_base) < 1 or len(check_cluster) < 1:
+        baseconfig_apps = {}
+        for name, entry_type in sorted(self._scan_dir(splunk_baseconfig_dir).items()):
+            if entry_type == 'dir' and not name.startswith('.'):
+                for app_name, app_type in sorted(self._scan_dir(os.path.join(splunk_baseconfig_dir, name)).items()):
+                    if app_type == 'dir':
+                        baseconfig_apps.setdefault(app_name, name + '/' + app_name)
+        if 'org_ds_secure_server' not in baseconfig_apps or 'org_cluster_manager_base' not in baseconfig_apps:
             raise AnsibleParserError('Error: Cannot find the latest Splunk baseconfig apps mentioned in the README.md. Extract them under %s' % splunk_baseconfig_dir)
+        self.groups['all']['splunk_baseconfig_apps'] = baseconfig_apps
 
         # Create auth dir if not existing
-        splunk_auth_dir = os.path.join(cwd,"ansible",self.groups['all']['splunk_auth_dir'])
-        if self.groups['all']['splunk_secret_share']['splunk'] == True or self.groups['all']['splunk_secret_share']['splunkforwarder'] == True:
-            if not os.path.isdir(splunk_auth_dir):
-                try:
-                    os.mkdir(splunk_auth_dir)
-                except Exception as e:
-                    raise AnsibleParserError('Cannot create auth directory. Error: {}'.format(e))
+        self._init_auth_dir(self.groups['all'])
 
         # Set timezone to my own one, if nothing is specified
         if 'time_zone' not in self.groups['all']:
@@ -335,13 +910,9 @@ class InventoryModule(BaseInventoryPlugin):
         #TODO: Verify volume definitions in splunk_indexer_volumes. If other names in homePath coldPath are used. Remove primary from the settings
         #TODO: set ansible_host: self.inventory.set_variable(hostname, 'ansible_host', data['Mgmt IP'])
         
-        # Get allowed roles from schema (used for creating role groups)
+        # Allowed roles (used for creating role groups)
         # Note: Role and hostvar validation is now handled by schema.py
-        if SCHEMA_VALIDATION_AVAILABLE:
-            from schema import AllowedRole
-            allowed_roles = [r.value for r in AllowedRole]
-        else:
-            allowed_roles = ['cluster_manager','deployer','deployment_server','heavy_forwarder','indexer','license_manager','monitoring_console','search_head','universal_forwarder','universal_forwarder_windows']
+        allowed_roles = ALLOWED_ROLES
 
         # Creating some data structure for collecting information later on
         for environment in self.environments:
@@ -358,8 +929,26 @@ class InventoryModule(BaseInventoryPlugin):
         #TODO: Check if license_manager role defined, when license file is given
         #TODO: Check volume definitions, if they are matching both sections
 
+        # Host memberships needed for the precomputed topology lists
+        setattr(self, 'env_hosts', {})
+        setattr(self, 'idxc_members', {})
+        setattr(self, 'shc_members', set())
+
+        # Hosts with their roles, clusters and connection variables for the inventory export
+        setattr(self, 'export_hosts', {})
+
+        # Host variables shared by all hosts of a splunk_hosts entry are set on one group per entry
+        hoist_host_vars = self.groups['all'].get('hoist_host_vars', True)
+        if hoist_host_vars:
+            per_host_keys = self._groupvars_file_keys()
+            if per_host_keys is None:
+                # Without the variable names, every variable stays a host var to keep its precedence
+                display.vvv('%s: cannot read the group_vars of the group all, the host variables are not moved into groups' % self.NAME)
+                hoist_host_vars = False
+            hostvars_size = {'hosts': 0, 'groups': 0, 'before': 0, 'after': 0}
+
         # Going through the hosts and parse the settings
-        for splunkhost in self.configfiles['splunk_hosts']:
+        for index, splunkhost in enumerate(self.configfiles['splunk_hosts']):
             hostnames = []
             if  'name' in splunkhost:
                 hostnames.append(splunkhost['name'])
@@ -368,19 +957,59 @@ class InventoryModule(BaseInventoryPlugin):
                 hostnames = splunkhost['list']
 
             elif  'iter' in splunkhost:
-                iteration = splunkhost['iter']['numbers']
-                start, end = iteration.split('..', 1)
-                width = len(end)
-                for hostnum in range(int(start), int(end)+1):
-                    hostname = str(hostnum).zfill(width)
-                    if 'prefix' in  splunkhost['iter']:
-                        hostname =  splunkhost['iter']['prefix'] + hostname
-                    if 'postfix' in  splunkhost['iter']:
-                        hostname =  hostname + splunkhost['iter']['postfix']
-                    hostnames.append(hostname)
+                # The host names are generated while adding the hosts (validation handled by schema.py)
+                try:
+                    hostnames = HostRange.from_config(splunkhost['iter'])
+                except HostRangeError as e:
+                    raise AnsibleParserError("Invalid iter in splunk_hosts[%d]: %s" % (index, e))
+
+            # Collect the host variables in the order they are set
+            host_vars = []
+            # Set site if available (validation handled by schema.py)
+            if 'site' in splunkhost:
+                host_vars.append(('site', splunkhost['site']))
+            # Add the rest of the host variables
+            for key, val in splunkhost.items():
+                if key in ['name','list','iter','splunk_env','roles','aws','virtualbox']:
+                    # Ignore those ones. Either not relevant or already worked on
+                    continue
+                if key in ['idxcluster','shcluster']:
+                    #TODO: Handle special vars
+                    continue
+                if key in ['site', 'cname']:
+                    #TODO: Handle special vars (site is done already)
+                    continue
+
+                # Extract section variables to add them directly (validation handled by schema.py)
+                if key in ['os','custom']:
+                    for section_key, section_val in splunkhost.get(key).items():
+                        host_vars.append((section_key, section_val))
+                else:
+                    host_vars.append((key, val))
+
+            host_export = {key: splunkhost[key] for key in ['site', 'idxcluster', 'shcluster'] if key in splunkhost}
+            host_export['roles'] = list(splunkhost['roles'])
+
+            shared_groupname = None
+            if hoist_host_vars and len(hostnames) > 1 and host_vars:
+                # Variables defined in group_vars/all must stay host vars to keep their precedence
+                shared_vars = [(key, val) for key, val in host_vars if key not in per_host_keys]
+                if shared_vars:
+                    host_vars = [(key, val) for key, val in host_vars if key in per_host_keys]
+                    shared_groupname = "splunk_hosts_" + str(index)
+                    self.inventory.add_group(shared_groupname)
+                    # Same precedence as host vars compared to the other groups of the plugin
+                    self.inventory.set_variable(shared_groupname, 'ansible_group_priority', 100)
+                    for key, val in shared_vars:
+                        self.inventory.set_variable(shared_groupname, key, val)
+                    shared_size = len(json.dumps(dict(shared_vars), default=str))
+                    hostvars_size['hosts'] += len(hostnames)
+                    hostvars_size['groups'] += 1
+                    hostvars_size['before'] += shared_size * len(hostnames)
+                    hostvars_size['after'] += shared_size
 
             for hostname in hostnames:
-                self.inventory.add_host(host=hostname)
+                self.inventory.add_host(host=hostname, group=shared_groupname)
 
                 # Add host to splunk_env
                 try:
@@ -391,14 +1020,17 @@ class InventoryModule(BaseInventoryPlugin):
                     self.inventory.add_host(host=hostname, group="splunk_env_" + splunk_env)
                 except Exception as e:
                     raise AnsibleParserError("Cannot add host %s to splunk_env %s. Error: %s" % (hostname, splunkhost['splunk_env'], e))
+                self.export_hosts[hostname] = dict(host_export, splunk_env=splunk_env)
+                # Remember the host in its environment (dict used as ordered set), its outputs and search_peers settings are added later
+                self.env_hosts.setdefault(splunk_env, {})[hostname] = {}
                 # This is currently hardcoded to all. I may add selection settings in the future.
                 splunk_outputs = self.groups['all']['splunk_outputs']
                 if splunk_outputs not in self.environments[splunk_env]['output']:
-                    self.environments[splunk_env]['output'][splunk_outputs] = {'targets':{}, 'hosts':[]}
+                    self.environments[splunk_env]['output'][splunk_outputs] = {'targets':{}, 'hosts':{}}
 
                 splunk_search_peers = self.groups['all']['splunk_search_peers']
                 if splunk_search_peers not in self.environments[splunk_env]['search_peer']:
-                    self.environments[splunk_env]['search_peer'][splunk_search_peers] = {'targets':{}, 'hosts':[]}
+                    self.environments[splunk_env]['search_peer'][splunk_search_peers] = {'targets':{}, 'hosts':{}}
 
                 # Work through the given roles (validation handled by schema.py)
                 for role in splunkhost['roles']:
@@ -414,7 +1046,7 @@ class InventoryModule(BaseInventoryPlugin):
                                 license_list.append(license_file_value)
                             for license_file_name in license_list:
                                 license_file = os.path.join(cwd, self.environments[splunk_env]['splunk_defaults']['splunk_software_dir'],license_file_name)
-                                if not os.path.isfile(license_file):
+                                if not self._is_file(license_file):
                                     raise AnsibleParserError("Error: Cannot read license file %s" % license_file)
 
                     # Note: cluster_manager + idxcluster validation is handled by schema.py
@@ -436,6 +1068,7 @@ class InventoryModule(BaseInventoryPlugin):
                                 self.inventory.add_host(host=hostname, group="idxcluster_" + splunkhost['idxcluster'] + "_" + splunkhost['site'])
 
                         self.inventory.add_host(host=hostname, group="idxcluster_" + splunkhost['idxcluster'])
+                        self.idxc_members.setdefault(hostname, set()).add(splunkhost['idxcluster'])
                     
                     # Build the outputs list (all the hosts getting an outputs.conf)
                     if role in ['indexer','heavy_forwarder']:
@@ -451,8 +1084,7 @@ class InventoryModule(BaseInventoryPlugin):
                             self.environments[splunk_env]['output'][splunk_outputs]['targets'][role].append(hostname)
 
                     if role != 'indexer':
-                        if hostname not in self.environments[splunk_env]['output'][splunk_outputs]['hosts']:
-                            self.environments[splunk_env]['output'][splunk_outputs]['hosts'].append(hostname)
+                        self.environments[splunk_env]['output'][splunk_outputs]['hosts'][hostname] = True
 
                     # List of search endpoints (indexers or cluster_managers)
                     if role in ['indexer','cluster_manager']:
@@ -468,8 +1100,7 @@ class InventoryModule(BaseInventoryPlugin):
                     
                     # List of hosts running search against indexers (search_heads)
                     if role in ['search_head','monitoring_console']:
-                        if hostname not in self.environments[splunk_env]['search_peer'][splunk_search_peers]['hosts']:
-                            self.environments[splunk_env]['search_peer'][splunk_search_peers]['hosts'].append(hostname)
+                        self.environments[splunk_env]['search_peer'][splunk_search_peers]['hosts'][hostname] = True
 
                     # Build the search_head_clusters lists with their sites
                     if role in ['search_head','deployer'] and 'shcluster' in splunkhost:
@@ -489,6 +1120,7 @@ class InventoryModule(BaseInventoryPlugin):
                                 self.inventory.add_host(host=hostname, group="shcluster_" + splunkhost['shcluster'] + "_" + splunkhost['site'])
 
                         self.inventory.add_host(host=hostname, group="shcluster_" + splunkhost['shcluster'])
+                        self.shc_members.add(hostname)
 
                     # Collect all version and arch combinations for archive availability check later on
                     if 'splunk_version' in splunkhost:
@@ -501,52 +1133,29 @@ class InventoryModule(BaseInventoryPlugin):
                         splunk_architecture = self.environments[splunk_env]['splunk_defaults']['splunk_architecture']
                     else:
                         splunk_architecture = 'amd64'
-                    directory = os.path.join(cwd, self.environments[splunk_env]['splunk_defaults']['splunk_software_dir'])
                     if role == 'universal_forwarder':
                         arch_type = 'splunkforwarder'
                     elif role == 'universal_forwarder_windows':
                         arch_type = 'windowsforwarder'
-                        directory = os.path.join(cwd,self.environments[splunk_env]['splunk_defaults']['splunk_software_dir'])
                     else:
                         arch_type = 'splunk'
-                    self.versions = self._merge_dict(self.versions,{splunk_env: {arch_type+'_'+splunk_version+'_'+splunk_architecture: {'arch_type':arch_type,'splunk_version':splunk_version,'splunk_architecture':splunk_architecture}}})
+                    self.versions.setdefault(splunk_env, set()).add((arch_type, splunk_version, splunk_architecture))
 
                     # Add host to the roles list from where it will be added to role groups
                     roles[role].append(hostname)
 
-                # Set site if available (validation handled by schema.py)
-                if 'site' in splunkhost:
-                    self.inventory.set_variable(hostname, 'site', splunkhost['site'])
-                
-
-                # Add the rest of the host variables
-                for key, val in splunkhost.items():
-                    if key in ['name','list','iter','splunk_env','roles','aws','virtualbox']:
-                        # Ignore those ones. Either not relevant or already worked on
-                        continue
-                    if key in ['idxcluster','shcluster']:
-                        #TODO: Handle special vars
-                        continue
-                    if key in ['site', 'cname']:
-                        #TODO: Handle special vars (site is done already)
-                        continue
-                    #print("Addind key: %s with values %s" % (key, val))
-
-                    # Extract section variables to add them directly (validation handled by schema.py)
-                    if key in ['os','custom']:
-                        for section_key, section_val in splunkhost.get(key).items():
-                            self.inventory.set_variable(hostname, section_key, section_val)
-                    else:
-                        self.inventory.set_variable(hostname, key, val)
+                # Add the host variables
+                for key, val in host_vars:
+                    self.inventory.set_variable(hostname, key, val)
+
+        if hoist_host_vars and hostvars_size['groups'] > 0:
+            display.vvv('%s: moved the shared host variables of %d hosts into %d groups, hostvars size %d -> %d bytes'
+                        % (self.NAME, hostvars_size['hosts'], hostvars_size['groups'], hostvars_size['before'], hostvars_size['after']))
 
         # Check the archive availability for all versions needed
         for splunk_env, versions_combs in self.versions.items():
-            #print("Checking Versions combs: %s in splunk_env %s" % (versions_combs, splunk_env))
             directory = os.path.join(cwd,self.environments[splunk_env]['splunk_defaults']['splunk_software_dir'])
-            for versions_comb, versions_values in versions_combs.items():
-                arch_type = versions_values['arch_type']
-                splunk_version = versions_values['splunk_version']
-                splunk_architecture = versions_values['splunk_architecture']
+            for arch_type, splunk_version, splunk_architecture in sorted(versions_combs):
                 self._check_splunk_archive(arch_type,splunk_architecture,splunk_version,directory)
 
         # Add hosts to role_ ansible groups
@@ -578,6 +1187,31 @@ class InventoryModule(BaseInventoryPlugin):
                 except Exception as e:
                     raise AnsibleParserError('Cannot add available sites to idxcluster. Error: {}'.format(e))
 
+        # Connection variables for the export and the settings for the topology lists of the hosts,
+        # combined in the same order of the groups as Ansible does
+        topology_keys = ['splunk_outputs', 'splunk_search_peers']
+
+        def selected(variables):
+            return {key: val for key, val in variables.items() if key in topology_keys or is_connection_var(key)}
+
+        group_selected_vars = {groupname: selected(group.vars) for groupname, group in self.inventory.groups.items()}
+        resolved_vars = {}
+        for hostname, host_export in self.export_hosts.items():
+            host = self.inventory.get_host(hostname)
+            host_values = dict(group_selected_vars['all'])
+            for group in sort_groups(group for group in host.get_groups() if group.name != 'all'):
+                host_values.update(group_selected_vars[group.name])
+            host_values.update(selected(host.vars))
+            host_export['vars'] = {key: val for key, val in host_values.items() if is_connection_var(key)}
+            resolved_vars[hostname] = host_values
+        for env_hosts in self.env_hosts.values():
+            for hostname in env_hosts:
+                env_hosts[hostname] = {key: resolved_vars[hostname].get(key) for key in topology_keys}
+
+        # Precompute the topology lists, otherwise they are calculated by the templates in dynamic.yml
+        if self.groups['all'].get('precompute_topology', True):
+            self._populate_topology(roles)
+
     def parse(self, inventory, loader, path, cache):
         '''Return dynamic inventory from source '''
         super(InventoryModule, self).parse(inventory, loader, path, cache)
@@ -594,19 +1228,53 @@ class InventoryModule(BaseInventoryPlugin):
         # Check for required python libraries
         self._check_requirements()
 
+        # Parse the config file only once
+        start = parse_start = time.perf_counter()
+        raw_config = self._load_config(path)
+        start = self._log_timing('config parsing', start)
+
+        # Read the options from the config file
+        self._set_config_options(raw_config)
+        # Create empty inventory, to make other plugins happy
+        self._init_inventory()
+        # Call our internal helper to set the used virtualization
+        self._set_virtualization(raw_config)
+        start = self._log_timing('option extraction', start)
+
+        if self.virtualization == None or self.virtualization == 'virtualbox':
+            # Create empty aws_ec2.yml file, otherwise inventory will fail
+            #TODO: Check Ansible inventory var, if aws is there
+            dirname = os.path.dirname(path)
+            with open(os.path.join(dirname,'aws_ec2.yml'), 'w') as f:
+                f.write('#Empty file to satisfy the aws plugin\n')
+
+        # Call our internal helper to read in default values
+        self._populate_defaults()
+        start = self._log_timing('reading defaults', start)
+
+        # Reuse the inventory from the cache, if nothing has changed since it was generated
+        use_cache = self.get_option('cache') and cache
+        if self.get_option('cache'):
+            inventory_hash = self._get_inventory_hash(raw_config)
+            cache_key = self.get_cache_key(path)
+            if use_cache:
+                try:
+                    cached = self._cache.get(cache_key)
+                except KeyError:
+                    cached = None
+                if isinstance(cached, abc.Mapping) and cached.get('hash') == inventory_hash:
+                    self._load_inventory(cached['inventory'])
+                    self._export_inventory(cached.get('export', {}), only_missing=True)
+                    self._init_auth_dir(cached['inventory']['groups']['all']['vars'])
+                    self._log_timing('loading cached inventory', start)
+                    self._log_timing('total', parse_start)
+                    return
+
         # Validate configuration schema before processing
         if SCHEMA_VALIDATION_AVAILABLE:
-            try:
-                with open(path, 'r') as f:
-                    raw_config = yaml.safe_load(f)
-                validate_config(raw_config)
-            except ConfigValidationError as e:
-                raise AnsibleParserError(str(e))
-            except Exception as e:
-                raise AnsibleParserError(f"Failed to validate configuration: {e}")
+            self._validate_config(raw_config)
+            start = self._log_timing('schema validation', start)
 
-        # Read the inventory YAML file
-        self._read_config_data(path)
         try:
             configfiles = {}
             # Store the required sections from the YAML file
@@ -618,19 +1286,26 @@ class InventoryModule(BaseInventoryPlugin):
             setattr(self, 'configfiles', configfiles)
         except Exception as e:
             raise AnsibleParserError('All correct options required: {}'.format(e))
-        # Create empty inventory, to make other plugins happy
-        self._init_inventory()
-        # Call our internal helper to set the used virtualization
-        self._set_virtualization(path)
-
-        if self.virtualization == None or self.virtualization == 'virtualbox':
-            # Create empty aws_ec2.yml file, otherwise inventory will fail
-            #TODO: Check Ansible inventory var, if aws is there
-            dirname = os.path.dirname(path)
-            with open(os.path.join(dirname,'aws_ec2.yml'), 'w') as f:
-                f.write('#Empty file to satisfy the aws plugin\n')
 
-        # Call our internal helper to read in default values
-        self._populate_defaults()
         # Call our internal helper to populate the dynamic inventory from the config file
-        self._populate()
\ No newline at end of file
+        if self.get_option('cache') or self.get_option('track_changes'):
+            # Build into a separate inventory, to store exactly what this plugin has added
+            target_inventory = self.inventory
+            self.inventory = InventoryData()
+            self._populate()
+            inventory_data = self._dump_inventory(self.inventory)
+            self.inventory = target_inventory
+            start = self._log_timing('populating inventory', start)
+            if self.get_option('track_changes'):
+                self._track_changes(inventory_data)
+                start = self._log_timing('tracking changes', start)
+            if self.get_option('cache'):
+                self._cache[cache_key] = {'hash': inventory_hash, 'inventory': inventory_data, 'export': self.export_hosts}
+            self._load_inventory(inventory_data)
+            start = self._log_timing('loading inventory', start)
+        else:
+            self._populate()
+            start = self._log_timing('populating inventory', start)
+        self._export_inventory(self.export_hosts)
+        self._log_timing('exporting inventory', start)
+        self._log_timing('total', parse_start)
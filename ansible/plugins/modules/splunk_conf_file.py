@@ -0,0 +1,273 @@
+#!/usr/bin/python
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+###############################################################################
+# Copyright 2022 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+DOCUMENTATION = r'''
+    module: splunk_conf_file
+    short_description: Set the settings of Splunk .conf files
+    description:
+        - Applies all stanzas of a file in one read-modify-write and replaces the file atomically.
+        - Existing settings are updated in place, comments and the order of the file are kept.
+        - New settings are added at the end of the stanza, new stanzas at the end of the file.
+        - Files and their directories are created if missing.
+    options:
+        base:
+            description: Directory the file names in conf are relative to, like $SPLUNK_HOME/etc.
+            type: path
+        conf:
+            description:
+                - Mapping of file name to stanza to setting to value.
+                - Values are written as strings, an empty value for null.
+            type: dict
+            required: true
+        mode:
+            description: Permissions of the files.
+            type: raw
+            default: '0600'
+        exclusive:
+            description:
+                - Remove the settings of the given stanzas, which are not in conf.
+                - Other stanzas of the files are kept.
+            type: bool
+            default: false
+'''
+
+EXAMPLES = r'''
+- name: Set server.conf and limits.conf settings
+  splunk_conf_file:
+    base: "{{ splunk_home }}/etc"
+    conf:
+      apps/splunk_all_server/local/server.conf:
+        diskUsage:
+          minFreeSpace: 500
+      system/local/limits.conf:
+        search:
+          max_searches_per_cpu: 2
+'''
+
+RETURN = r'''
+    changes:
+        description: Changed settings, with file, stanza, key, before (null for new settings) and after (null for removed settings).
+        type: list
+        returned: always
+    files:
+        description: Files changed or created.
+        type: list
+        returned: always
+'''
+
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+
+def conf_value(value):
+    '''Return the value as written to the file'''
+    return '' if value is None else str(value)
+
+
+def stanza_name(line):
+    '''Return the stanza name of a header line, None for other lines'''
+    stripped = line.strip()
+    if stripped.startswith('[') and stripped.endswith(']'):
+        return stripped[1:-1]
+    return None
+
+
+def setting(line):
+    '''Return key and value of a setting line, None for comments, headers and blank lines'''
+    stripped = line.strip()
+    if not stripped or stripped.startswith('#') or stripped.startswith('[') or '=' not in stripped:
+        return None
+    key, value = stripped.split('=', 1)
+    return key.strip(), value.strip()
+
+
+def parse_stanzas(lines):
+    '''Return the stanzas as list of (name, start, end), the lines before the first header have the name None'''
+    stanzas = []
+    name, start = None, 0
+    for index, line in enumerate(lines):
+        header = stanza_name(line)
+        if header is not None:
+            stanzas.append((name, start, index))
+            name, start = header, index
+    stanzas.append((name, start, len(lines)))
+    return stanzas
+
+
+def update_stanza(lines, start, end, settings, exclusive=False):
+    '''Apply the settings to lines[start:end] of one stanza, return the new lines and the changes'''
+    body = []
+    done = {}
+    changes = []
+    index = start
+    while index < end:
+        line = lines[index]
+        # Values continued with a trailing backslash belong to the setting
+        block = [line]
+        while block[-1].rstrip('\n').endswith('\\') and index + 1 < end:
+            index += 1
+            block.append(lines[index])
+        index += 1
+        entry = setting(line)
+        if entry is None or (entry[0] not in settings and not exclusive):
+            body.extend(block)
+            continue
+        key, value = entry
+        if key in done or key not in settings:
+            # Duplicated settings and with exclusive the settings not given are removed
+            changes.append((key, ''.join(block).split('=', 1)[1].strip(), None))
+            continue
+        done[key] = True
+        after = conf_value(settings[key])
+        if len(block) == 1 and value == after:
+            body.extend(block)
+        else:
+            body.append('%s = %s\n' % (key, after))
+            changes.append((key, ''.join(block).split('=', 1)[1].strip(), after))
+
+    new = ['%s = %s\n' % (key, conf_value(value)) for key, value in settings.items() if key not in done]
+    if new:
+        # Add after the last setting, before trailing blank lines of the stanza
+        position = len(body)
+        while position > 0 and not body[position - 1].strip():
+            position -= 1
+        if position > 0 and not body[position - 1].endswith('\n'):
+            body[position - 1] += '\n'
+        body[position:position] = new
+        changes.extend((key, None, conf_value(value)) for key, value in settings.items() if key not in done)
+    return body, changes
+
+
+def apply_conf(content, stanzas, exclusive=False):
+    '''Return the content with the settings of all stanzas applied and the list of (stanza, key, before, after)'''
+    lines = content.splitlines(True)
+    existing = parse_stanzas(lines)
+    names = {name for name, start, end in existing}
+    result = []
+    changes = []
+    for name, start, end in existing:
+        settings = stanzas.get(name) if name is not None else None
+        if settings or (exclusive and settings is not None):
+            body, stanza_changes = update_stanza(lines, start, end, settings, exclusive)
+            result.extend(body)
+            changes.extend((name, key, before, after) for key, before, after in stanza_changes)
+        else:
+            result.extend(lines[start:end])
+
+    for name, settings in stanzas.items():
+        if name in names or not settings:
+            continue
+        if result and not result[-1].endswith('\n'):
+            result[-1] += '\n'
+        if result and result[-1].strip():
+            result.append('\n')
+        result.append('[%s]\n' % name)
+        for key, value in settings.items():
+            result.append('%s = %s\n' % (key, conf_value(value)))
+            changes.append((name, key, None, conf_value(value)))
+    return ''.join(result), changes
+
+
+def write_atomic(path, content, mode):
+    '''Write the content to a temporary file in the same directory and rename it to path'''
+    fd, tmp_path = tempfile.mkstemp(prefix='.%s.' % os.path.basename(path), dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def update_file(path, stanzas, mode=0o600, check_mode=False, exclusive=False):
+    '''Apply the stanzas to the file, return whether it changed, the changes and the content before and after'''
+    exists = os.path.exists(path)
+    before = ''
+    if exists:
+        with open(path) as f:
+            before = f.read()
+    after, changes = apply_conf(before, stanzas, exclusive)
+    changed = after != before or not exists
+    mode_changed = exists and (os.stat(path).st_mode & 0o7777) != mode
+    if not check_mode:
+        if changed:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, after, mode)
+        elif mode_changed:
+            os.chmod(path, mode)
+    return changed or mode_changed, changes, before, after
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            base=dict(type='path'),
+            conf=dict(type='dict', required=True),
+            mode=dict(type='raw', default='0600'),
+            exclusive=dict(type='bool', default=False),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    mode = params['mode']
+    try:
+        mode = mode if isinstance(mode, int) else int(str(mode), 8)
+    except ValueError:
+        module.fail_json(msg='mode must be an octal number like 0600, got %s' % params['mode'])
+
+    changed = False
+    changes = []
+    files = []
+    diff = []
+    for name, stanzas in params['conf'].items():
+        if stanzas is None:
+            continue
+        if not isinstance(stanzas, dict) or not all(isinstance(settings, dict) or settings is None for settings in stanzas.values()):
+            module.fail_json(msg='conf of %s must be a mapping of stanzas to settings' % name)
+        stanzas = {str(stanza): {str(key): value for key, value in (settings or {}).items()}
+                   for stanza, settings in stanzas.items()}
+        path = os.path.join(params['base'], name) if params['base'] else name
+        try:
+            file_changed, file_changes, before, after = update_file(path, stanzas, mode, module.check_mode, params['exclusive'])
+        except (OSError, UnicodeDecodeError) as e:
+            module.fail_json(msg='Failed to update %s: %s' % (path, e), changes=changes, files=files)
+        changes.extend(dict(file=path, stanza=stanza, key=key, before=old, after=new)
+                       for stanza, key, old, new in file_changes)
+        if file_changed:
+            changed = True
+            files.append(path)
+            if before != after:
+                diff.append(dict(before=before, after=after, before_header=path, after_header=path))
+
+    result = dict(changed=changed, changes=changes, files=files)
+    if module._diff:
+        result['diff'] = diff
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
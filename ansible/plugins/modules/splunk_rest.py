@@ -0,0 +1,310 @@
+#!/usr/bin/python
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+###############################################################################
+# Copyright 2022 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+DOCUMENTATION = r'''
+    module: splunk_rest
+    short_description: Call the Splunk REST API of splunkd
+    description:
+        - Logs in once to get a session key and sends all requests of the task over a single keep-alive HTTPS connection.
+        - A list of requests is sent in one task, the JSON responses are parsed.
+        - Requests other than GET report a change and are skipped in check mode.
+    options:
+        url:
+            description: Base URL of the splunkd management port.
+            type: str
+            default: https://localhost:8089
+        username:
+            description: User to log in with.
+            type: str
+            default: admin
+        password:
+            description:
+                - Password of the user.
+                - Required, unless session_key is given.
+            type: str
+        session_key:
+            description: Session key to use instead of logging in.
+            type: str
+        endpoint:
+            description:
+                - Endpoint of a single request, like /services/cluster/manager/status.
+                - Mutually exclusive with requests.
+            type: str
+        method:
+            description: HTTP method of the single request.
+            type: str
+            default: GET
+            choices: ['GET', 'POST', 'DELETE']
+        body:
+            description: Form parameters of the single request.
+            type: dict
+        requests:
+            description:
+                - List of requests, sent in the order given.
+                - Each request is a dict with endpoint and optional method, body and status_code.
+            type: list
+            elements: dict
+        output_mode:
+            description: Output mode of the responses, json responses are parsed.
+            type: str
+            default: json
+            choices: ['json', 'xml', 'csv', 'raw']
+        status_code:
+            description: Accepted HTTP status codes, other codes fail the task.
+            type: list
+            elements: int
+            default: [200, 201]
+        validate_certs:
+            description: Verify the TLS certificate of splunkd.
+            type: bool
+            default: false
+        timeout:
+            description: Socket timeout in seconds.
+            type: int
+            default: 30
+'''
+
+EXAMPLES = r'''
+- name: Get the indexer cluster status
+  splunk_rest:
+    password: "{{ splunk_admin_password }}"
+    endpoint: /services/cluster/manager/status
+  register: cluster_status
+
+- name: Get search head cluster and KV store status in one task
+  splunk_rest:
+    password: "{{ splunk_admin_password }}"
+    requests:
+      - endpoint: /services/shcluster/status
+      - endpoint: /services/kvstore/status
+
+- name: Set manual detention
+  splunk_rest:
+    password: "{{ splunk_admin_password }}"
+    endpoint: /services/shcluster/member/control/control/set_manual_detention
+    method: POST
+    body:
+      manual_detention: 'on'
+'''
+
+RETURN = r'''
+    results:
+        description: Response of every request, with endpoint, method, status, content, json (json output mode) and elapsed seconds.
+        type: list
+        returned: always
+    status:
+        description: HTTP status of the single request.
+        type: int
+        returned: when endpoint is given
+    content:
+        description: Response body of the single request.
+        type: str
+        returned: when endpoint is given
+    json:
+        description: Parsed response of the single request.
+        type: dict
+        returned: when endpoint is given and output_mode is json
+    elapsed:
+        description: Seconds for the login and all requests.
+        type: float
+        returned: always
+'''
+
+import http.client
+import json
+import ssl
+import time
+from urllib.parse import urlencode, urlsplit, parse_qsl
+
+from ansible.module_utils.basic import AnsibleModule
+
+
+class SplunkRestError(Exception):
+    '''Raised for failed requests'''
+
+    def __init__(self, message, result=None):
+        super(SplunkRestError, self).__init__(message)
+        self.result = result
+
+
+class SplunkRestClient:
+    '''Client for splunkd, keeping one connection and session key for all requests'''
+
+    def __init__(self, url, validate_certs=False, timeout=30):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or 'https'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 8089
+        self.validate_certs = validate_certs
+        self.timeout = timeout
+        self.session_key = None
+        self.connection = None
+        self.connections = 0
+
+    def _connect(self):
+        if self.scheme == 'http':
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            context = ssl.create_default_context()
+            if not self.validate_certs:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self.connection = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=context)
+        self.connections += 1
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _send(self, method, path, body=None):
+        '''Return the status and body of a request, reconnecting once if splunkd closed the idle connection'''
+        headers = {'Accept-Encoding': 'identity'}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.session_key:
+            headers['Authorization'] = 'Splunk %s' % self.session_key
+        for attempt in range(2):
+            reused = self.connection is not None
+            if not reused:
+                self._connect()
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, content.decode('utf-8', errors='replace')
+
+    def login(self, username, password):
+        '''Get a session key, used by all following requests'''
+        status, content = self._send('POST', '/services/auth/login',
+                                     urlencode({'username': username, 'password': password, 'output_mode': 'json'}))
+        if status != 200:
+            raise SplunkRestError('Login as %s failed with status %d' % (username, status))
+        self.session_key = json.loads(content)['sessionKey']
+
+    def request(self, endpoint, method='GET', body=None, output_mode='json', status_code=(200, 201)):
+        '''Send a request and return the result dict, raise SplunkRestError for other status codes'''
+        parts = urlsplit(endpoint)
+        path = '/' + parts.path.lstrip('/')
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        form = list((body or {}).items())
+        if output_mode != 'raw':
+            if method == 'POST':
+                form.append(('output_mode', output_mode))
+            else:
+                params.append(('output_mode', output_mode))
+        if params:
+            path += '?' + urlencode(params, doseq=True)
+
+        start = time.time()
+        status, content = self._send(method, path, urlencode(form, doseq=True) if method == 'POST' else None)
+        result = {'endpoint': endpoint, 'method': method, 'status': status, 'content': content,
+                  'elapsed': round(time.time() - start, 3)}
+        if output_mode == 'json' and content:
+            try:
+                result['json'] = json.loads(content)
+            except ValueError:
+                pass
+        if status not in status_code:
+            messages = [message.get('text', '') for message in result.get('json', {}).get('messages', [])] if isinstance(result.get('json'), dict) else []
+            raise SplunkRestError('%s %s returned status %d: %s' % (method, endpoint, status, '; '.join(messages) or content[:200]), result)
+        return result
+
+
+def run_requests(client, requests, output_mode, status_code, check_mode=False):
+    '''Send the requests in order and return the results and whether something was changed'''
+    results = []
+    changed = False
+    for request in requests:
+        method = request.get('method', 'GET').upper()
+        if check_mode and method != 'GET':
+            results.append({'endpoint': request['endpoint'], 'method': method, 'skipped': True})
+            continue
+        try:
+            results.append(client.request(request['endpoint'], method, request.get('body'), output_mode,
+                                          request.get('status_code', status_code)))
+        except SplunkRestError as e:
+            e.results = results + ([e.result] if e.result else [])
+            raise
+        changed = changed or method != 'GET'
+    return results, changed
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            url=dict(type='str', default='https://localhost:8089'),
+            username=dict(type='str', default='admin'),
+            password=dict(type='str', no_log=True),
+            session_key=dict(type='str', no_log=True),
+            endpoint=dict(type='str'),
+            method=dict(type='str', default='GET', choices=['GET', 'POST', 'DELETE']),
+            body=dict(type='dict'),
+            requests=dict(type='list', elements='dict'),
+            output_mode=dict(type='str', default='json', choices=['json', 'xml', 'csv', 'raw']),
+            status_code=dict(type='list', elements='int', default=[200, 201]),
+            validate_certs=dict(type='bool', default=False),
+            timeout=dict(type='int', default=30),
+        ),
+        required_one_of=[('endpoint', 'requests'), ('password', 'session_key')],
+        mutually_exclusive=[('endpoint', 'requests')],
+        supports_check_mode=True,
+    )
+    params = module.params
+    if params['endpoint']:
+        requests = [{'endpoint': params['endpoint'], 'method': params['method'], 'body': params['body']}]
+    else:
+        requests = params['requests']
+        missing = [index for index, request in enumerate(requests) if not request.get('endpoint')]
+        if missing:
+            module.fail_json(msg='requests[%d] has no endpoint' % missing[0])
+
+    client = SplunkRestClient(params['url'], params['validate_certs'], params['timeout'])
+    start = time.time()
+    try:
+        if params['session_key']:
+            client.session_key = params['session_key']
+        else:
+            client.login(params['username'], params['password'])
+        results, changed = run_requests(client, requests, params['output_mode'], params['status_code'], module.check_mode)
+    except SplunkRestError as e:
+        module.fail_json(msg=str(e), results=getattr(e, 'results', []))
+    except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+        module.fail_json(msg='Splunk REST call to %s failed: %s' % (params['url'], e))
+    finally:
+        client.close()
+
+    output = dict(changed=changed, results=results, elapsed=round(time.time() - start, 3))
+    if params['endpoint']:
+        for key in ['status', 'content', 'json']:
+            if key in results[0]:
+                output[key] = results[0][key]
+    module.exit_json(**output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/python
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+###############################################################################
+# Copyright 2022 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+DOCUMENTATION = r'''
+    module: splunk_software_seed
+    short_description: Serve and fetch Splunk archives between hosts
+    description:
+        - With state serving, files are served over HTTP with range requests, until the server is stopped or the timeout is reached.
+          Run it with async and poll 0, it does not return before.
+        - With state present, a file is fetched from the URL. Interrupted transfers are resumed from the partial file
+          and the file is only moved in place, if the sha256 checksum matches.
+        - With state stopped, the server of the pid_file is stopped.
+    options:
+        state:
+            description: Fetch the file, serve files or stop the server.
+            type: str
+            default: present
+            choices: ['present', 'serving', 'stopped']
+        url:
+            description: URL to fetch the file from, required for state present.
+            type: str
+        dest:
+            description: Path of the fetched file, required for state present.
+            type: path
+        checksum:
+            description: sha256 checksum of the file, required for state present.
+            type: str
+        files:
+            description: Files to serve by their base name, required for state serving.
+            type: list
+            elements: path
+        port:
+            description: Port of the server.
+            type: int
+            default: 8190
+        bind:
+            description: Address of the server.
+            type: str
+            default: 0.0.0.0
+        pid_file:
+            description: File with the process id of the server, the server stops when it is removed. Required for state serving and stopped.
+            type: path
+        timeout:
+            description:
+                - State present, seconds to retry without getting any data from the server.
+                - State serving, seconds to serve at most.
+            type: int
+            default: 120
+'''
+
+EXAMPLES = r'''
+- name: Serve the archive
+  splunk_software_seed:
+    state: serving
+    files:
+      - /var/tmp/splunk_software/splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz
+    pid_file: /var/tmp/splunk_software/.seed.pid
+    timeout: 3600
+  async: 3600
+  poll: 0
+
+- name: Fetch the archive
+  splunk_software_seed:
+    url: http://idx1:8190/splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz
+    dest: /var/tmp/splunk_software/splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz
+    checksum: "{{ archive_checksum }}"
+
+- name: Stop serving
+  splunk_software_seed:
+    state: stopped
+    pid_file: /var/tmp/splunk_software/.seed.pid
+'''
+
+RETURN = r'''
+    size:
+        description: Size of the file in bytes.
+        type: int
+        returned: state present
+    fetched:
+        description: Bytes transferred, without the bytes of a resumed partial file.
+        type: int
+        returned: state present
+    resumed:
+        description: Offset the transfer was first resumed at, 0 if not resumed.
+        type: int
+        returned: state present
+    attempts:
+        description: Number of requests.
+        type: int
+        returned: state present
+    elapsed:
+        description: Seconds for the transfer.
+        type: float
+        returned: state present
+    throughput:
+        description: Transferred MB per second.
+        type: float
+        returned: state present
+    msg:
+        description: Summary of the transfer.
+        type: str
+        returned: state present
+'''
+
+import hashlib
+import http.client
+import os
+import re
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from ansible.module_utils.basic import AnsibleModule
+
+CHUNK_SIZE = 1024 * 1024
+MB = 1024.0 * 1024.0
+
+
+class SeedError(Exception):
+    '''Raised, if a file cannot be fetched'''
+
+
+def file_checksum(path, hasher=None):
+    '''Return the sha256 hasher updated with the content of the file'''
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher
+
+
+class SeedRequestHandler(BaseHTTPRequestHandler):
+    '''Serves the files of the server by base name, with single byte ranges'''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _range(self, size):
+        '''Return start and end of the requested range, None for the whole file and False for an invalid range'''
+        match = re.match(r'^bytes=(\d*)-(\d*)$', self.headers.get('Range', '').strip())
+        if not match or match.groups() == ('', ''):
+            return None
+        start, end = match.groups()
+        if start == '':
+            start, end = max(size - int(end), 0), size - 1
+        else:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def _send(self, head_only):
+        path = self.server.files.get(self.path.split('?', 1)[0].lstrip('/'))
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        byte_range = self._range(size)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%d' % size)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start, end = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        if byte_range:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, size))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if head_only:
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def do_GET(self):
+        self._send(False)
+
+    def do_HEAD(self):
+        self._send(True)
+
+
+def create_server(files, port, bind='0.0.0.0'):
+    '''Return a server for the files, which are served by their base name'''
+    server = ThreadingHTTPServer((bind, port), SeedRequestHandler)
+    server.daemon_threads = True
+    server.files = {os.path.basename(path): path for path in files}
+    return server
+
+
+def serve(server, pid_file, timeout):
+    '''Serve until the pid_file is removed or the timeout is reached'''
+    with open(pid_file, 'w') as f:
+        f.write('%d\n' % os.getpid())
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.5}, daemon=True)
+    thread.start()
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline and os.path.exists(pid_file):
+            time.sleep(0.5)
+    finally:
+        server.shutdown()
+        server.server_close()
+        read_pid(pid_file, remove=True)
+
+
+def read_pid(pid_file, remove=False):
+    '''Return the process id of the pid_file, None if there is none'''
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip() or 0) or None
+        if remove:
+            os.unlink(pid_file)
+        return pid
+    except (OSError, ValueError):
+        return None
+
+
+def stop(pid_file, wait=10):
+    '''Stop the server of the pid_file and return whether one was running'''
+    pid = read_pid(pid_file, remove=True)
+    if pid is None:
+        return False
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return True
+        time.sleep(0.2)
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+    return True
+
+
+def fetch(url, dest, checksum, timeout=120, socket_timeout=60):
+    '''Fetch url to dest through a partial file, resuming it after errors, and return the transfer stats'''
+    checksum = checksum.lower().split(':', 1)[-1]
+    part = dest + '.part'
+    stats = {'fetched': 0, 'resumed': 0, 'attempts': 0}
+    hasher = None
+    offset = 0
+    if os.path.exists(part):
+        offset = os.path.getsize(part)
+        hasher = file_checksum(part)
+        stats['resumed'] = offset
+    start = time.time()
+    last_progress = start
+    while True:
+        stats['attempts'] += 1
+        request = Request(url, headers={'Range': 'bytes=%d-' % offset} if offset else {})
+        try:
+            try:
+                response = urlopen(request, timeout=socket_timeout)
+            except HTTPError as e:
+                if e.code != 416 or not offset:
+                    raise
+                # The partial file is complete
+                break
+            with response:
+                if response.status != 206:
+                    offset, hasher = 0, hashlib.sha256()
+                hasher = hasher or hashlib.sha256()
+                with open(part, 'ab' if offset else 'wb') as f:
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        offset += len(chunk)
+                        stats['fetched'] += len(chunk)
+                        last_progress = time.time()
+                expected = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+                if not expected.isdigit():
+                    expected = response.headers.get('Content-Length', '')
+                if expected.isdigit() and offset < int(expected):
+                    raise http.client.IncompleteRead(b'', int(expected) - offset)
+            break
+        except HTTPError as e:
+            raise SeedError('Fetching %s failed with status %d' % (url, e.code))
+        except (URLError, OSError, http.client.HTTPException, socket.timeout) as e:
+            if time.time() - last_progress > timeout:
+                raise SeedError('Fetching %s failed, no data for %d seconds: %s' % (url, timeout, e))
+            if not stats['resumed'] and offset:
+                stats['resumed'] = offset
+            time.sleep(min(5, max(timeout, 1)))
+
+    elapsed = time.time() - start
+    if hasher.hexdigest() != checksum:
+        os.unlink(part)
+        raise SeedError('Checksum of %s is %s, expected %s' % (url, hasher.hexdigest(), checksum))
+    os.chmod(part, 0o644)
+    os.replace(part, dest)
+    stats.update(size=os.path.getsize(dest), elapsed=round(elapsed, 3),
+                 throughput=round(stats['fetched'] / MB / elapsed, 1) if elapsed > 0 else 0.0)
+    return stats
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            state=dict(type='str', default='present', choices=['present', 'serving', 'stopped']),
+            url=dict(type='str'),
+            dest=dict(type='path'),
+            checksum=dict(type='str'),
+            files=dict(type='list', elements='path'),
+            port=dict(type='int', default=8190),
+            bind=dict(type='str', default='0.0.0.0'),
+            pid_file=dict(type='path'),
+            timeout=dict(type='int', default=120),
+        ),
+        required_if=[
+            ('state', 'present', ('url', 'dest', 'checksum')),
+            ('state', 'serving', ('files', 'pid_file')),
+            ('state', 'stopped', ('pid_file',)),
+        ],
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    if params['state'] == 'stopped':
+        running = os.path.exists(params['pid_file'])
+        if not module.check_mode:
+            running = stop(params['pid_file'])
+        module.exit_json(changed=running)
+
+    if params['state'] == 'serving':
+        missing = [path for path in params['files'] if not os.path.isfile(path)]
+        if missing:
+            module.fail_json(msg='Cannot serve missing files: %s' % ', '.join(missing))
+        if module.check_mode or not params['files']:
+            module.exit_json(changed=False)
+        # A server left over from an earlier run would block the port
+        stop(params['pid_file'])
+        try:
+            server = create_server(params['files'], params['port'], params['bind'])
+        except OSError as e:
+            module.fail_json(msg='Cannot serve on %s:%d: %s' % (params['bind'], params['port'], e))
+        serve(server, params['pid_file'], params['timeout'])
+        module.exit_json(changed=False)
+
+    dest = params['dest']
+    checksum = params['checksum'].lower().split(':', 1)[-1]
+    if os.path.isfile(dest) and file_checksum(dest).hexdigest() == checksum:
+        module.exit_json(changed=False, size=os.path.getsize(dest), fetched=0, resumed=0, attempts=0,
+                         elapsed=0.0, throughput=0.0, msg='%s is up to date' % dest)
+    if module.check_mode:
+        module.exit_json(changed=True, msg='%s would be fetched from %s' % (dest, params['url']))
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        stats = fetch(params['url'], dest, checksum, params['timeout'])
+    except (SeedError, OSError) as e:
+        module.fail_json(msg=str(e))
+    msg = 'Fetched %.1f MB from %s in %.1fs, %.1f MB/s' % (stats['fetched'] / MB, params['url'], stats['elapsed'], stats['throughput'])
+    if stats['resumed']:
+        msg += ', resumed at %.1f MB' % (stats['resumed'] / MB)
+    module.exit_json(changed=True, msg=msg, **stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Splunk Platform Automator inventory plugin.
+
+Generates synthetic splunk_config.yml files with multiple splunk_environments,
+indexer clusters and search head clusters, runs the inventory plugin against an
+in-memory Ansible inventory (no hosts are contacted) and reports the time and
+peak memory of every inventory phase.
+
+Usage:
+    python tests/benchmark_inventory.py
+    python tests/benchmark_inventory.py --hosts 10,1000,20000 --repeat 5
+    python tests/benchmark_inventory.py --json results.json
+    python tests/benchmark_inventory.py --baseline results.json --tolerance 1.5
+    python tests/benchmark_inventory.py --validation --hosts 1000,20000
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import inventory_loader
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PLUGIN_NAME = 'splunk-platform-automator'
+DEFAULT_SIZES = [10, 100, 1000, 5000, 10000, 20000]
+
+# Plugin methods measured as phases, nested phases are included in the outer ones
+PHASES = [
+    ('total', 'parse'),
+    ('config parsing', '_load_config'),
+    ('option extraction', '_set_config_options'),
+    ('reading defaults', '_populate_defaults'),
+    ('populating inventory', '_populate'),
+    ('topology', '_populate_topology'),
+]
+SCHEMA_PHASE = ('schema validation', 'validate_config')
+
+inventory_loader.add_directory(os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory'))
+
+
+def synthetic_config(num_hosts, num_envs=3, idxc_per_env=2, shc_per_env=1):
+    """
+    Return a splunk_config.yml dict with about num_hosts hosts.
+
+    Small sizes get fewer environments and clusters, the remaining hosts are
+    universal forwarders.
+    """
+    num_envs = max(1, min(num_envs, num_hosts // 100))
+    budget = num_hosts // num_envs
+    idxc_count = max(1, min(idxc_per_env, budget // 50))
+    shc_count = min(shc_per_env, budget // 50)
+    indexers = max(2, budget // 20 // idxc_count)
+    search_heads = 3 + budget // 200
+
+    config = {
+        'plugin': PLUGIN_NAME,
+        'cache': False,
+        'force_validate': True,
+        'splunk_defaults': {'splunk_license_file': 'Splunk.License'},
+        'splunk_environments': [],
+        'splunk_idxclusters': [],
+        'splunk_shclusters': [],
+        'splunk_hosts': [],
+    }
+    for env_num in range(1, num_envs + 1):
+        env = 'env%d' % env_num
+        hosts = []
+        config['splunk_environments'].append({'splunk_env_name': env})
+        hosts.append({'name': env + '-ds', 'roles': ['deployment_server']})
+        hosts.append({'name': env + '-mc', 'roles': ['monitoring_console', 'license_manager']})
+        for idxc_num in range(1, idxc_count + 1):
+            idxc = '%s_idxc%d' % (env, idxc_num)
+            config['splunk_idxclusters'].append({'idxc_name': idxc, 'idxc_site_rf': 'origin:1,total:2', 'idxc_site_sf': 'origin:1,total:2'})
+            hosts.append({'name': idxc + '-cm', 'roles': ['cluster_manager'], 'idxcluster': idxc, 'site': 'site1'})
+            per_site = (indexers + 1) // 2
+            for site_num in [1, 2]:
+                hosts.append({'iter': {'prefix': '%s-s%d-idx' % (idxc, site_num), 'numbers': '1..%d' % per_site},
+                              'roles': ['indexer'], 'idxcluster': idxc, 'site': 'site%d' % site_num})
+        for shc_num in range(1, shc_count + 1):
+            shc = '%s_shc%d' % (env, shc_num)
+            config['splunk_shclusters'].append({'shc_name': shc})
+            hosts.append({'name': shc + '-dp', 'roles': ['deployer'], 'shcluster': shc})
+            hosts.append({'list': ['%s-sh%d' % (shc, num) for num in range(1, search_heads + 1)],
+                          'roles': ['search_head'], 'shcluster': shc})
+        hosts.append({'name': env + '-hf', 'roles': ['heavy_forwarder']})
+
+        host_count = sum(count_hosts(host) for host in hosts)
+        if budget > host_count:
+            hosts.append({'iter': {'prefix': env + '-uf', 'numbers': '1..%d' % (budget - host_count)},
+                          'roles': ['universal_forwarder']})
+        for host in hosts:
+            host['splunk_env'] = env
+        config['splunk_hosts'].extend(hosts)
+
+    for section in ['splunk_idxclusters', 'splunk_shclusters']:
+        if not config[section]:
+            del config[section]
+    return config
+
+
+def count_hosts(host):
+    """Return the number of hosts of a splunk_hosts entry."""
+    if 'list' in host:
+        return len(host['list'])
+    if 'iter' in host:
+        start, end = host['iter']['numbers'].split('..')
+        return int(end) - int(start) + 1
+    return 1
+
+
+def explicit_hosts(config):
+    """Return the config with a splunk_hosts entry per host, like configs generated by other tools."""
+    config = dict(config)
+    hosts = []
+    for host in config['splunk_hosts']:
+        if 'list' in host:
+            names = host['list']
+        elif 'iter' in host:
+            start, end = host['iter']['numbers'].split('..')
+            names = ['%s%d' % (host['iter']['prefix'], num) for num in range(int(start), int(end) + 1)]
+        else:
+            names = [host['name']]
+        for name in names:
+            entry = {key: value for key, value in host.items() if key not in ['name', 'list', 'iter']}
+            entry['name'] = name
+            hosts.append(entry)
+    config['splunk_hosts'] = hosts
+    return config
+
+
+def create_software_dir(directory):
+    """Create a software directory with the archives, baseconfig apps and license file."""
+    for app in ['org_ds_secure_server', 'org_cluster_manager_base']:
+        os.makedirs(os.path.join(directory, 'baseconfigs', app), exist_ok=True)
+    for name in ['splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz',
+                 'splunkforwarder-9.4.1-e3bdab203ac8-linux-amd64.tgz',
+                 'Splunk.License']:
+        open(os.path.join(directory, name), 'w').close()
+
+
+class PhaseRecorder:
+    """Record time and peak memory of the plugin phases."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = {}
+        self.stack = []
+
+    def wrap(self, phase, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frame = {'peak': 0, 'memory': 0}
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+                tracemalloc.reset_peak()
+                frame['memory'] = current
+            self.stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                self.stack.pop()
+                result = self.results.setdefault(phase, {'seconds': 0.0, 'peak_bytes': 0})
+                result['seconds'] += duration
+                if self.trace_memory:
+                    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                    result['peak_bytes'] = max(result['peak_bytes'], peak - frame['memory'])
+                    if self.stack:
+                        self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+        return wrapper
+
+
+def run_plugin(config_path, trace_memory=False):
+    """Run the inventory plugin once and return the phase results and the inventory."""
+    plugin = inventory_loader.get(PLUGIN_NAME)
+    plugin_class = type(plugin)
+    plugin_module = sys.modules[plugin_class.__module__]
+    recorder = PhaseRecorder(trace_memory)
+
+    originals = {name: getattr(plugin_class, name) for _, name in PHASES}
+    originals['_init_inventory'] = plugin_class._init_inventory
+    originals['_inventory_dir'] = plugin_class._inventory_dir
+    schema_validation = getattr(plugin_module, SCHEMA_PHASE[1], None)
+    try:
+        for phase, name in PHASES:
+            setattr(plugin_class, name, recorder.wrap(phase, originals[name]))
+        # Do not create the inventory directory in the project root
+        plugin_class._init_inventory = lambda self: None
+        plugin_class._inventory_dir = lambda self: os.path.dirname(config_path)
+        if schema_validation:
+            setattr(plugin_module, SCHEMA_PHASE[1], recorder.wrap(SCHEMA_PHASE[0], schema_validation))
+
+        inventory = InventoryData()
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            plugin.parse(inventory, DataLoader(), config_path, cache=False)
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+    finally:
+        for name, method in originals.items():
+            setattr(plugin_class, name, method)
+        if schema_validation:
+            setattr(plugin_module, SCHEMA_PHASE[1], schema_validation)
+    return recorder.results, inventory
+
+
+def run_benchmark(sizes, repeat=3, trace_memory=True, work_dir=None):
+    """Run the benchmark for all sizes and return the results as list of dicts."""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        software_dir = os.path.join(tmp_dir, 'Software')
+        create_software_dir(software_dir)
+        # The plugin reads the defaults relative to the project root
+        os.chdir(PROJECT_ROOT)
+        try:
+            for size in sizes:
+                config = synthetic_config(size)
+                config['splunk_dirs'] = {'splunk_software_dir': software_dir, 'splunk_baseconfig_dir': software_dir}
+                config_path = os.path.join(tmp_dir, 'splunk_config_%d.yml' % size)
+                with open(config_path, 'w') as file:
+                    yaml.safe_dump(config, file)
+
+                # Fastest run per phase, memory tracing slows down the plugin
+                phases = {}
+                for _ in range(repeat):
+                    run_results, inventory = run_plugin(config_path)
+                    for phase, values in run_results.items():
+                        best = phases.setdefault(phase, {'seconds': values['seconds'], 'peak_bytes': None})
+                        best['seconds'] = min(best['seconds'], values['seconds'])
+                if trace_memory:
+                    memory_results, _ = run_plugin(config_path, trace_memory=True)
+                    for phase, values in memory_results.items():
+                        phases[phase]['peak_bytes'] = values['peak_bytes']
+
+                results.append({
+                    'size': size,
+                    'hosts': len(inventory.hosts),
+                    'groups': len(inventory.groups),
+                    'environments': len(config['splunk_environments']),
+                    'phases': phases,
+                })
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def run_validation_benchmark(sizes, repeat=3):
+    """
+    Compare the pydantic validation with the compiled checks of schema_validator.py.
+
+    The configs have a splunk_hosts entry per host, the pydantic models are built
+    before the measurement.
+    """
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory'))
+    import schema
+    import schema_validator
+
+    results = []
+    for size in sizes:
+        config = explicit_hosts(synthetic_config(size))
+        phases = {}
+        for phase, validate in [('pydantic', schema.validate_config), ('compiled', schema_validator.check_config)]:
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                validate(config)
+                seconds.append(time.perf_counter() - start)
+            phases[phase] = {'seconds': min(seconds), 'peak_bytes': None}
+        if not schema_validator.check_config(config):
+            raise RuntimeError('The compiled checks do not accept the config with %d hosts' % size)
+        results.append({'size': size, 'hosts': len(config['splunk_hosts']), 'phases': phases})
+    return results
+
+
+def print_validation_results(results):
+    print('%8s %8s %14s %14s %10s' % ('size', 'entries', 'pydantic [s]', 'compiled [s]', 'speedup'))
+    for entry in results:
+        pydantic_seconds = entry['phases']['pydantic']['seconds']
+        compiled_seconds = entry['phases']['compiled']['seconds']
+        print('%8d %8d %14.4f %14.4f %9.1fx' % (entry['size'], entry['hosts'], pydantic_seconds, compiled_seconds,
+                                                pydantic_seconds / compiled_seconds))
+
+
+def compare_baseline(results, baseline, tolerance, min_seconds=0.01):
+    """Return the phases, which are slower than the baseline times the tolerance."""
+    baseline_phases = {(entry['size'], phase): values for entry in baseline for phase, values in entry['phases'].items()}
+    regressions = []
+    for entry in results:
+        for phase, values in entry['phases'].items():
+            base = baseline_phases.get((entry['size'], phase))
+            if base is None:
+                continue
+            limit = max(base['seconds'] * tolerance, min_seconds)
+            if values['seconds'] > limit:
+                regressions.append('%d hosts, %s: %.3fs > %.3fs' % (entry['size'], phase, values['seconds'], limit))
+    return regressions
+
+
+def print_results(results):
+    print('%8s %8s  %-22s %10s %10s' % ('size', 'hosts', 'phase', 'time [s]', 'peak [MB]'))
+    for entry in results:
+        phase_names = [phase for phase, _ in PHASES[1:]] + [SCHEMA_PHASE[0], PHASES[0][0]]
+        for phase in phase_names:
+            values = entry['phases'].get(phase)
+            if values is None:
+                continue
+            peak = '-' if values['peak_bytes'] is None else '%.1f' % (values['peak_bytes'] / 1024 / 1024)
+            print('%8d %8d  %-22s %10.4f %10s' % (entry['size'], entry['hosts'], phase, values['seconds'], peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the inventory plugin with synthetic topologies')
+    parser.add_argument('--hosts', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma separated list of host counts (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size, the fastest one is reported (default: %(default)s)')
+    parser.add_argument('--no-memory', action='store_true', help='Do not measure the peak memory')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the times with the results of a previous run')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Allowed slowdown factor compared to the baseline (default: %(default)s)')
+    parser.add_argument('--validation', action='store_true',
+                        help='Compare the pydantic validation with the compiled checks, instead of running the plugin')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.hosts.split(',')]
+    if args.validation:
+        results = run_validation_benchmark(sizes, repeat=args.repeat)
+        print_validation_results(results)
+    else:
+        results = run_benchmark(sizes, repeat=args.repeat, trace_memory=not args.no_memory)
+        print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_baseline(results, json.load(file), args.tolerance)
+        if regressions:
+            print('\nRegressions compared to %s:' % args.baseline)
+            for regression in regressions:
+                print('  - ' + regression)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
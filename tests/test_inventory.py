@@ -0,0 +1,979 @@
+"""
+Unit tests for the Splunk Platform Automator inventory plugin.
+
+Runs the plugin in ansible/plugins/inventory/splunk-platform-automator.py against
+small configurations without any infrastructure.
+"""
+
+import copy
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import pytest
+import yaml
+
+pytest.importorskip("ansible")
+
+from ansible.errors import AnsibleParserError
+from ansible.inventory.data import InventoryData
+from ansible.inventory.helpers import get_group_vars
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import inventory_loader
+from ansible.template import Templar, trust_as_template
+from ansible.utils.vars import combine_vars
+from ansible.vars.hostvars import HostVars
+from ansible.vars.manager import VariableManager
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory'))
+from host_range import HostRange
+from inventory_export import load_export
+from test_spash import load_spash
+
+inventory_loader.add_directory(os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory'))
+
+
+def get_plugin():
+    """Load the inventory plugin through Ansible, so the plugin options are known."""
+    return inventory_loader.get('splunk-platform-automator')
+
+
+@pytest.fixture
+def software_dir(tmp_path):
+    """Create a software directory with baseconfig apps and Splunk archives."""
+    software = tmp_path / 'Software'
+    for app in ['org_ds_secure_server', 'org_cluster_manager_base']:
+        (software / 'baseconfigs' / app).mkdir(parents=True)
+    for archive in ['splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz',
+                    'splunkforwarder-9.4.1-e3bdab203ac8-linux-amd64.tgz',
+                    'Splunk.License']:
+        (software / archive).touch()
+    return software
+
+
+@pytest.fixture
+def run_inventory(tmp_path, software_dir, monkeypatch):
+    """Return a function, which runs the plugin for a config and returns the inventory."""
+    # The plugin reads defaults/*.yml relative to the project root
+    monkeypatch.chdir(PROJECT_ROOT)
+    # Do not create the inventory directory in the project root
+    monkeypatch.setattr(type(get_plugin()), '_init_inventory', lambda self: None)
+    inventory_dir = tmp_path / 'inventory'
+    inventory_dir.mkdir()
+    monkeypatch.setattr(type(get_plugin()), '_inventory_dir', lambda self: str(inventory_dir))
+
+    def run(config, plugin=None):
+        config.setdefault('plugin', 'splunk-platform-automator')
+        config.setdefault('cache', False)
+        config.setdefault('splunk_dirs', {})
+        config['splunk_dirs'].setdefault('splunk_software_dir', str(software_dir))
+        config['splunk_dirs'].setdefault('splunk_baseconfig_dir', str(software_dir))
+        config_dir = tmp_path / 'config'
+        config_dir.mkdir(exist_ok=True)
+        config_path = config_dir / 'splunk_config.yml'
+        config_path.write_text(yaml.safe_dump(config))
+
+        inventory = InventoryData()
+        plugin = plugin or get_plugin()
+        plugin.parse(inventory, DataLoader(), str(config_path), cache=True)
+        return inventory
+
+    return run
+
+
+def group_vars(inventory, group):
+    return inventory.groups[group].get_vars()
+
+
+def render_dynamic_vars(inventory, hostname, names):
+    """Render variables of group_vars/all/dynamic.yml for a host, like a playbook does."""
+    inventory.reconcile_inventory()
+    loader = DataLoader()
+    manager = InventoryManager(loader, sources=[])
+    manager._inventory = inventory
+    variable_manager = VariableManager(loader, inventory=manager)
+    variable_manager._hostvars = HostVars(manager, variable_manager, loader)
+    variables = variable_manager.get_vars(host=manager.get_host(hostname))
+    variables.update(loader.load_from_file(os.path.join(PROJECT_ROOT, 'ansible', 'group_vars', 'all', 'dynamic.yml'),
+                                           trusted_as_template=True))
+    templar = Templar(loader, variables=variables)
+    return {name: templar.template(trust_as_template('{{ %s }}' % name)) for name in names}
+
+
+def distributed_config():
+    return {
+        'splunk_idxclusters': [{'idxc_name': 'idxc1'}],
+        'splunk_shclusters': [{'shc_name': 'shc1'}],
+        'splunk_hosts': [
+            {'name': 'ds', 'roles': ['deployment_server', 'deployer'], 'shcluster': 'shc1'},
+            {'name': 'cm', 'roles': ['cluster_manager', 'monitoring_console'], 'idxcluster': 'idxc1'},
+            {'iter': {'prefix': 'idx', 'numbers': '1..2'}, 'roles': ['indexer'], 'idxcluster': 'idxc1'},
+            {'name': 'idx3', 'roles': ['indexer']},
+            {'iter': {'prefix': 'sh', 'numbers': '1..3'}, 'roles': ['search_head'], 'shcluster': 'shc1'},
+            {'name': 'sh4', 'roles': ['search_head']},
+            {'name': 'hf', 'roles': ['heavy_forwarder']},
+            {'name': 'uf', 'roles': ['universal_forwarder']},
+        ],
+    }
+
+
+class TestTopology:
+    """Test the precomputed topology lists on the splunk_env groups."""
+
+    def test_topology_lists(self, run_inventory):
+        inventory = run_inventory(distributed_config())
+        topology = group_vars(inventory, 'splunk_env_splk')['splunk_topology']
+
+        assert topology['splunk_idxc_cm_list'] == ['cm']
+        assert topology['splunk_idxc_name_list'] == ['idxc1']
+        assert topology['splunk_idxc_all_host_list'] == ['idx1', 'idx2']
+        assert topology['splunk_idxc_indexer_list'] == ['idx1', 'idx2']
+        assert topology['splunk_indexer_list'] == ['idx3']
+        assert topology['splunk_heavy_forwarder_list'] == ['hf']
+        assert topology['splunk_shc_all_host_list'] == ['sh1', 'sh2', 'sh3']
+        assert topology['splunk_search_head_list'] == ['sh4']
+        assert topology['splunk_shc_dp_list'] == ['ds']
+        assert topology['splunk_deployment_server'] == ['ds']
+        assert topology['splunk_monitoring_console'] == ['cm']
+        assert topology['splunk_dservers'] == ['ds', 'idx3', 'sh1', 'sh2', 'sh3', 'sh4', 'hf']
+        assert topology['splunk_outputs_name_list'] == ['all']
+        assert topology['splunk_search_peer_name_list'] == ['all']
+
+    def test_dsclients_exclude_deployment_server(self, run_inventory):
+        inventory = run_inventory(distributed_config())
+        topology = group_vars(inventory, 'splunk_env_splk')['splunk_topology']
+
+        assert topology['splunk_idx_hf_dsclients'] == [{'server': 'idx3', 'num': 0}, {'server': 'hf', 'num': 1}]
+        assert topology['splunk_sh_dsclients'] == [{'server': 'sh4', 'num': 0}]
+        servers = [client['server'] for client in topology['splunk_hf_sh_lm_cm_ds_dp_mc_dsclients']]
+        assert servers == ['hf', 'sh4', 'cm']
+        servers = [client['server'] for client in topology['splunk_license_dsclients']]
+        assert servers == ['cm', 'idx3', 'sh4', 'hf']
+
+    def test_topology_per_environment(self, run_inventory):
+        config = {
+            'splunk_environments': [{'splunk_env_name': 'prod'}, {'splunk_env_name': 'test'}],
+            'splunk_hosts': [
+                {'name': 'prod-idx', 'roles': ['indexer'], 'splunk_env': 'prod'},
+                {'name': 'test-idx', 'roles': ['indexer'], 'splunk_env': 'test'},
+            ],
+        }
+        inventory = run_inventory(config)
+
+        assert group_vars(inventory, 'splunk_env_prod')['splunk_topology']['splunk_indexer_list'] == ['prod-idx']
+        assert group_vars(inventory, 'splunk_env_test')['splunk_topology']['splunk_indexer_list'] == ['test-idx']
+
+    def test_precompute_topology_disabled(self, run_inventory):
+        config = distributed_config()
+        config['general'] = {'precompute_topology': False}
+        inventory = run_inventory(config)
+
+        assert 'splunk_topology' not in group_vars(inventory, 'splunk_env_splk')
+
+    def environments_config(self):
+        config = distributed_config()
+        config['splunk_defaults'] = {'splunk_license_file': 'Splunk.License'}
+        config['splunk_environments'] = [{'splunk_env_name': 'prod'}, {'splunk_env_name': 'test'}]
+        for host in config['splunk_hosts']:
+            host['splunk_env'] = 'prod'
+        config['splunk_hosts'] += [
+            {'name': 'test-ds', 'roles': ['deployment_server', 'license_manager'], 'splunk_env': 'test'},
+            {'name': 'test-idx', 'roles': ['indexer'], 'splunk_env': 'test'},
+            {'name': 'test-hf', 'roles': ['heavy_forwarder'], 'splunk_env': 'test'},
+        ]
+        return config
+
+    def assert_matches_dynamic_templates(self, run_inventory, config):
+        precomputed = run_inventory(copy.deepcopy(config))
+        config['general'] = {'precompute_topology': False}
+        templated = run_inventory(config)
+
+        def unordered(value):
+            # The set based filters of the templates do not keep the order, so the clients are numbered differently
+            if value and isinstance(value[0], dict):
+                assert sorted(client['num'] for client in value) == list(range(len(value)))
+                value = [client['server'] for client in value]
+            return sorted(value)
+
+        for splunk_env, hostname in [('prod', 'ds'), ('test', 'test-idx')]:
+            topology = group_vars(precomputed, 'splunk_env_' + splunk_env)['splunk_topology']
+            rendered = render_dynamic_vars(templated, hostname, topology)
+            for name, value in topology.items():
+                assert unordered(rendered[name]) == unordered(value), name
+        return precomputed
+
+    def test_topology_matches_dynamic_templates(self, run_inventory):
+        self.assert_matches_dynamic_templates(run_inventory, self.environments_config())
+
+    def test_outputs_and_search_peers_match_dynamic_templates(self, run_inventory):
+        config = self.environments_config()
+        config['splunk_environments'][1]['splunk_search_peers'] = 'test_peers'
+        config['splunk_idxclusters'][0]['splunk_outputs'] = 'idxc_outputs'
+        config['splunk_hosts'][-1]['custom'] = {'splunk_outputs': 'hf_outputs'}
+        config['splunk_hosts'][6]['os'] = {'splunk_search_peers': 'hf_peers'}
+        inventory = self.assert_matches_dynamic_templates(run_inventory, config)
+
+        topology = group_vars(inventory, 'splunk_env_prod')['splunk_topology']
+        assert topology['splunk_outputs_name_list'] == ['all', 'idxc_outputs']
+        assert topology['splunk_search_peer_name_list'] == ['all', 'hf_peers']
+        topology = group_vars(inventory, 'splunk_env_test')['splunk_topology']
+        assert topology['splunk_outputs_name_list'] == ['all', 'hf_outputs']
+        assert topology['splunk_search_peer_name_list'] == ['test_peers']
+
+
+class TestHostVars:
+    """Test the host variables of hosts defined by list or iter."""
+
+    def config(self):
+        return {
+            'splunk_environments': [{'splunk_env_name': 'prod', 'splunk_version': '9.3.0'}],
+            'splunk_hosts': [
+                {'iter': {'prefix': 'uf', 'numbers': '1..3'}, 'roles': ['universal_forwarder'], 'splunk_env': 'prod',
+                 'splunk_version': '9.4.1', 'os': {'time_zone': 'Europe/Zurich'}, 'splunk_conf': {'inputs': {}}},
+                {'name': 'hf', 'roles': ['heavy_forwarder'], 'splunk_env': 'prod', 'splunk_version': '9.4.1'},
+            ],
+        }
+
+    def effective_vars(self, inventory, hostname):
+        host = inventory.hosts[hostname]
+        return combine_vars(get_group_vars(host.get_groups()), host.get_vars())
+
+    def test_shared_vars_on_entry_group(self, run_inventory):
+        inventory = run_inventory(self.config())
+        group = inventory.groups['splunk_hosts_0']
+
+        assert [host.name for host in group.hosts] == ['uf1', 'uf2', 'uf3']
+        assert group.priority == 100
+        assert group.vars == {'splunk_version': '9.4.1', 'time_zone': 'Europe/Zurich', 'splunk_conf': {'inputs': {}}}
+        assert 'splunk_version' not in inventory.hosts['uf1'].vars
+        # Single hosts keep their host vars
+        assert 'splunk_hosts_1' not in inventory.groups
+        assert inventory.hosts['hf'].vars['splunk_version'] == '9.4.1'
+
+    def test_group_vars_all_files(self, run_inventory, tmp_path, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        group_vars_dir = tmp_path / 'group_vars' / 'all'
+        (group_vars_dir / 'splunk').mkdir(parents=True)
+        monkeypatch.setattr(plugin_module, 'GROUP_VARS_DIR', str(group_vars_dir.parent))
+        # All the files Ansible loads for the group all, in any YAML style
+        (group_vars_dir / 'os.yaml').write_text('---\n{time_zone: UTC}\n')
+        (group_vars_dir / 'splunk' / 'version').write_text("&version splunk_version: '9.3.0'\n")
+        (group_vars_dir / 'conf.json').write_text('{"splunk_conf": {}}')
+        (group_vars_dir / '.hidden.yml').write_text('owner: nobody\n')
+        config = self.config()
+        config['splunk_hosts'][0]['custom'] = {'owner': 'fleet'}
+        inventory = run_inventory(config)
+
+        assert inventory.groups['splunk_hosts_0'].vars == {'owner': 'fleet'}
+        assert inventory.hosts['uf1'].vars['splunk_version'] == '9.4.1'
+        assert inventory.hosts['uf1'].vars['time_zone'] == 'Europe/Zurich'
+        assert inventory.hosts['uf1'].vars['splunk_conf'] == {'inputs': {}}
+
+        # Without the variable names all variables stay host vars
+        (group_vars_dir / 'broken.yml').write_text('splunk_version: [\n')
+        inventory = run_inventory(self.config())
+        assert 'splunk_hosts_0' not in inventory.groups
+        assert inventory.hosts['uf1'].vars['time_zone'] == 'Europe/Zurich'
+
+    def test_shared_vars_override_group_vars(self, run_inventory):
+        hoisted = run_inventory(self.config())
+        config = self.config()
+        config['general'] = {'hoist_host_vars': False}
+        not_hoisted = run_inventory(config)
+
+        for key in ['splunk_version', 'time_zone', 'splunk_conf']:
+            assert self.effective_vars(hoisted, 'uf2')[key] == self.effective_vars(not_hoisted, 'uf2')[key]
+        assert self.effective_vars(hoisted, 'uf2')['splunk_version'] == '9.4.1'
+        assert 'splunk_hosts_0' not in not_hoisted.groups
+
+    def test_iter_ranges(self, run_inventory):
+        config = self.config()
+        config['splunk_hosts'][0]['iter'] = {'prefix': 'uf-', 'ranges': [['east', 'west'], '1..5/2'], 'separator': '-',
+                                             'exclude': ['uf-west-3']}
+        inventory = run_inventory(config)
+
+        assert [host.name for host in inventory.groups['splunk_hosts_0'].hosts] == [
+            'uf-east-1', 'uf-east-3', 'uf-east-5', 'uf-west-1', 'uf-west-5']
+
+
+class TestTerraformTemplate:
+    """Test the host names of template/terraform_aws.tfvars.j2."""
+
+    def render(self, splunk_hosts):
+        loader = DataLoader()
+        with open(os.path.join(PROJECT_ROOT, 'template', 'terraform_aws.tfvars.j2')) as f:
+            template = f.read()
+        default_config = loader.load_from_file(os.path.join(PROJECT_ROOT, 'defaults', 'aws.yml'))
+        variables = {'splunk_hosts': splunk_hosts, 'terraform': {'aws': {}}, 'default_config': default_config}
+        return Templar(loader, variables=variables).template(trust_as_template(template))
+
+    def test_iter_hosts_match_inventory(self):
+        iterations = [
+            {'prefix': 'idx', 'numbers': '1..3'},
+            {'prefix': 'uf', 'numbers': '001..009/2', 'exclude': ['uf005']},
+            {'prefix': 'uf-', 'ranges': [['east', 'west'], '1..12/5'], 'separator': '-', 'postfix': '.lab'},
+        ]
+        splunk_hosts = [{'name': 'cm', 'roles': ['cluster_manager']}, {'list': ['hf1', 'hf2'], 'roles': ['heavy_forwarder']}]
+        splunk_hosts += [{'iter': iteration, 'roles': ['universal_forwarder']} for iteration in iterations]
+        content = self.render(splunk_hosts)
+
+        expected = ['cm', 'hf1', 'hf2']
+        for iteration in iterations:
+            expected.extend(HostRange.from_config(iteration))
+        assert re.findall(r'^  "(.+)" = \{$', content, re.MULTILINE) == expected
+        # Only the last host has no trailing comma
+        assert content.count('  },\n') == len(expected) - 1
+
+
+class TestChangeTracking:
+    """Test the changed_hosts group and the change report."""
+
+    def config(self):
+        return {
+            'splunk_hosts': [
+                {'name': 'idx1', 'roles': ['indexer']},
+                {'iter': {'prefix': 'uf', 'numbers': '1..3'}, 'roles': ['universal_forwarder']},
+            ],
+        }
+
+    def changed_hosts(self, inventory):
+        return [host.name for host in inventory.groups['changed_hosts'].hosts]
+
+    def report(self, tmp_path):
+        with open(tmp_path / 'inventory' / 'changed_hosts.json') as f:
+            return json.load(f)
+
+    def test_first_build(self, run_inventory, tmp_path):
+        inventory = run_inventory(self.config())
+
+        assert self.changed_hosts(inventory) == ['idx1', 'uf1', 'uf2', 'uf3']
+        assert self.report(tmp_path)['hosts']['added'] == ['idx1', 'uf1', 'uf2', 'uf3']
+
+    def test_changes_kept_until_next_change(self, run_inventory, tmp_path):
+        run_inventory(self.config())
+        config = self.config()
+        config['splunk_hosts'][0]['splunk_version'] = '9.4.1'
+        config['splunk_hosts'][1]['iter']['numbers'] = '2..4'
+        run_inventory(config)
+        # Building the same inventory again does not reset the changes
+        inventory = run_inventory(config)
+
+        assert self.changed_hosts(inventory) == ['uf4', 'idx1']
+        report = self.report(tmp_path)
+        assert report['hosts'] == {'added': ['uf4'], 'removed': ['uf1'], 'changed': {'idx1': {'vars': ['splunk_version']}}}
+        assert report['groups']['changed']['role_universal_forwarder'] == []
+
+    def test_changed_group_vars(self, run_inventory, tmp_path):
+        run_inventory(self.config())
+        config = self.config()
+        config['splunk_defaults'] = {'splunk_version': '9.4.1'}
+        inventory = run_inventory(config)
+
+        assert self.changed_hosts(inventory) == ['idx1', 'uf1', 'uf2', 'uf3']
+        assert self.report(tmp_path)['groups']['changed'] == {'all': ['splunk_version']}
+
+    def test_disabled(self, run_inventory, tmp_path):
+        config = self.config()
+        config['track_changes'] = False
+        inventory = run_inventory(config)
+
+        assert 'changed_hosts' not in inventory.groups
+        assert not (tmp_path / 'inventory' / 'changed_hosts.json').exists()
+
+
+class TestInventoryExport:
+    """Test the inventory export for tools not using Ansible."""
+
+    def config(self):
+        config = distributed_config()
+        config['custom'] = {'ansible_user': 'splunk'}
+        config['splunk_hosts'][2]['site'] = 'site1'
+        config['splunk_hosts'][2]['custom'] = {'ansible_port': 2222}
+        return config
+
+    def test_export(self, run_inventory, tmp_path):
+        run_inventory(self.config())
+        export = load_export(str(tmp_path / 'inventory'))
+
+        assert export.host_names() == ['cm', 'ds', 'hf', 'idx1', 'idx2', 'idx3', 'sh1', 'sh2', 'sh3', 'sh4', 'uf']
+        assert export.hosts['idx2'] == {
+            'roles': ['indexer'], 'splunk_env': 'splk', 'idxcluster': 'idxc1', 'site': 'site1',
+            'vars': {'ansible_user': 'splunk', 'ansible_port': 2222},
+        }
+        assert export.hosts_with('roles', 'search_head') == ['sh1', 'sh2', 'sh3', 'sh4']
+        assert export.hosts_with('shcluster', 'shc1') == ['ds', 'sh1', 'sh2', 'sh3']
+
+    def test_group_connection_vars(self, run_inventory, tmp_path):
+        config = self.config()
+        config['splunk_environments'] = [{'splunk_env_name': 'splk', 'ansible_user': 'admin', 'ansible_ssh_private_key_file': '~/.ssh/splk'}]
+        config['splunk_idxclusters'][0].update({'ansible_user': 'idxc', 'ansible_port': 2200})
+        config['splunk_shclusters'][0]['ansible_ssh_private_key_file'] = '~/.ssh/shc'
+        inventory = run_inventory(config)
+        inventory.reconcile_inventory()
+        export = load_export(str(tmp_path / 'inventory'))
+
+        assert export.hosts['uf']['vars'] == {'ansible_user': 'admin', 'ansible_ssh_private_key_file': '~/.ssh/splk'}
+        # Same as ansible-inventory --list
+        for hostname, host in inventory.hosts.items():
+            host_vars = combine_vars(get_group_vars(host.get_groups()), host.get_vars())
+            assert export.hosts[hostname]['vars'] == {key: val for key, val in host_vars.items() if key.startswith('ansible_')}
+
+    def test_static_inventory_vars(self, run_inventory, tmp_path):
+        run_inventory(self.config())
+        inventory_dir = tmp_path / 'inventory'
+        (inventory_dir / 'hosts').write_text('# Generated\nidx1 ansible_host=10.0.0.1 public_dns_name=idx1.example.com\n')
+        (inventory_dir / 'host_vars' / 'uf').mkdir(parents=True)
+        (inventory_dir / 'host_vars' / 'uf' / 'network_info.yml').write_text('ansible_host: 192.168.60.100\n')
+        inventory = load_export(str(inventory_dir)).to_ansible_list()
+
+        assert inventory['_meta']['hostvars']['idx1']['ansible_host'] == '10.0.0.1'
+        assert inventory['_meta']['hostvars']['idx1']['public_dns_name'] == 'idx1.example.com'
+        assert inventory['_meta']['hostvars']['uf'] == {
+            'ansible_user': 'splunk', 'ansible_host': '192.168.60.100', 'splunk_env_name': 'splk'}
+        assert inventory['_meta']['hostvars']['idx1']['idxc_name'] == 'idxc1'
+        assert inventory['role_universal_forwarder'] == {'hosts': ['uf']}
+        assert inventory['shcluster_shc1'] == {'hosts': ['ds', 'sh1', 'sh2', 'sh3']}
+
+    def test_stale_export(self, run_inventory, tmp_path):
+        run_inventory(self.config())
+        config_file = tmp_path / 'config' / 'splunk_config.yml'
+        export_file = tmp_path / 'inventory' / 'splunk_inventory.json'
+        # Saving the file again does not change the config
+        os.utime(config_file, (time.time() + 10, time.time() + 10))
+        assert load_export(str(tmp_path / 'inventory'), str(config_file)) is not None
+
+        with open(config_file, 'a') as f:
+            f.write('# changed\n')
+        os.utime(config_file, (time.time() + 10, time.time() + 10))
+        assert load_export(str(tmp_path / 'inventory'), str(config_file)) is None
+
+    def test_touched_config_keeps_export(self, run_inventory, tmp_path, monkeypatch):
+        spash = load_spash()
+        monkeypatch.setattr(spash, 'BASE_DIR', str(tmp_path))
+        config = self.config()
+        config['include'] = ['hosts/*.yml']
+        config.update({'cache': True, 'cache_plugin': 'jsonfile', 'cache_connection': str(tmp_path / 'cache')})
+        (tmp_path / 'config' / 'hosts').mkdir(parents=True)
+        fragment = tmp_path / 'config' / 'hosts' / 'forwarders.yml'
+        fragment.write_text(yaml.safe_dump({'splunk_hosts': [{'name': 'uf2', 'roles': ['universal_forwarder']}]}))
+        plugin = get_plugin()
+        run_inventory(dict(config), plugin=plugin)
+        plugin.update_cache_if_changed()
+
+        # Writing the same config again and touching the included file keeps the cached inventory
+        monkeypatch.setattr(type(get_plugin()), '_populate', lambda self: pytest.fail('inventory was not cached'))
+        os.utime(fragment, (time.time() + 10, time.time() + 10))
+        run_inventory(dict(config))
+
+        inventory = spash.get_exported_inventory()
+        assert inventory is not None
+        assert inventory['role_universal_forwarder'] == {'hosts': ['uf', 'uf2']}
+
+    def test_msgpack_missing(self, run_inventory, tmp_path, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        real_find_spec = plugin_module.importlib.util.find_spec
+        monkeypatch.setattr(plugin_module.importlib.util, 'find_spec', lambda name: None if name == 'msgpack' else real_find_spec(name))
+        config = self.config()
+        config['export_format'] = 'msgpack'
+        run_inventory(config)
+
+        assert (tmp_path / 'inventory' / 'splunk_inventory.json').exists()
+
+
+class TestConfigParsing:
+    """Test reading the config file."""
+
+    def test_config_parsed_once(self, run_inventory, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        parsed_files = []
+        yaml_load = plugin_module.yaml.load
+
+        def counting_load(stream, Loader):
+            data = yaml_load(stream, Loader=Loader)
+            if isinstance(data, dict) and 'splunk_hosts' in data:
+                parsed_files.append(data)
+            return data
+
+        monkeypatch.setattr(plugin_module.yaml, 'load', counting_load)
+        run_inventory(distributed_config())
+
+        assert len(parsed_files) == 1
+
+    def test_invalid_plugin_name(self, run_inventory):
+        with pytest.raises(AnsibleParserError):
+            run_inventory({'plugin': 'other-plugin', 'splunk_hosts': [{'name': 'idx1', 'roles': ['indexer']}]})
+
+
+class TestStartup:
+    """Test the cost of loading the plugin."""
+
+    # Time allowed for loading the plugin module, after Ansible itself is imported
+    STARTUP_BUDGET = 0.5
+
+    def test_plugin_load_budget(self):
+        script = (
+            "import json, sys, time\n"
+            "from ansible.plugins.loader import inventory_loader\n"
+            "inventory_loader.add_directory(sys.argv[1])\n"
+            "start = time.perf_counter()\n"
+            "inventory_loader.get('splunk-platform-automator')\n"
+            "duration = time.perf_counter() - start\n"
+            "print(json.dumps({'duration': duration, 'modules': [m for m in ['schema', 'pydantic', 'jmespath', 'lxml'] if m in sys.modules]}))\n"
+        )
+        plugin_dir = os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory')
+        output = subprocess.run([sys.executable, '-c', script, plugin_dir], capture_output=True, text=True, check=True,
+                                cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+        assert result['modules'] == []
+        assert result['duration'] < self.STARTUP_BUDGET
+
+    def test_cached_inventory_does_not_import_schema(self, tmp_path):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        if not plugin_module.SCHEMA_VALIDATION_AVAILABLE:
+            pytest.skip('pydantic is not installed')
+        # The first run validates with the compiled checks, the validation stamp is used by the second one
+        script = (
+            "import sys\n"
+            "sys.path.insert(0, sys.argv[1])\n"
+            "import test_inventory\n"
+            "from ansible.inventory.data import InventoryData\n"
+            "from ansible.parsing.dataloader import DataLoader\n"
+            "plugin = test_inventory.get_plugin()\n"
+            "type(plugin)._init_inventory = lambda self: None\n"
+            "type(plugin)._inventory_dir = lambda self: sys.argv[2]\n"
+            "plugin.parse(InventoryData(), DataLoader(), sys.argv[3], cache=False)\n"
+            "print('schema' in sys.modules)\n"
+        )
+        software = tmp_path / 'Software'
+        (software / 'baseconfigs' / 'org_ds_secure_server').mkdir(parents=True)
+        (software / 'baseconfigs' / 'org_cluster_manager_base').mkdir(parents=True)
+        (software / 'splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz').touch()
+        config = {'plugin': 'splunk-platform-automator', 'cache': False,
+                  'splunk_dirs': {'splunk_software_dir': str(software), 'splunk_baseconfig_dir': str(software)},
+                  'splunk_hosts': [{'name': 'idx1', 'roles': ['indexer']}]}
+        config_path = tmp_path / 'splunk_config.yml'
+        config_path.write_text(yaml.safe_dump(config))
+
+        imported = []
+        for _ in range(2):
+            output = subprocess.run([sys.executable, '-c', script, os.path.dirname(__file__), str(tmp_path), str(config_path)],
+                                    capture_output=True, text=True, check=True, cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL).stdout
+            imported.append(output.strip().splitlines()[-1])
+
+        assert imported == ['False', 'False']
+
+    def test_allowed_roles_match_schema(self):
+        schema = pytest.importorskip('schema')
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+
+        assert plugin_module.ALLOWED_ROLES == [role.value for role in schema.AllowedRole]
+
+
+class TestConfigInclude:
+    """Test splitting the config into included files."""
+
+    @pytest.fixture
+    def write_fragments(self, tmp_path):
+        def write(fragments):
+            for name, fragment in fragments.items():
+                path = tmp_path / 'config' / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(yaml.safe_dump(fragment))
+        return write
+
+    @pytest.fixture
+    def yaml_loads(self, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        calls = []
+        yaml_load = plugin_module.yaml.load
+
+        def counting_load(stream, Loader):
+            calls.append(stream)
+            return yaml_load(stream, Loader=Loader)
+
+        monkeypatch.setattr(plugin_module.yaml, 'load', counting_load)
+        return calls
+
+    def split_config(self, write_fragments):
+        config = distributed_config()
+        write_fragments({
+            'clusters.yml': {key: config.pop(key) for key in ['splunk_idxclusters', 'splunk_shclusters']},
+            'hosts/1_managers.yml': {'splunk_hosts': config['splunk_hosts'][:2]},
+            'hosts/2_peers.yml': {'splunk_hosts': config['splunk_hosts'][2:]},
+        })
+        config['splunk_hosts'] = []
+        config['include'] = ['clusters.yml', 'hosts/*.yml']
+        return config
+
+    def test_included_files(self, run_inventory, write_fragments):
+        single = run_inventory(distributed_config())
+        split = run_inventory(self.split_config(write_fragments))
+
+        assert list(split.hosts) == list(single.hosts)
+        assert sorted(split.groups) == sorted(single.groups)
+        assert group_vars(split, 'splunk_env_splk')['splunk_topology'] == group_vars(single, 'splunk_env_splk')['splunk_topology']
+
+    def test_only_changed_files_parsed(self, run_inventory, write_fragments, yaml_loads, tmp_path):
+        config = self.split_config(write_fragments)
+        run_inventory(dict(config))
+        first_run = len(yaml_loads)
+        run_inventory(dict(config))
+        second_run = len(yaml_loads) - first_run
+        write_fragments({'hosts/2_peers.yml': {'splunk_hosts': distributed_config()['splunk_hosts'][2:] + [
+            {'name': 'uf2', 'roles': ['universal_forwarder']}]}})
+        inventory = run_inventory(dict(config))
+
+        # The defaults are parsed on each run, the config files only when changed
+        assert first_run - second_run == 4
+        assert len(yaml_loads) - first_run - second_run == second_run + 1
+        assert 'uf2' in inventory.hosts
+
+    def test_changed_file_makes_export_stale(self, run_inventory, write_fragments, tmp_path):
+        run_inventory(self.split_config(write_fragments))
+        inventory_dir = str(tmp_path / 'inventory')
+        assert load_export(inventory_dir).host_names() == sorted(run_inventory(distributed_config()).hosts)
+
+        run_inventory(self.split_config(write_fragments))
+        fragment = tmp_path / 'config' / 'clusters.yml'
+        os.utime(fragment, (time.time() + 10, time.time() + 10))
+        assert load_export(inventory_dir) is None
+
+    def test_invalid_included_file(self, run_inventory, write_fragments):
+        if not sys.modules[type(get_plugin()).__module__].SCHEMA_VALIDATION_AVAILABLE:
+            pytest.skip('pydantic is not installed')
+        config = self.split_config(write_fragments)
+        write_fragments({'hosts/2_peers.yml': {'splunk_hosts': [{'name': 'uf2', 'roles': ['forwarder']}]}})
+        with pytest.raises(AnsibleParserError, match=r'(?s)2_peers\.yml: .*splunk_hosts -> 0 -> roles'):
+            run_inventory(dict(config))
+
+    def test_only_changed_files_validated(self, run_inventory, write_fragments, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        if not plugin_module.SCHEMA_VALIDATION_AVAILABLE:
+            pytest.skip('pydantic is not installed')
+        calls = []
+        for name in ['validate_config', 'validate_fragment']:
+            monkeypatch.setattr(plugin_module, name, lambda *args, name=name, validate=getattr(plugin_module, name):
+                                calls.append(name) or validate(*args))
+        config = self.split_config(write_fragments)
+        run_inventory(dict(config))
+        assert calls == ['validate_config']
+
+        del calls[:]
+        write_fragments({'hosts/2_peers.yml': {'splunk_hosts': distributed_config()['splunk_hosts'][2:] + [
+            {'name': 'uf2', 'roles': ['universal_forwarder']}]}})
+        run_inventory(dict(config))
+        assert calls == ['validate_fragment']
+
+        # The rules between the files are still checked
+        write_fragments({'hosts/2_peers.yml': {'splunk_hosts': distributed_config()['splunk_hosts'][2:] + [
+            {'name': 'idx4', 'roles': ['indexer'], 'idxcluster': 'idxc2'}]}})
+        with pytest.raises(AnsibleParserError, match="idxcluster 'idxc2' .* not defined in splunk_idxclusters"):
+            run_inventory(dict(config))
+
+    def test_merged_config_script(self, write_fragments, tmp_path):
+        config = self.split_config(write_fragments)
+        config_path = tmp_path / 'config' / 'splunk_config.yml'
+        config_path.write_text(yaml.safe_dump(config))
+        script = os.path.join(PROJECT_ROOT, 'ansible', 'plugins', 'inventory', 'config_include.py')
+        result = subprocess.run([sys.executable, script, str(config_path)], capture_output=True, text=True, check=True)
+
+        # Vagrant and provision_terraform_aws.yml read the config merged like the plugin does
+        assert json.loads(result.stdout) == dict(distributed_config(), include=config['include'])
+
+        config['include'].append('missing.yml')
+        config_path.write_text(yaml.safe_dump(config))
+        result = subprocess.run([sys.executable, script, str(config_path)], capture_output=True, text=True)
+        assert result.returncode != 0
+        assert 'missing.yml not found' in result.stderr
+
+    def test_section_not_allowed(self, run_inventory, write_fragments):
+        config = self.split_config(write_fragments)
+        write_fragments({'clusters.yml': {'aws': {'region': 'eu-central-1'}}})
+        with pytest.raises(AnsibleParserError, match='only allowed in the config file: aws'):
+            run_inventory(dict(config))
+
+    def test_missing_included_file(self, run_inventory):
+        config = distributed_config()
+        config['include'] = ['missing.yml']
+        with pytest.raises(AnsibleParserError, match='missing.yml not found'):
+            run_inventory(config)
+
+
+class TestValidationStamp:
+    """Test skipping the schema validation for unchanged configs."""
+
+    @pytest.fixture
+    def validations(self, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        if not plugin_module.SCHEMA_VALIDATION_AVAILABLE:
+            pytest.skip('pydantic is not installed')
+        calls = []
+        validate_config = plugin_module.validate_config
+
+        def counting_validate(config):
+            calls.append(config)
+            return validate_config(config)
+
+        monkeypatch.setattr(plugin_module, 'validate_config', counting_validate)
+        return calls
+
+    def test_unchanged_config_validated_once(self, run_inventory, validations, tmp_path):
+        run_inventory(distributed_config())
+        run_inventory(distributed_config())
+
+        assert len(validations) == 1
+        assert (tmp_path / 'inventory' / '.splunk_config_validated.json').is_file()
+
+    def test_changed_config_validated_again(self, run_inventory, validations):
+        run_inventory(distributed_config())
+        config = distributed_config()
+        config['splunk_hosts'].append({'name': 'hf2', 'roles': ['heavy_forwarder']})
+        run_inventory(config)
+
+        assert len(validations) == 2
+
+    def test_force_validate(self, run_inventory, validations):
+        config = distributed_config()
+        config['force_validate'] = True
+        run_inventory(dict(config))
+        run_inventory(dict(config))
+
+        assert len(validations) == 2
+
+    def test_failed_validation_not_stamped(self, run_inventory, validations):
+        config = {'splunk_hosts': [{'name': 'cm', 'roles': ['cluster_manager'], 'idxcluster': 'idxc1'}]}
+        for _ in range(2):
+            with pytest.raises(AnsibleParserError):
+                run_inventory(dict(config))
+
+        assert len(validations) == 2
+
+
+class TestCompiledValidation:
+    """Test validating configs with the compiled checks instead of pydantic."""
+
+    @pytest.fixture
+    def pydantic_validations(self, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        if not plugin_module.SCHEMA_VALIDATION_AVAILABLE:
+            pytest.skip('pydantic is not installed')
+        import schema
+        calls = []
+        validate_config = schema.validate_config
+
+        def counting_validate(config):
+            calls.append(config)
+            return validate_config(config)
+
+        monkeypatch.setattr(schema, 'validate_config', counting_validate)
+        return calls
+
+    def test_valid_config_not_validated_with_pydantic(self, run_inventory, pydantic_validations):
+        run_inventory(distributed_config())
+
+        assert pydantic_validations == []
+
+    def test_invalid_config_reported_by_pydantic(self, run_inventory, pydantic_validations):
+        config = {'splunk_hosts': [{'name': 'cm', 'roles': ['cluster_manager']}]}
+        with pytest.raises(AnsibleParserError, match="'idxcluster' must be specified"):
+            run_inventory(config)
+
+        assert len(pydantic_validations) == 1
+
+    def test_outdated_validator_not_used(self, run_inventory, pydantic_validations, monkeypatch):
+        import schema_validator
+        monkeypatch.setattr(schema_validator, 'SCHEMA_DIGEST', 'outdated')
+        run_inventory(distributed_config())
+
+        assert len(pydantic_validations) == 1
+
+
+class TestInventoryCache:
+    """Test reusing the generated inventory from the cache."""
+
+    @pytest.fixture
+    def cached_config(self, tmp_path):
+        def config():
+            data = distributed_config()
+            data.update({'cache': True, 'cache_plugin': 'jsonfile', 'cache_connection': str(tmp_path / 'cache')})
+            return data
+        return config
+
+    def run_cached(self, run_inventory, config):
+        plugin = get_plugin()
+        inventory = run_inventory(config, plugin=plugin)
+        plugin.update_cache_if_changed()
+        return inventory
+
+    def test_cached_inventory_is_identical(self, run_inventory, cached_config, monkeypatch):
+        first = self.run_cached(run_inventory, cached_config())
+        monkeypatch.setattr(type(get_plugin()), '_populate', lambda self: pytest.fail('inventory was not cached'))
+        second = self.run_cached(run_inventory, cached_config())
+
+        assert list(second.hosts) == list(first.hosts)
+        assert sorted(second.groups) == sorted(first.groups)
+        for name, host in first.hosts.items():
+            assert second.hosts[name].vars == host.vars
+            assert [group.name for group in second.hosts[name].groups] == [group.name for group in host.groups]
+        for name, group in first.groups.items():
+            assert second.groups[name].vars == group.vars
+
+    def test_config_change_invalidates_cache(self, run_inventory, cached_config):
+        self.run_cached(run_inventory, cached_config())
+        config = cached_config()
+        config['splunk_hosts'].append({'name': 'hf2', 'roles': ['heavy_forwarder']})
+        inventory = self.run_cached(run_inventory, config)
+
+        assert group_vars(inventory, 'splunk_env_splk')['splunk_topology']['splunk_heavy_forwarder_list'] == ['hf', 'hf2']
+
+    def test_software_dir_change_invalidates_cache(self, run_inventory, cached_config, software_dir, monkeypatch):
+        self.run_cached(run_inventory, cached_config())
+        (software_dir / 'baseconfigs' / 'org_all_forwarder_outputs').mkdir()
+        populated = []
+        populate = type(get_plugin())._populate
+        monkeypatch.setattr(type(get_plugin()), '_populate', lambda self: populated.append(True) or populate(self))
+        self.run_cached(run_inventory, cached_config())
+
+        assert populated
+
+
+    def test_group_vars_all_change_invalidates_cache(self, run_inventory, cached_config, tmp_path, monkeypatch):
+        plugin_module = sys.modules[type(get_plugin()).__module__]
+        group_vars_dir = tmp_path / 'group_vars' / 'all'
+        group_vars_dir.mkdir(parents=True)
+        monkeypatch.setattr(plugin_module, 'GROUP_VARS_DIR', str(group_vars_dir.parent))
+        config = cached_config()
+        config['splunk_hosts'][2]['splunk_version'] = '9.4.1'
+        inventory = self.run_cached(run_inventory, config)
+        assert group_vars(inventory, 'splunk_hosts_2')['splunk_version'] == '9.4.1'
+
+        (group_vars_dir / 'site.yml').write_text("splunk_version: '9.3.0'\n")
+        config = cached_config()
+        config['splunk_hosts'][2]['splunk_version'] = '9.4.1'
+        inventory = self.run_cached(run_inventory, config)
+
+        assert 'splunk_hosts_2' not in inventory.groups
+        assert inventory.hosts['idx1'].vars['splunk_version'] == '9.4.1'
+
+
+class TestScaling:
+    """Regression benchmark for large inventories."""
+
+    def synthetic_config(self, num_hosts):
+        return {
+            'splunk_idxclusters': [{'idxc_name': 'idxc1'}],
+            'splunk_hosts': [
+                {'name': 'cm', 'roles': ['cluster_manager'], 'idxcluster': 'idxc1'},
+                {'iter': {'prefix': 'idx', 'numbers': '1..%d' % (num_hosts // 10)}, 'roles': ['indexer'], 'idxcluster': 'idxc1'},
+                {'iter': {'prefix': 'uf', 'numbers': '1..%d' % num_hosts}, 'roles': ['universal_forwarder']},
+            ],
+        }
+
+    def test_10k_hosts_build_linear(self, run_inventory, monkeypatch):
+        merges = []
+        merge_dict = type(get_plugin())._merge_dict
+
+        def counting_merge(self, *args, **kwargs):
+            merges.append(True)
+            return merge_dict(self, *args, **kwargs)
+
+        monkeypatch.setattr(type(get_plugin()), '_merge_dict', counting_merge)
+        run_inventory(self.synthetic_config(20))
+        small_merges = len(merges)
+
+        merges.clear()
+        start = time.perf_counter()
+        inventory = run_inventory(self.synthetic_config(10000))
+        duration = time.perf_counter() - start
+
+        assert len(inventory.hosts) == 11001
+        assert len(inventory.groups['role_universal_forwarder'].hosts) == 10000
+        # No per host work on the accumulated data structures
+        assert len(merges) == small_merges
+        assert duration < 30
+
+
+class TestSoftwareChecks:
+    """Test the checks for Splunk archives, baseconfig apps and license files."""
+
+    def test_missing_archive(self, run_inventory):
+        config = {'splunk_hosts': [{'name': 'idx1', 'roles': ['indexer'], 'splunk_version': '9.3.0'}]}
+        with pytest.raises(AnsibleParserError, match=r"splunk-9\.3\.0-\*-\?inux-amd64\.tgz"):
+            run_inventory(config)
+
+    def test_archive_versions_and_architectures(self, run_inventory, software_dir):
+        (software_dir / 'splunk-9.3.0-51ccf43db5bd-Linux-x86_64.tgz').touch()
+        (software_dir / 'splunkforwarder-9.3.0-51ccf43db5bd-x64-release.msi').touch()
+        config = {'splunk_hosts': [
+            {'name': 'idx1', 'roles': ['indexer'], 'splunk_version': '9.3.0', 'splunk_architecture': 'x86_64'},
+            {'name': 'idx2', 'roles': ['indexer'], 'splunk_version': 'latest'},
+            {'name': 'win1', 'roles': ['universal_forwarder_windows'], 'splunk_version': '9.3.0'},
+        ]}
+        inventory = run_inventory(config)
+
+        assert sorted(inventory.hosts) == ['idx1', 'idx2', 'win1']
+
+    def test_missing_windows_archive(self, run_inventory):
+        config = {'splunk_hosts': [{'name': 'win1', 'roles': ['universal_forwarder_windows']}]}
+        with pytest.raises(AnsibleParserError, match=r"splunkforwarder-\*-\*-x64-release\.msi"):
+            run_inventory(config)
+
+    def test_missing_baseconfig_apps(self, run_inventory, software_dir):
+        (software_dir / 'baseconfigs' / 'org_cluster_manager_base').rmdir()
+        with pytest.raises(AnsibleParserError, match='baseconfig apps'):
+            run_inventory({'splunk_hosts': [{'name': 'idx1', 'roles': ['indexer']}]})
+
+    def test_baseconfig_app_catalog(self, run_inventory, software_dir):
+        (software_dir / 'baseconfigs' / 'org_ds_secure_server' / 'local').mkdir()
+        (software_dir / 'clusterconfigs' / 'org_cluster_manager_base').mkdir(parents=True)
+        inventory = run_inventory({'splunk_hosts': [{'name': 'idx1', 'roles': ['indexer']}]})
+
+        assert group_vars(inventory, 'all')['splunk_baseconfig_apps'] == {
+            'org_cluster_manager_base': 'baseconfigs/org_cluster_manager_base',
+            'org_ds_secure_server': 'baseconfigs/org_ds_secure_server',
+        }
+
+    def test_missing_license_file(self, run_inventory):
+        config = {
+            'splunk_defaults': {'splunk_license_file': ['Splunk.License', 'Missing.License']},
+            'splunk_hosts': [{'name': 'lm', 'roles': ['license_manager']}],
+        }
+        with pytest.raises(AnsibleParserError, match='Missing.License'):
+            run_inventory(config)
+
+    def test_directories_scanned_once(self, run_inventory, software_dir, monkeypatch):
+        scanned = []
+        scandir = os.scandir
+
+        def counting_scandir(path='.'):
+            scanned.append(os.path.normpath(str(path)))
+            return scandir(path)
+
+        monkeypatch.setattr(os, 'scandir', counting_scandir)
+        config = distributed_config()
+        config['splunk_defaults'] = {'splunk_license_file': 'Splunk.License'}
+        config['splunk_hosts'].append({'iter': {'prefix': 'lm', 'numbers': '1..3'}, 'roles': ['license_manager']})
+        config['splunk_hosts'].append({'name': 'uf2', 'roles': ['universal_forwarder'], 'splunk_version': 'latest'})
+        run_inventory(config)
+
+        assert scanned.count(str(software_dir)) == 1
+
+    def test_benchmark_runner(self, tmp_path):
+        benchmark = pytest.importorskip('benchmark_inventory')
+        results = benchmark.run_benchmark([10, 300], repeat=1, work_dir=str(tmp_path))
+
+        assert [entry['size'] for entry in results] == [10, 300]
+        assert results[1]['hosts'] == 300
+        assert results[1]['environments'] == 3
+        for entry in results:
+            for phase in ['config parsing', 'reading defaults', 'populating inventory', 'total']:
+                assert entry['phases'][phase]['seconds'] > 0
+                assert entry['phases'][phase]['peak_bytes'] is not None
+        assert benchmark.compare_baseline(results, results, tolerance=1.5) == []
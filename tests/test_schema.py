@@ -16,6 +16,8 @@ from schema import (
     SplunkHost,
     AllowedRole,
     validate_config,
+    validate_config_file,
+    validate_fragment,
     ConfigValidationError,
     GeneralConfig,
     IdxClusterConfig,
@@ -94,6 +96,7 @@ class TestValidConfigurations:
         config = {
             "plugin": "splunk-platform-automator",
             "splunk_defaults": {"splunk_license_file": "Splunk.License"},
+            "splunk_idxclusters": [{"idxc_name": "idxc1"}],
             "splunk_hosts": hosts
         }
         result = validate_config(config)
@@ -125,6 +128,7 @@ class TestValidConfigurations:
         """Test that site is allowed with cluster_manager role."""
         config = {
             "plugin": "splunk-platform-automator",
+            "splunk_idxclusters": [{"idxc_name": "idxc1"}],
             "splunk_hosts": [
                 {
                     "name": "cm1",
@@ -142,6 +146,7 @@ class TestValidConfigurations:
         """Test that cluster_manager with idxcluster is valid."""
         config = {
             "plugin": "splunk-platform-automator",
+            "splunk_idxclusters": [{"idxc_name": "idxc1"}],
             "splunk_hosts": [
                 {
                     "name": "cm",
@@ -454,6 +459,55 @@ class TestClusterConfigurations:
             validate_config(config)
         assert "2" in str(exc_info.value) and "idxcluster" in str(exc_info.value).lower()
 
+    def test_undefined_idxcluster(self):
+        """Test that the idxcluster of a host must be defined in splunk_idxclusters."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_idxclusters": [{"idxc_name": "idxc1"}],
+            "splunk_hosts": [
+                {"name": "cm", "roles": ["cluster_manager"], "idxcluster": "idxc1"},
+                {"iter": {"numbers": "1..2"}, "roles": ["indexer"], "idxcluster": "idxc2"}
+            ]
+        }
+        with pytest.raises(ConfigValidationError) as exc_info:
+            validate_config(config)
+        assert "'idxc2' (splunk_hosts[1]) not defined in splunk_idxclusters" in str(exc_info.value)
+
+    def test_undefined_shcluster_and_splunk_env(self):
+        """Test that shcluster and splunk_env are checked, if their sections are given."""
+        hosts = [
+            {"name": "dep", "roles": ["deployer"], "shcluster": "shc1", "splunk_env": "prod"},
+            {"iter": {"numbers": "1..3"}, "roles": ["search_head"], "shcluster": "shc1", "splunk_env": "prod"}
+        ]
+        validate_config({"plugin": "splunk-platform-automator", "splunk_hosts": hosts})
+
+        config = {"plugin": "splunk-platform-automator", "splunk_shclusters": [{"shc_name": "shc2"}], "splunk_hosts": hosts}
+        with pytest.raises(ConfigValidationError, match="shcluster 'shc1'"):
+            validate_config(config)
+
+        config = {"plugin": "splunk-platform-automator", "splunk_environments": [{"splunk_env_name": "test"}], "splunk_hosts": hosts}
+        with pytest.raises(ConfigValidationError, match="splunk_env 'prod'"):
+            validate_config(config)
+
+    def test_topology_summary(self):
+        """Test the host counts collected for the validators."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_idxclusters": [{"idxc_name": "idxc1"}],
+            "splunk_hosts": [
+                {"name": "cm", "roles": ["cluster_manager"], "idxcluster": "idxc1", "site": "site1"},
+                {"iter": {"numbers": "1..4"}, "roles": ["indexer"], "idxcluster": "idxc1", "site": "site1"},
+                {"list": ["idx5", "idx6"], "roles": ["indexer"], "idxcluster": "idxc1", "site": "site2"},
+                {"iter": {"numbers": "08..10"}, "roles": ["search_head", "monitoring_console"]}
+            ]
+        }
+        topology = validate_config(config).topology
+        assert topology.role_counts[AllowedRole.indexer] == 6
+        assert topology.role_counts[AllowedRole.search_head] == 3
+        assert topology.role_counts[AllowedRole.monitoring_console] == 3
+        assert topology.idxc_members == {"idxc1": 6}
+        assert topology.site_counts == {"site1": 5, "site2": 2}
+
     def test_deployer_requires_minimum_search_heads(self):
         """Test that deployer with fewer than 3 search heads raises error."""
         config = {
@@ -525,5 +579,160 @@ class TestMultiRoleHosts:
         assert len(result.splunk_hosts[0].roles) == 2
 
 
+class TestHostIteration:
+    """Test the ranges of iter host definitions."""
+
+    def test_step_and_exclude(self):
+        """Test numbers with step and excluded host names."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_hosts": [
+                {"iter": {"prefix": "uf", "numbers": "001..100/3", "exclude": ["uf004", "uf005"]},
+                 "roles": ["universal_forwarder"]}
+            ]
+        }
+        iteration = validate_config(config).splunk_hosts[0].iter
+        # uf005 is not part of the range and does not change the count
+        assert iteration.count == 33
+        assert list(iteration.hosts)[:3] == ["uf001", "uf007", "uf010"]
+
+    def test_multi_dimensional_ranges(self):
+        """Test ranges combining sites and numbers."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_hosts": [
+                {"iter": {"prefix": "uf-", "ranges": [["east", "west"], "1..20000"], "separator": "-"},
+                 "roles": ["universal_forwarder"]}
+            ]
+        }
+        iteration = validate_config(config).splunk_hosts[0].iter
+        assert iteration.count == 40000
+        assert "uf-west-09999" in iteration.hosts
+        assert "uf-north-00001" not in iteration.hosts
+        assert "uf-east-9999" not in iteration.hosts
+
+    def test_numbers_and_ranges(self):
+        """Test that numbers and ranges cannot be combined."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_hosts": [
+                {"iter": {"numbers": "1..2", "ranges": ["1..2"]}, "roles": ["universal_forwarder"]}
+            ]
+        }
+        with pytest.raises(ConfigValidationError) as exc_info:
+            validate_config(config)
+        assert "exactly one of: 'numbers' or 'ranges'" in str(exc_info.value)
+
+    def test_empty_iteration(self):
+        """Test that an iteration without hosts raises error."""
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_hosts": [
+                {"iter": {"prefix": "uf", "numbers": "5..1"}, "roles": ["universal_forwarder"]}
+            ]
+        }
+        with pytest.raises(ConfigValidationError) as exc_info:
+            validate_config(config)
+        assert "does not generate any hosts" in str(exc_info.value)
+
+
+class TestConfigFragment:
+    """Test the validation of included config files."""
+
+    def test_fragment_sections(self):
+        fragment = validate_fragment({"splunk_hosts": [{"name": "uf1", "roles": ["universal_forwarder"]}]})
+        assert fragment.splunk_hosts[0].name == "uf1"
+        assert validate_fragment(None).splunk_hosts is None
+
+        with pytest.raises(ConfigValidationError, match="splunk_hosts -> 0 -> roles"):
+            validate_fragment({"splunk_hosts": [{"name": "uf1", "roles": ["forwarder"]}]})
+        with pytest.raises(ConfigValidationError, match="plugin"):
+            validate_fragment({"plugin": "splunk-platform-automator"})
+
+    def test_config_file_with_includes(self, tmp_path):
+        import yaml
+        (tmp_path / "clusters.yml").write_text(yaml.safe_dump({"splunk_idxclusters": [{"idxc_name": "idxc1"}]}))
+        (tmp_path / "indexers.yml").write_text(yaml.safe_dump({"splunk_hosts": [
+            {"name": "idx1", "roles": ["indexer"], "idxcluster": "idxc1"},
+            {"name": "idx2", "roles": ["indexer"], "idxcluster": "idxc1"},
+        ]}))
+        config_file = tmp_path / "splunk_config.yml"
+        config_file.write_text(yaml.safe_dump({
+            "plugin": "splunk-platform-automator",
+            "include": ["*s.yml"],
+            "splunk_hosts": [{"name": "cm", "roles": ["cluster_manager"], "idxcluster": "idxc1"}],
+        }))
+
+        result = validate_config_file(str(config_file))
+        assert [host.name for host in result.splunk_hosts] == ["cm", "idx1", "idx2"]
+
+        # The cluster references are checked across the files
+        (tmp_path / "clusters.yml").write_text(yaml.safe_dump({"splunk_idxclusters": [{"idxc_name": "other"}]}))
+        with pytest.raises(ConfigValidationError, match="not defined in splunk_idxclusters"):
+            validate_config_file(str(config_file))
+
+
+class TestCompiledValidator:
+    """Test the compiled structural checks generated by schema_compiler.py."""
+
+    INVALID_CONFIGS = [
+        {"plugin": "splunk-platform-automator", "splunk_hosts": []},
+        {"plugin": "splunk-platform-automator\n", "splunk_hosts": [{"name": "idx1", "roles": ["indexer"]}]},
+        {"plugin": "splunk-platform-automator", "splunk_hosts": [{"name": "idx1", "roles": ["forwarder"]}]},
+        {"plugin": "splunk-platform-automator", "splunk_hosts": [{"name": "uf1", "roles": ["universal_forwarder"], "site": "site1"}]},
+        {"plugin": "splunk-platform-automator", "splunk_hosts": [{"iter": {"numbers": "3..1"}, "roles": ["indexer"]}]},
+        {"plugin": "splunk-platform-automator", "general": {"unknown": True}, "splunk_hosts": [{"name": "idx1", "roles": ["indexer"]}]},
+        {"plugin": "splunk-platform-automator", "splunk_hosts": [{"name": "lm", "roles": ["license_manager"]}]},
+        {"plugin": "splunk-platform-automator", "splunk_hosts": [{"name": "idx1", "roles": ["indexer"], "idxcluster": "idxc1"}]},
+    ]
+
+    def test_generated_files_are_current(self):
+        import schema_compiler
+        import schema_validator
+        schemas = schema_compiler.json_schemas()
+
+        assert schema_validator.SCHEMA_DIGEST == schema_compiler.schema_digest()
+        with open(schema_compiler.VALIDATOR_FILE) as f:
+            assert f.read() == schema_compiler.generate(schemas), "Run schema_compiler.py to update schema_validator.py"
+        with open(schema_compiler.JSON_SCHEMA_FILE) as f:
+            assert f.read() == schema_compiler.generate_json_schema(schemas)
+
+    def test_example_configs_agree_with_pydantic(self):
+        import glob
+        import yaml
+        from schema_validator import check_config
+        project_root = os.path.join(os.path.dirname(__file__), '..')
+        paths = glob.glob(os.path.join(project_root, 'examples', '*.yml')) + glob.glob(os.path.join(project_root, 'tests', 'configs', '*.yml'))
+        for path in paths:
+            with open(path) as f:
+                config = yaml.safe_load(f)
+            try:
+                validate_config(config)
+                valid = True
+            except ConfigValidationError:
+                valid = False
+            assert check_config(config) == valid, path
+
+    @pytest.mark.parametrize("config", INVALID_CONFIGS)
+    def test_invalid_configs_rejected(self, config):
+        from schema_validator import check_config
+        assert not check_config(config)
+        with pytest.raises(ConfigValidationError):
+            validate_config(config)
+
+    def test_lax_types_left_to_pydantic(self):
+        """Values pydantic converts are not accepted by the compiled checks, pydantic decides on them."""
+        from schema_validator import check_config, check_fragment
+        config = {
+            "plugin": "splunk-platform-automator",
+            "splunk_hosts": [{"name": "idx1", "roles": ["indexer"], "splunk_fips": "yes"}],
+        }
+        assert not check_config(config)
+        assert validate_config(config).splunk_hosts[0].splunk_fips is True
+
+        assert check_fragment(None)
+        assert not check_fragment({"plugin": "splunk-platform-automator"})
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
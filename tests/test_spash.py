@@ -0,0 +1,339 @@
+"""
+Unit tests for bin/spash (Splunk Platform Automator Shell).
+
+The script is loaded as module, Ansible and AWS commands are replaced by fakes.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import socket
+import time
+from importlib.machinery import SourceFileLoader
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load_spash():
+    """Load bin/spash, which has no .py extension, as module."""
+    loader = SourceFileLoader('spash', os.path.join(PROJECT_ROOT, 'bin', 'spash'))
+    spec = importlib.util.spec_from_loader('spash', loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+spash = load_spash()
+
+# bin/spash adds the inventory plugin directory to the path
+from inventory_export import InventoryExport
+
+
+@pytest.fixture
+def listener():
+    """Return the port of a listening TCP socket on localhost."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    yield server.getsockname()[1]
+    server.close()
+
+
+@pytest.fixture
+def closed_port():
+    """Return a localhost port without listener."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def make_inventory(hosts, roles=None):
+    """Return ansible-inventory --list output for the hosts."""
+    inventory = {'_meta': {'hostvars': {host: {'ansible_host': '127.0.0.1'} for host in hosts}}}
+    for role, role_hosts in (roles or {}).items():
+        inventory['role_' + role] = {'hosts': role_hosts}
+    return inventory
+
+
+class FakePopen:
+    """Replaces the ansible ping process with fixed output lines."""
+
+    def __init__(self, lines):
+        self.stdout = iter(lines)
+        self.terminated = False
+
+    def poll(self):
+        return None
+
+    def terminate(self):
+        self.terminated = True
+
+    def wait(self):
+        return 0
+
+
+class TestStatus:
+    """Test the status mode of spash -l."""
+
+    def test_tcp_port_check(self, listener, closed_port):
+        assert spash.check_tcp_port('127.0.0.1', listener, timeout=1)
+        assert not spash.check_tcp_port('127.0.0.1', closed_port, timeout=1)
+
+    def test_probe_hosts(self, listener, closed_port):
+        inventory = make_inventory(['idx1', 'idx2'])
+        results = dict(spash.probe_hosts(inventory, ['idx1', 'idx2'], [listener, closed_port], timeout=1))
+
+        assert results == {
+            'idx1': {listener: True, closed_port: False},
+            'idx2': {listener: True, closed_port: False},
+        }
+
+    def test_show_status_with_probe(self, monkeypatch, capsys, listener):
+        inventory = make_inventory(['idx1', 'sh1'], roles={'indexer': ['idx1'], 'search_head': ['sh1']})
+        inventory['_meta']['hostvars']['sh1']['ansible_host'] = '10.0.0.2'
+        monkeypatch.setattr(spash, 'get_inventory_data', lambda require_connection=False: inventory)
+        monkeypatch.setattr(spash, 'check_aws_status', lambda: {'10.0.0.2': 'stopped'})
+        monkeypatch.setattr(spash, 'PORT_NAMES', {listener: 'Test'})
+        spash.show_status([listener], timeout=1)
+
+        assert capsys.readouterr().out.splitlines() == [
+            'sh1 (Search Head) - Test: N/A, AWS: stopped',
+            'idx1 (Indexer) - Test: open',
+        ]
+
+    def test_show_status_streams_ansible_ping(self, monkeypatch, capsys):
+        lines = [
+            'idx2 | UNREACHABLE!: Failed to connect to the host via ssh\n',
+            '[WARNING]: some warning\n',
+            'idx1 | SUCCESS => {"changed": false, "ping": "pong"}\n',
+        ]
+        process = FakePopen(lines)
+        monkeypatch.setattr(spash.subprocess, 'Popen', lambda *args, **kwargs: process)
+        monkeypatch.setattr(spash, 'get_inventory_data', lambda require_connection=False: make_inventory(['idx1', 'idx2', 'idx3']))
+        monkeypatch.setattr(spash, 'check_aws_status', lambda: {})
+        spash.show_status()
+
+        assert capsys.readouterr().out.splitlines() == [
+            'idx2 - Ansible: Unreachable',
+            'idx1 - Ansible: Success',
+            'idx3 - Ansible: N/A',
+        ]
+        assert process.terminated
+
+
+class TestInventory:
+    """Test reading the inventory."""
+
+    def test_exported_inventory_used(self, monkeypatch):
+        inventory = make_inventory(['idx1'])
+        monkeypatch.setattr(spash, 'get_exported_inventory', lambda require_connection=False: inventory)
+        monkeypatch.setattr(spash.subprocess, 'run', lambda *args, **kwargs: pytest.fail('ansible-inventory was called'))
+
+        assert spash.get_inventory_data(require_connection=True) is inventory
+
+    def test_export_without_connection_vars(self, monkeypatch):
+        export = InventoryExport(
+            {'version': 1, 'hosts': {'idx1': {'roles': ['indexer'], 'vars': {'ansible_user': 'splunk'}}}})
+        monkeypatch.setattr(spash, 'load_export', lambda *args: export)
+
+        assert spash.get_exported_inventory() == {'_meta': {'hostvars': {'idx1': {'ansible_user': 'splunk'}}},
+                                                  'role_indexer': {'hosts': ['idx1']}}
+        assert spash.get_exported_inventory(require_connection=True) is None
+
+
+def estate_inventory():
+    """Return an inventory with sites, environments and clusters."""
+    inventory = make_inventory(['idx1', 'idx2', 'idx3', 'sh1', 'uf1'],
+                               roles={'indexer': ['idx1', 'idx2', 'idx3'], 'search_head': ['sh1'], 'universal_forwarder': ['uf1']})
+    hostvars = inventory['_meta']['hostvars']
+    for host, site, env in [('idx1', 'site2', 'prod'), ('idx2', 'site1', 'prod'), ('idx3', 'site1', 'test')]:
+        hostvars[host].update({'site': site, 'splunk_env_name': env, 'idxc_name': 'idxc_' + env})
+    hostvars['sh1']['splunk_env_name'] = 'prod'
+    return inventory
+
+
+class TestHostIndex:
+    """Test the host filters and the list output."""
+
+    def test_filters(self):
+        index = spash.HostIndex(estate_inventory())
+
+        assert index.select() == ['idx1', 'idx2', 'idx3', 'sh1', 'uf1']
+        assert index.select({'role': ['indexer'], 'site': ['site1']}) == ['idx2', 'idx3']
+        assert index.select({'role': ['indexer', 'search_head'], 'env': ['prod']}) == ['idx1', 'idx2', 'sh1']
+        assert index.select({'idxcluster': ['idxc_test']}) == ['idx3']
+        assert index.select({'site': ['site3']}) == []
+
+    def test_sort(self):
+        index = spash.HostIndex(estate_inventory())
+
+        assert index.sorted(index.select(), 'site') == ['idx2', 'idx3', 'idx1', 'sh1', 'uf1']
+        assert index.sorted(['uf1', 'sh1', 'idx1'], 'roles') == ['idx1', 'sh1', 'uf1']
+
+    def test_json_output(self, capsys):
+        spash.list_hosts(estate_inventory(), {'env': ['test']}, output='json')
+
+        assert json.loads(capsys.readouterr().out) == [{
+            'host': 'idx3', 'roles': ['indexer'], 'site': 'site1', 'env': 'test', 'idxcluster': 'idxc_test',
+            'shcluster': None, 'ansible_host': '127.0.0.1',
+        }]
+
+    def test_csv_output(self, capsys):
+        args = argparse.Namespace(role=['search_head,universal_forwarder'], site=None)
+        spash.list_hosts(estate_inventory(), spash.get_filters(args), output='csv', sort='env')
+
+        assert capsys.readouterr().out.splitlines() == [
+            'host,roles,site,env,idxcluster,shcluster,ansible_host',
+            'sh1,search_head,,prod,,,127.0.0.1',
+            'uf1,universal_forwarder,,,,,127.0.0.1',
+        ]
+
+    def test_ansible_host_pattern(self):
+        assert spash.host_pattern() == 'all'
+        assert spash.host_pattern({'env': ['prod'], 'role': ['indexer', 'search_head']}) == 'role_indexer:role_search_head:&splunk_env_prod'
+        # Sites have no group and two unions cannot be combined, the hosts are filtered by spash
+        assert spash.host_pattern({'site': ['site1']}) == 'all'
+        assert spash.host_pattern({'env': ['prod', 'test'], 'role': ['indexer', 'search_head']}) == 'all'
+
+
+class TestExec:
+    """Test running commands on several hosts, with a local shell instead of ssh."""
+
+    @pytest.fixture(autouse=True)
+    def local_shell(self, monkeypatch):
+        monkeypatch.setattr(spash, 'build_ssh_command', lambda details, **kwargs: ['sh', '-c'])
+
+    def test_output_and_exit_codes(self, capsys):
+        inventory = make_inventory(['idx1', 'idx2'])
+        results = spash.exec_hosts(inventory, ['idx1', 'idx2', 'idx3'], 'echo one; echo two; exit 3', forks=2)
+
+        assert [(result['host'], result['rc']) for result in results] == [('idx1', 3), ('idx2', 3), ('idx3', None)]
+        assert results[2]['error'] == 'host not found in inventory'
+        lines = capsys.readouterr().out.splitlines()
+        assert sorted(lines) == ['idx1 | one', 'idx1 | two', 'idx2 | one', 'idx2 | two']
+        assert lines.index('idx1 | one') < lines.index('idx1 | two')
+
+    def test_parallel_with_timeout(self):
+        inventory = make_inventory(['idx1', 'idx2', 'idx3', 'idx4'])
+        start = time.monotonic()
+        results = spash.exec_hosts(inventory, ['idx1', 'idx2', 'idx3', 'idx4'], 'sleep 5', forks=4, timeout=0.5)
+
+        assert time.monotonic() - start < 3
+        assert all(result['timed_out'] for result in results)
+
+    def test_exec_main(self, monkeypatch, capsys):
+        inventory = make_inventory(['idx1', 'sh1'], roles={'indexer': ['idx1'], 'search_head': ['sh1']})
+        monkeypatch.setattr(spash, 'get_inventory_data', lambda require_connection=False: inventory)
+
+        assert spash.exec_main(['--role', 'indexer', '--', 'echo', 'ok']) == 0
+        out = capsys.readouterr().out
+        assert 'idx1 | ok' in out and 'sh1' not in out
+        assert '1 hosts: 1 ok, 0 failed' in out
+        assert spash.exec_main(['--all', 'false']) == 1
+        with pytest.raises(SystemExit):
+            spash.exec_main(['echo', 'all hosts'])
+
+    def test_control_path_shared_with_ansible(self):
+        details = {'real_host': '10.0.0.1', 'port': None, 'user': 'splunk'}
+        digest = hashlib.sha1(b'10.0.0.1-None-splunk').hexdigest()[:10]
+
+        assert spash.control_path(details) == os.path.join(spash.CONTROL_PATH_DIR, digest)
+
+
+class TestPush:
+    """Test copying a file to several hosts, with cp and a local shell instead of scp and ssh."""
+
+    @pytest.fixture(autouse=True)
+    def local_copy(self, monkeypatch):
+        monkeypatch.setattr(spash, 'build_ssh_command', lambda details, **kwargs: ['sh', '-c'])
+        monkeypatch.setattr(spash, 'build_scp_command', lambda details, source, path, **kwargs: ['cp', source, path])
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        source = tmp_path / 'app.tgz'
+        source.write_bytes(b'x' * 4096)
+        return source
+
+    def test_copy(self, tmp_path, source, capsys):
+        target_dir = tmp_path / 'target'
+        target_dir.mkdir()
+        results = spash.push_hosts(make_inventory(['idx1']), ['idx1', 'idx2'], str(source), str(target_dir) + '/')
+
+        assert [(result['host'], result['status'], result['bytes']) for result in results] == [
+            ('idx1', 'copied', 4096), ('idx2', 'failed', 0)]
+        assert (target_dir / 'app.tgz').read_bytes() == source.read_bytes()
+        out = capsys.readouterr().out
+        assert 'idx1 | copied 4.0 KB in' in out
+        assert 'idx2 | failed after' in out
+
+    def test_checksum_skip(self, tmp_path, source):
+        matching = tmp_path / 'matching.tgz'
+        matching.write_bytes(source.read_bytes())
+        different = tmp_path / 'different.tgz'
+        different.write_bytes(b'old')
+        inventory = make_inventory(['idx1'])
+
+        assert spash.push_hosts(inventory, ['idx1'], str(source), str(matching), checksum=True)[0]['status'] == 'skipped'
+        assert spash.push_hosts(inventory, ['idx1'], str(source), str(different), checksum=True)[0]['status'] == 'copied'
+        assert different.read_bytes() == source.read_bytes()
+
+    def test_push_main(self, tmp_path, source, monkeypatch, capsys):
+        inventory = make_inventory(['idx1', 'sh1'], roles={'indexer': ['idx1'], 'search_head': ['sh1']})
+        monkeypatch.setattr(spash, 'get_inventory_data', lambda require_connection=False: inventory)
+
+        assert spash.push_main(['--role', 'indexer', str(source), str(tmp_path / 'copy.tgz')]) == 0
+        assert '1 hosts: 1 copied, 0 skipped, 0 failed, 4.0 KB in' in capsys.readouterr().out
+
+
+class TestMaster:
+    """Test the ControlMaster management, with a state file per host instead of the ssh master."""
+
+    @pytest.fixture
+    def inventory(self):
+        inventory = make_inventory(['idx1', 'idx2'])
+        for host, hostvars in inventory['_meta']['hostvars'].items():
+            hostvars['ansible_host'] = host + '.example.com'
+        return inventory
+
+    @pytest.fixture
+    def fake_master(self, tmp_path, monkeypatch):
+        def master_command(details, action, **kwargs):
+            state = tmp_path / details['real_host']
+            commands = {'start': f"touch {state}", 'status': f"test -e {state}", 'stop': f"rm {state}"}
+            return ['sh', '-c', commands[action]]
+        monkeypatch.setattr(spash, 'master_command', master_command)
+
+    def test_master_command(self, inventory):
+        details = spash.resolve_connection_details('idx1', inventory)
+        start = spash.master_command(details, 'start', persist='2h', keepalive=15)
+        assert start[0] == 'ssh' and start[-2:] == ['idx1.example.com', 'true']
+        assert 'ControlPersist=2h' in start and 'ServerAliveInterval=15' in start
+        assert f"ControlPath={spash.control_path(details)}" in start
+
+        stop = spash.master_command(details, 'stop')
+        assert stop[:3] == ['ssh', '-O', 'exit'] and stop[-1] == 'idx1.example.com'
+
+    def test_start_status_stop(self, inventory, fake_master, capsys):
+        results = spash.control_masters(inventory, ['idx1', 'idx2', 'idx3'], 'start')
+        assert [(result['host'], result['state']) for result in results] == [
+            ('idx1', 'started'), ('idx2', 'started'), ('idx3', 'failed')]
+        assert 'idx1 | started, handshake' in capsys.readouterr().out
+
+        assert [result['state'] for result in spash.control_masters(inventory, ['idx1'], 'start')] == ['running']
+        assert [result['state'] for result in spash.control_masters(inventory, ['idx1'], 'stop')] == ['stopped']
+        assert [result['state'] for result in spash.control_masters(inventory, ['idx1', 'idx2'], 'status')] == ['stopped', 'running']
+
+    def test_summary(self, inventory, capsys):
+        spash.print_master_summary([
+            {'host': 'idx1', 'state': 'started', 'duration': 0.5, 'error': None},
+            {'host': 'idx2', 'state': 'started', 'duration': 1.5, 'error': None},
+            {'host': 'idx3', 'state': 'running', 'duration': 0.0, 'error': None},
+        ], 2.0)
+        assert capsys.readouterr().out.strip() == (
+            '3 hosts: 2 started, 1 running in 2.00s (handshake: min 0.50s, median 1.50s, max 1.50s)')
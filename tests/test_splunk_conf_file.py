@@ -0,0 +1,113 @@
+"""
+Unit tests for the splunk_conf_file module in ansible/plugins/modules/splunk_conf_file.py.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+pytest.importorskip("ansible")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'ansible', 'plugins', 'modules'))
+from splunk_conf_file import apply_conf, update_file
+
+
+SERVER_CONF = """\
+# Managed by hand
+[general]
+serverName = idx1
+pass4SymmKey = secret
+
+[diskUsage]
+minFreeSpace = 5000
+# keep this comment
+minFreeSpace = 100
+
+[sslConfig]
+sslRootCAPath = $SPLUNK_HOME/etc/auth/cacert.pem
+"""
+
+
+class TestSplunkConfFile:
+    """Test the splunk_conf_file module."""
+
+    def test_apply_keeps_comments_and_order(self):
+        content, changes = apply_conf(SERVER_CONF, {
+            'diskUsage': {'minFreeSpace': 500, 'pollingFrequency': 100000},
+            'general': {'serverName': 'idx1'},
+            'clustering': {'mode': 'peer'},
+        })
+
+        assert content == """\
+# Managed by hand
+[general]
+serverName = idx1
+pass4SymmKey = secret
+
+[diskUsage]
+minFreeSpace = 500
+# keep this comment
+pollingFrequency = 100000
+
+[sslConfig]
+sslRootCAPath = $SPLUNK_HOME/etc/auth/cacert.pem
+
+[clustering]
+mode = peer
+"""
+        assert changes == [
+            ('diskUsage', 'minFreeSpace', '5000', '500'),
+            ('diskUsage', 'minFreeSpace', '100', None),
+            ('diskUsage', 'pollingFrequency', None, '100000'),
+            ('clustering', 'mode', None, 'peer'),
+        ]
+
+    def test_continued_value_is_replaced(self):
+        content, changes = apply_conf('[macro]\ndefinition = index=main \\\n  sourcetype=x\nargs = a\n',
+                                      {'macro': {'definition': 'index=test'}})
+
+        assert content == '[macro]\ndefinition = index=test\nargs = a\n'
+        assert changes[0][2] == 'index=main \\\n  sourcetype=x'
+
+    def test_exclusive_replaces_given_stanzas(self):
+        content, changes = apply_conf(SERVER_CONF, {'diskUsage': {'pollingFrequency': 100000}, 'sslConfig': {}},
+                                      exclusive=True)
+
+        assert content == SERVER_CONF.replace(
+            'minFreeSpace = 5000\n# keep this comment\nminFreeSpace = 100\n',
+            '# keep this comment\npollingFrequency = 100000\n').replace(
+            'sslRootCAPath = $SPLUNK_HOME/etc/auth/cacert.pem\n', '')
+        assert [change[1:] for change in changes] == [
+            ('minFreeSpace', '5000', None),
+            ('minFreeSpace', '100', None),
+            ('pollingFrequency', None, '100000'),
+            ('sslRootCAPath', '$SPLUNK_HOME/etc/auth/cacert.pem', None),
+        ]
+        assert '[general]\nserverName = idx1\n' in content
+
+    def test_update_file_creates_and_is_idempotent(self, tmp_path):
+        path = str(tmp_path / 'apps' / 'org_app' / 'local' / 'limits.conf')
+        stanzas = {'search': {'max_searches_per_cpu': 2, 'base_max_searches': None}}
+
+        changed, changes, before, after = update_file(path, stanzas)
+        assert changed and before == ''
+        assert open(path).read() == '[search]\nmax_searches_per_cpu = 2\nbase_max_searches = \n'
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert len(changes) == 2
+
+        changed, changes, before, after = update_file(path, stanzas)
+        assert not changed and not changes
+        assert os.listdir(os.path.dirname(path)) == ['limits.conf']
+
+    def test_check_mode_does_not_write(self, tmp_path):
+        path = tmp_path / 'server.conf'
+        path.write_text(SERVER_CONF)
+        os.chmod(path, 0o644)
+
+        changed, changes, before, after = update_file(str(path), {'general': {'serverName': 'idx2'}}, check_mode=True)
+
+        assert changed and changes == [('general', 'serverName', 'idx1', 'idx2')]
+        assert path.read_text() == SERVER_CONF
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
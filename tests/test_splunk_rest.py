@@ -0,0 +1,122 @@
+"""
+Unit tests for the splunk_rest module in ansible/plugins/modules/splunk_rest.py.
+
+The module talks to a local HTTP server faking the splunkd REST API.
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("ansible")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'ansible', 'plugins', 'modules'))
+from splunk_rest import SplunkRestClient, SplunkRestError, run_requests
+
+
+class FakeSplunkd(BaseHTTPRequestHandler):
+    """splunkd with a login endpoint and endpoints returning the request as json."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self, method):
+        server = self.server
+        server.connections.add(self.client_address)
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode()) if length else {}
+        server.requests.append((method, parts.path))
+
+        if parts.path == '/services/auth/login':
+            if form.get('password') == ['changeme']:
+                self._respond(200, {'sessionKey': 'key1'})
+            else:
+                self._respond(401, {'messages': [{'type': 'WARN', 'text': 'Login failed'}]})
+        elif self.headers.get('Authorization') != 'Splunk key1':
+            self._respond(401, {'messages': [{'type': 'WARN', 'text': 'call not properly authenticated'}]})
+        elif parts.path == '/services/missing':
+            self._respond(404, {'messages': [{'type': 'ERROR', 'text': 'Not Found'}]})
+        else:
+            self._respond(200, {'entry': [{'content': {'path': parts.path, 'query': parse_qs(parts.query), 'form': form}}]})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+@pytest.fixture
+def splunkd():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSplunkd)
+    server.connections = set()
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(splunkd):
+    client = SplunkRestClient('http://127.0.0.1:%d' % splunkd.server_address[1])
+    yield client
+    client.close()
+
+
+class TestSplunkRest:
+    """Test the splunk_rest module client."""
+
+    def test_batch_uses_one_login_and_connection(self, splunkd, client):
+        client.login('admin', 'changeme')
+        requests = [
+            {'endpoint': '/services/shcluster/status?advanced=1'},
+            {'endpoint': '/services/kvstore/status'},
+            {'endpoint': 'services/shcluster/member/control/control/set_manual_detention', 'method': 'POST',
+             'body': {'manual_detention': 'on'}},
+        ]
+        results, changed = run_requests(client, requests, 'json', [200, 201])
+
+        assert changed
+        assert [method for method, _ in splunkd.requests] == ['POST', 'GET', 'GET', 'POST']
+        assert splunkd.requests[0][1] == '/services/auth/login'
+        assert len(splunkd.connections) == 1 and client.connections == 1
+        assert results[0]['json']['entry'][0]['content']['query'] == {'advanced': ['1'], 'output_mode': ['json']}
+        assert results[2]['json']['entry'][0]['content']['form'] == {'manual_detention': ['on'], 'output_mode': ['json']}
+
+    def test_failed_request_reports_messages(self, client):
+        client.login('admin', 'changeme')
+        with pytest.raises(SplunkRestError, match='GET /services/missing returned status 404: Not Found') as exc_info:
+            run_requests(client, [{'endpoint': '/services/kvstore/status'}, {'endpoint': '/services/missing'}], 'json', [200])
+
+        assert [result['status'] for result in exc_info.value.results] == [200, 404]
+
+    def test_login_failure(self, client):
+        with pytest.raises(SplunkRestError, match='Login as admin failed with status 401'):
+            client.login('admin', 'wrong')
+
+    def test_check_mode_skips_changes(self, splunkd, client):
+        client.session_key = 'key1'
+        results, changed = run_requests(client, [{'endpoint': '/services/kvstore/status'},
+                                                 {'endpoint': '/services/cluster/manager/control/control/rolling_upgrade_init', 'method': 'POST'}],
+                                        'json', [200], check_mode=True)
+
+        assert not changed
+        assert results[1]['skipped']
+        assert splunkd.requests == [('GET', '/services/kvstore/status')]
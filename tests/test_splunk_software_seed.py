@@ -0,0 +1,155 @@
+"""
+Unit tests for the splunk_software_seed module in ansible/plugins/modules/splunk_software_seed.py.
+
+The files are served and fetched over localhost.
+"""
+
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("ansible")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'ansible', 'plugins', 'modules'))
+import splunk_software_seed
+from splunk_software_seed import SeedError, create_server, fetch, read_pid, serve, stop
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / 'seeder' / 'splunk-9.4.1-e3bdab203ac8-linux-amd64.tgz'
+    path.parent.mkdir()
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 123))
+    return path
+
+
+@pytest.fixture
+def seeder(tmp_path, archive):
+    """Serve the archive like a seeder host, return the base URL and the pid_file."""
+    server = create_server([str(archive)], 0, '127.0.0.1')
+    pid_file = str(tmp_path / 'seeder' / '.seed.pid')
+    thread = threading.Thread(target=serve, args=(server, pid_file, 60), daemon=True)
+    thread.start()
+    while not os.path.exists(pid_file):
+        time.sleep(0.01)
+    yield 'http://127.0.0.1:%d' % server.server_address[1], pid_file
+    if os.path.exists(pid_file):
+        os.unlink(pid_file)
+    thread.join(5)
+
+
+def sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class TestSplunkSoftwareSeed:
+    """Test serving and fetching of archives."""
+
+    def test_fetch(self, tmp_path, archive, seeder):
+        url, pid_file = seeder
+        dest = tmp_path / 'host' / archive.name
+        dest.parent.mkdir()
+
+        stats = fetch('%s/%s' % (url, archive.name), str(dest), 'sha256:' + sha256(archive))
+
+        assert dest.read_bytes() == archive.read_bytes()
+        assert stats['size'] == stats['fetched'] == archive.stat().st_size
+        assert stats['resumed'] == 0 and stats['attempts'] == 1
+        assert not os.path.exists(str(dest) + '.part')
+
+    def test_resume_partial_file(self, tmp_path, archive, seeder):
+        url, pid_file = seeder
+        dest = tmp_path / 'host' / archive.name
+        dest.parent.mkdir()
+        offset = 1024 * 1024 + 7
+        (tmp_path / 'host' / (archive.name + '.part')).write_bytes(archive.read_bytes()[:offset])
+
+        stats = fetch('%s/%s' % (url, archive.name), str(dest), sha256(archive))
+
+        assert dest.read_bytes() == archive.read_bytes()
+        assert stats['resumed'] == offset
+        assert stats['fetched'] == archive.stat().st_size - offset
+
+    def test_resume_after_connection_error(self, tmp_path, archive, seeder, monkeypatch):
+        url, pid_file = seeder
+        dest = tmp_path / 'host' / archive.name
+        dest.parent.mkdir()
+        monkeypatch.setattr(splunk_software_seed.time, 'sleep', lambda seconds: None)
+        original_urlopen = splunk_software_seed.urlopen
+        calls = []
+
+        class BrokenResponse:
+            """Response dropping the connection after the first chunk."""
+            def __init__(self, response):
+                self.response = response
+                self.status = response.status
+                self.headers = response.headers
+                self.reads = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                self.response.close()
+
+            def read(self, size):
+                self.reads += 1
+                if self.reads > 1:
+                    raise ConnectionResetError('Connection reset by peer')
+                return self.response.read(size)
+
+        def flaky_urlopen(request, timeout):
+            calls.append(request.get_header('Range'))
+            response = original_urlopen(request, timeout=timeout)
+            return BrokenResponse(response) if len(calls) == 1 else response
+
+        monkeypatch.setattr(splunk_software_seed, 'urlopen', flaky_urlopen)
+        stats = fetch('%s/%s' % (url, archive.name), str(dest), sha256(archive))
+
+        assert dest.read_bytes() == archive.read_bytes()
+        assert calls == [None, 'bytes=%d-' % splunk_software_seed.CHUNK_SIZE]
+        assert stats['attempts'] == 2 and stats['resumed'] == splunk_software_seed.CHUNK_SIZE
+
+    def test_checksum_mismatch(self, tmp_path, archive, seeder):
+        url, pid_file = seeder
+        dest = tmp_path / 'host' / archive.name
+        dest.parent.mkdir()
+
+        with pytest.raises(SeedError, match='Checksum'):
+            fetch('%s/%s' % (url, archive.name), str(dest), '0' * 64)
+
+        assert not dest.exists() and not os.path.exists(str(dest) + '.part')
+
+    def test_unknown_file(self, tmp_path, seeder):
+        url, pid_file = seeder
+
+        with pytest.raises(SeedError, match='status 404'):
+            fetch('%s/Splunk.License' % url, str(tmp_path / 'Splunk.License'), '0' * 64)
+
+    def test_server_stops_without_pid_file(self, tmp_path, archive):
+        server = create_server([str(archive)], 0, '127.0.0.1')
+        pid_file = str(tmp_path / '.seed.pid')
+        thread = threading.Thread(target=serve, args=(server, pid_file, 60), daemon=True)
+        thread.start()
+        while not os.path.exists(pid_file):
+            time.sleep(0.01)
+
+        assert read_pid(pid_file, remove=True) == os.getpid()
+        thread.join(5)
+        assert not thread.is_alive()
+
+    def test_stop(self, tmp_path):
+        process = subprocess.Popen(['sleep', '30'])
+        pid_file = tmp_path / '.seed.pid'
+        pid_file.write_text('%d\n' % process.pid)
+
+        assert stop(str(pid_file), wait=0.5)
+        assert process.wait(5) == -signal.SIGTERM
+        assert not pid_file.exists()
+        assert not stop(str(pid_file))